@@ -208,11 +208,41 @@ def create_study_region(codename):
     with r.engine.begin() as connection:
         connection.execute(text(sql))
     print('Done.')
+    print(
+        '\nCreate subdivided study region geometries for efficient spatial queries... ',
+        end='',
+        flush=True,
+    )
+    for table in [
+        'urban_study_region',
+        r.config['buffered_urban_study_region'],
+    ]:
+        # Study regions may comprise one or a few very large and detailed
+        # polygons, for which a spatial index offers little benefit; tests
+        # of containment within these are more efficient when made against
+        # smaller subdivided parts with tight bounding boxes.  These are
+        # recreated each time to remain consistent with their source.
+        sql = f"""
+        DROP TABLE IF EXISTS {table}_subdivided;
+        CREATE TABLE {table}_subdivided AS
+              SELECT "study_region",
+                     db,
+                     ST_Subdivide(geom, 256) AS geom
+                FROM {table};
+        CREATE INDEX IF NOT EXISTS {table}_subdivided_gix ON
+            {table}_subdivided USING GIST (geom);
+        ANALYZE {table}_subdivided;
+        """
+        with r.engine.begin() as connection:
+            connection.execute(text(sql))
+    print('Done.')
     if {
         'study_region_boundary',
         'urban_region',
         'urban_study_region',
         r.config['buffered_urban_study_region'],
+        'urban_study_region_subdivided',
+        f"{r.config['buffered_urban_study_region']}_subdivided",
     }.issubset(r.get_tables()):
         print(
             f"""\nThe following layers have been created:
@@ -220,6 +250,7 @@ def create_study_region(codename):
         \n- urban_region: Representing the urban area surrounding the study region.
         \n- urban_study_region: The urban portion of the policy-relevant study region.
         \n- {r.config['buffered_urban_study_region']}: An analytical boundary extending {ghsci.settings["project"]["study_buffer"]} {ghsci.settings["project"]["units"]} further to mitigate edge effects.
+        \n- urban_study_region_subdivided and {r.config['buffered_urban_study_region']}_subdivided: The urban study region and its buffered analytical boundary, subdivided into smaller parts for efficient spatial queries.
         """,
         )
         print(
@@ -1,6 +1,9 @@
 """Collate OpenStreetMap data for study region."""
 
+import hashlib
 import os
+import re
+import shutil
 import subprocess as sp
 import sys
 import time
@@ -30,21 +33,344 @@ def create_poly_boundary_file(config):
     print('Done.')
 
 
+osm_extract_cache = f'{ghsci.folder_path}/process/data/_osm_extracts'
+
+
+def osm_extract_key(source, poly):
+    """Return a key identifying an extract of an OpenStreetMap source file using a poly boundary file, given the source file's path, size and modification time and the boundary file contents."""
+    stat = os.stat(source)
+    key = hashlib.sha256(
+        f'{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'.encode(),
+    )
+    with open(poly, 'rb') as f:
+        key.update(f.read())
+    return key.hexdigest()[:32]
+
+
+def poly_bounds(poly):
+    """Return the bounding box (min lon, min lat, max lon, max lat) of the coordinates of a poly boundary file."""
+    coordinates = []
+    with open(poly) as f:
+        for line in f:
+            values = line.split()
+            if len(values) == 2:
+                try:
+                    coordinates.append([float(x) for x in values])
+                except ValueError:
+                    pass
+    x = [c[0] for c in coordinates]
+    y = [c[1] for c in coordinates]
+    return (min(x), min(y), max(x), max(y))
+
+
+def link_osm_extract(extract, osm_region):
+    """Link (or otherwise copy) a cached OpenStreetMap extract to a region's output path."""
+    try:
+        os.link(extract, osm_region)
+    except OSError:
+        shutil.copyfile(extract, osm_region)
+
+
+def osmconvert_extract(source, options, extract):
+    """Extract OpenStreetMap data from a source file to a cached PBF extract using osmconvert.
+
+    The extract is written to a temporary file that is only moved into place once complete, so a failed or interrupted extraction is not later taken to be a valid cached extract.
+    """
+    temporary = f'{extract}.tmp'
+    command = f'osmconvert "{source}" {options} --out-pbf -o="{temporary}"'
+    print(command)
+    if sp.call(command, shell=True) != 0:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        sys.exit(f'Extraction of OpenStreetMap data failed: {command}')
+    os.replace(temporary, extract)
+
+
 def extract_osm(config):
-    """Extract OpenStreetMap for study region using poly boundary file."""
+    """Extract OpenStreetMap for study region using poly boundary file.
+
+    Extracts are cached, keyed by the source file fingerprint and boundary file contents, so regions sharing the same source and boundary are only extracted once.
+    """
     print('Extract OSM for studyregion'),
-    if os.path.isfile(config['OpenStreetMap']['osm_region']):
+    osm_region = config['OpenStreetMap']['osm_region']
+    if os.path.isfile(osm_region):
         print(
-            f"""...\r\n.osm file "{config['OpenStreetMap']['osm_region']}" already exists""",
+            f"""...\r\n.osm file "{osm_region}" already exists""",
         )
     else:
-        print(' using command:')
-        command = f"""osmconvert "{config['OpenStreetMap']['data_dir']}" -B="{config['codename_poly']}" -o="{config['OpenStreetMap']['osm_region']}" """
-        print(command)
-        sp.call(command, shell=True)
+        os.makedirs(osm_extract_cache, exist_ok=True)
+        extract = f"""{osm_extract_cache}/{osm_extract_key(config['OpenStreetMap']['data_dir'], config['codename_poly'])}.pbf"""
+        if os.path.isfile(extract):
+            print(f'...\r\nusing cached extract "{extract}"')
+        else:
+            print(' using command:')
+            osmconvert_extract(
+                config['OpenStreetMap']['data_dir'],
+                f'-B="{config["codename_poly"]}"',
+                extract,
+            )
+        link_osm_extract(extract, osm_region)
     print('Done.')
 
 
+def extract_osm_batch(codenames):
+    """Extract OpenStreetMap data for multiple study regions, reading each shared source file once.
+
+    Regions are grouped by OpenStreetMap source file.  Where more than one region lacks a cached extract, the source is first cut to the combined bounds of their poly boundary files in a single pass, and each region is extracted from this much smaller intermediate file.
+    """
+    sources = {}
+    for codename in codenames:
+        r = ghsci.Region(codename)
+        if not os.path.isfile(r.config['codename_poly']):
+            create_poly_boundary_file(r.config)
+        sources.setdefault(r.config['OpenStreetMap']['data_dir'], []).append(
+            r.config,
+        )
+    os.makedirs(osm_extract_cache, exist_ok=True)
+    for source, configs in sources.items():
+        pending = {}
+        for config in configs:
+            extract = f"""{osm_extract_cache}/{osm_extract_key(source, config['codename_poly'])}.pbf"""
+            if not os.path.isfile(extract):
+                pending[extract] = config['codename_poly']
+        if len(pending) > 1:
+            bounds = [poly_bounds(poly) for poly in pending.values()]
+            bbox = ','.join(
+                str(x)
+                for x in [
+                    min(b[0] for b in bounds),
+                    min(b[1] for b in bounds),
+                    max(b[2] for b in bounds),
+                    max(b[3] for b in bounds),
+                ]
+            )
+            intermediate = f'{osm_extract_cache}/_batch_{os.getpid()}.o5m'
+            command = f'osmconvert "{source}" -b={bbox} -o="{intermediate}"'
+            print(command)
+            if sp.call(command, shell=True) != 0:
+                if os.path.exists(intermediate):
+                    os.remove(intermediate)
+                sys.exit(f'Extraction of OpenStreetMap data failed: {command}')
+        else:
+            intermediate = source
+        for extract, poly in pending.items():
+            osmconvert_extract(intermediate, f'-B="{poly}"', extract)
+        if intermediate != source:
+            os.remove(intermediate)
+    for configs in sources.values():
+        for config in configs:
+            extract_osm(config)
+
+
+# OpenStreetMap keys which when present on a closed way indicate an area (following the osm2pgsql default style)
+osm_polygon_keys = [
+    'aeroway',
+    'amenity',
+    'area:highway',
+    'building',
+    'building:part',
+    'harbour',
+    'historic',
+    'landuse',
+    'leisure',
+    'man_made',
+    'military',
+    'natural',
+    'office',
+    'place',
+    'power',
+    'public_transport',
+    'shop',
+    'sport',
+    'tourism',
+    'water',
+    'waterway',
+    'wetland',
+]
+
+# Columns of open_space derived during analysis, rather than OpenStreetMap keys
+open_space_derived_columns = [
+    'os_id',
+    'area_ha',
+    'public_access',
+    'within_public',
+    'water_feature',
+    'min_bounding_circle_area',
+    'min_bounding_circle_diameter',
+    'roundness',
+    'linear_feature',
+    'acceptable_linear_feature',
+]
+
+sql_keywords = [
+    'and',
+    'or',
+    'not',
+    'is',
+    'null',
+    'in',
+    'like',
+    'ilike',
+    'between',
+    'true',
+    'false',
+    'p',
+]
+
+
+def sql_identifiers(sql):
+    """Return the set of column identifiers referenced in an SQL condition, ignoring quoted values and keywords."""
+    sql = re.sub(r"'[^']*'", '', sql)
+    identifiers = set(re.findall(r'"([^"]+)"', sql))
+    identifiers.update(
+        x.lower()
+        for x in re.findall(
+            r'(?<![\w"])([A-Za-z_][A-Za-z0-9_]*)(?![\w"(])', sql
+        )
+    )
+    return {x for x in identifiers if x.lower() not in sql_keywords}
+
+
+def osm_import_keys(r, ghsci):
+    """Return the sorted list of OpenStreetMap keys queried in analysis, to be imported as table columns."""
+    keys = set(ghsci.osm_open_space['os_required']['criteria'])
+    keys.update(ghsci.df_osm_dest['key'].dropna().unique())
+    # keys queried in destination conditions, and for open space tags
+    keys.update(
+        ['access', 'name', 'historic', 'natural', 'tourism', 'waterway']
+    )
+    for criteria in [
+        'os_inclusion',
+        'os_excluded_keys',
+        'os_excluded_values',
+        'public_not_in',
+        'os_add_as_tags',
+    ]:
+        keys.update(
+            sql_identifiers(str(ghsci.osm_open_space[criteria]['criteria'])),
+        )
+    for aggregation in r.config['custom_aggregations'].values():
+        if str(aggregation.get('data', '')).startswith('OSM:'):
+            keys.update(sql_identifiers(aggregation['data'].split(':', 1)[1]))
+    return sorted(keys - set(open_space_derived_columns))
+
+
+def osm2pgsql_flex_style(r, ghsci):
+    """Write an osm2pgsql flex output style for the study region, returning its path.
+
+    Only OpenStreetMap features having keys queried in analysis are imported, with these keys as columns and any other tags in an hstore 'tags' column, and geometries are transformed to the project coordinate reference system on import.
+    """
+    keys = ', '.join(f"'{key}'" for key in osm_import_keys(r, ghsci))
+    polygon_keys = ', '.join(f"'{key}'" for key in osm_polygon_keys)
+    style = f"""-- osm2pgsql flex output style generated for {r.codename}
+local srid = {r.config['crs']['srid']}
+local prefix = '{r.config["osm_prefix"]}'
+local keys = {{ {keys} }}
+local polygon_keys = {{ {polygon_keys} }}
+local linear_natural = {{ coastline = true, cliff = true, ridge = true, arete = true, tree_row = true }}
+local major_roads = {{ motorway = true, motorway_link = true, trunk = true, trunk_link = true, primary = true, primary_link = true, secondary = true, secondary_link = true, tertiary = true, tertiary_link = true }}
+
+local function columns(geometry_type)
+    local c = {{ {{ column = 'tags', type = 'hstore' }} }}
+    for _, key in ipairs(keys) do
+        table.insert(c, {{ column = key, type = 'text' }})
+    end
+    table.insert(c, {{ column = 'geom', type = geometry_type, projection = srid, not_null = true }})
+    return c
+end
+
+local function define_table(name, ids, geometry_type)
+    return osm2pgsql.define_table({{ name = prefix .. '_' .. name, ids = {{ type = ids, id_column = 'osm_id' }}, columns = columns(geometry_type) }})
+end
+
+local tables = {{
+    point = define_table('point', 'node', 'point'),
+    line = define_table('line', 'way', 'linestring'),
+    roads = define_table('roads', 'way', 'linestring'),
+    polygon = define_table('polygon', 'area', 'multipolygon'),
+}}
+
+local is_key = {{}}
+for _, key in ipairs(keys) do
+    is_key[key] = true
+end
+
+-- split tags into queried key columns and other tags, returning nil if no queried keys are present
+local function attributes(object)
+    local row = {{ tags = {{}} }}
+    local queried = false
+    for k, v in pairs(object.tags) do
+        if is_key[k] then
+            row[k] = v
+            queried = true
+        else
+            row.tags[k] = v
+        end
+    end
+    if queried then
+        return row
+    end
+    return nil
+end
+
+local function is_area(tags)
+    if tags.area == 'yes' then
+        return true
+    end
+    if tags.area == 'no' then
+        return false
+    end
+    for _, key in ipairs(polygon_keys) do
+        if tags[key] and not (key == 'natural' and linear_natural[tags.natural]) then
+            return true
+        end
+    end
+    return false
+end
+
+function osm2pgsql.process_node(object)
+    local row = attributes(object)
+    if row then
+        row.geom = object:as_point()
+        tables.point:insert(row)
+    end
+end
+
+function osm2pgsql.process_way(object)
+    local row = attributes(object)
+    if not row then
+        return
+    end
+    if object.is_closed and is_area(object.tags) then
+        row.geom = object:as_polygon()
+        tables.polygon:insert(row)
+        return
+    end
+    row.geom = object:as_linestring()
+    tables.line:insert(row)
+    if major_roads[object.tags.highway] or object.tags.railway or object.tags.boundary == 'administrative' then
+        tables.roads:insert(row)
+    end
+end
+
+function osm2pgsql.process_relation(object)
+    local relation_type = object.tags.type
+    if relation_type ~= 'multipolygon' and relation_type ~= 'boundary' then
+        return
+    end
+    local row = attributes(object)
+    if row then
+        row.geom = object:as_multipolygon()
+        tables.polygon:insert(row)
+    end
+end
+"""
+    path = f"{r.config['region_dir']}/{r.codename}_{r.config['osm_prefix']}_flex.lua"
+    with open(path, 'w') as f:
+        f.write(style)
+    return path
+
+
 def import_study_region_osm_to_db(r, ghsci):
     """Import buffered study region OpenStreetMap excerpt to spatial database."""
     db = r.config['db']
@@ -62,42 +388,13 @@ def import_study_region_osm_to_db(r, ghsci):
     res = curs.fetchone()
     if res is None:
         print('Copying OSM excerpt to pgsql...'),
-        command = f"""osm2pgsql -U {db_user} -l -d {db} --host {db_host} --port {db_port} {r.config['OpenStreetMap']["osm_region"]} --hstore --prefix {r.config["osm_prefix"]} --log-progress=false"""
+        style = osm2pgsql_flex_style(r, ghsci)
+        processes = ghsci.settings['project'].get('multiprocessing', 1) or 1
+        command = f"""osm2pgsql -U {db_user} -d {db} --host {db_host} --port {db_port} {r.config['OpenStreetMap']["osm_region"]} --output=flex --style="{style}" --number-processes={processes} --log-progress=false"""
         print(command)
-        sp.call(command, shell=True)
+        if sp.call(command, shell=True) != 0:
+            sys.exit(f'Import of OpenStreetMap data failed: {command}')
         print('Done.')
-
-        for shape in ['line', 'point', 'polygon', 'roads']:
-            # Define tags for which presence of values is suggestive of some kind of open space
-            # These are defined in the _project_configuration worksheet 'open_space_defs' under the 'required_tags' column.
-            required_tags = '\n'.join(
-                [
-                    (
-                        f'ALTER TABLE {r.config["osm_prefix"]}_{shape} ADD COLUMN IF NOT EXISTS "{x}" varchar;'
-                    )
-                    for x in ghsci.osm_open_space['os_required']['criteria']
-                ],
-            )
-            sql = [
-                f"""
-            -- Add geom column to polygon table, appropriately transformed to project spatial reference system
-            ALTER TABLE {r.config["osm_prefix"]}_{shape} ADD COLUMN geom geometry;
-            UPDATE {r.config["osm_prefix"]}_{shape} SET geom = ST_Transform(way,{r.config['crs']['srid']});
-            CREATE INDEX {r.config["osm_prefix"]}_{shape}_idx ON {r.config["osm_prefix"]}_{shape} USING GIST (geom);
-            """,
-                f"""
-            -- Add other columns which are important if they exists, but not important if they don't
-            -- --- except that there presence is required for ease of accurate querying.
-            {required_tags}""",
-            ]
-            for query in sql:
-                query_start = time.time()
-                print(f'\nExecuting: {query}')
-                curs.execute(query)
-                conn.commit()
-                duration = (time.time() - query_start) / 60
-                print(f'Executed in {duration} mins')
-
         curs.execute(ghsci.grant_query)
         conn.commit()
     else:
@@ -126,7 +423,14 @@ def main():
         codename = sys.argv[1]
     except IndexError:
         codename = None
-    create_osm_resources(codename)
+    if len(sys.argv) > 2:
+        # extract OpenStreetMap data for multiple regions in a single pass
+        # of each source file, before setting up each region
+        extract_osm_batch(sys.argv[1:])
+        for codename in sys.argv[1:]:
+            create_osm_resources(codename)
+    else:
+        create_osm_resources(codename)
 
 
 if __name__ == '__main__':
@@ -4,9 +4,14 @@ OpenStreetMap network setup.
 Create pedestrian street networks for specified city.
 """
 
+import hashlib
 import os
+import re
+import subprocess as sp
 import sys
 import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 import geopandas as gpd
@@ -14,11 +19,14 @@ import geopandas as gpd
 # Set up project and region parameters for GHSCIC analyses
 import ghsci
 import networkx as nx
+import numpy as np
 import osmnx as ox
+import shapely
 from script_running_log import script_running_log
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
 from shapely.geometry import MultiPolygon, Polygon
-from sqlalchemy import text
-from tqdm import tqdm
+from sqlalchemy import inspect, text
 
 
 def osmnx_configuration(r):
@@ -61,50 +69,189 @@ def generate_pedestrian_network_nodes_edges(r, pedestrian):
         return G_proj
     else:
         G = derive_pedestrian_network(r, network_study_region, pedestrian)
+        print('  - Project network')
+        nodes, edges = project_network_gdfs(G, r.config['crs']['srid'])
         print(
-            '  - Save edges with geometry to postgis prior to simplification',
+            '  - Save edges with geometry and routing topology to postgis prior to simplification',
         )
-        graph_to_postgis(
-            G,
-            r.engine,
-            'edges',
-            nodes=False,
-            geometry_name='geom_4326',
-        )
-        print('  - Remove unnecessary key data from edges')
-        att_list = {
-            k
-            for n in G.edges
-            for k in G.edges[n].keys()
-            if k not in ['osmid', 'length']
-        }
-        capture_output = [
-            [d.pop(att, None) for att in att_list]
-            for n1, n2, d in tqdm(G.edges(data=True), desc=' ' * 18)
-        ]
-        del capture_output
-        print('  - Project graph')
-        G_proj = ox.project_graph(G, to_crs=r.config['crs']['srid'])
-        if G_proj.is_directed():
-            G_proj = G_proj.to_undirected()
+        edges_to_postgis(r, edges)
         print(
             '  - Save simplified, projected, undirected graph edges and node GeoDataFrames to PostGIS',
         )
-        graph_to_postgis(
-            G_proj,
+        edges = simplify_edges(nodes, edges)
+        G_proj = ox.graph_from_gdfs(
+            nodes,
+            edges,
+            graph_attrs={**G.graph, 'crs': nodes.crs},
+        ).to_undirected()
+        gdf_to_postgis_format(nodes.copy(), r.engine, 'nodes')
+        gdf_to_postgis_format(
+            ox.graph_to_gdfs(G_proj, nodes=False),
             r.engine,
-            nodes_table='nodes',
-            edges_table='edges_simplified',
+            'edges_simplified',
         )
         return G_proj
 
 
+def project_network_gdfs(G, crs):
+    """Return the node and edge GeoDataFrames of a graph, projected to the given coordinate reference system."""
+    nodes, edges = ox.graph_to_gdfs(G)
+    nodes = nodes.to_crs(crs)
+    nodes['x'] = nodes.geometry.x
+    nodes['y'] = nodes.geometry.y
+    edges = edges.to_crs(crs)
+    return nodes, edges
+
+
+def simplify_edges(nodes, edges):
+    """Return edges retaining only their OpenStreetMap identifiers and length, with straight line geometries between their end nodes."""
+    u = nodes.loc[edges.index.get_level_values('u'), ['x', 'y']].to_numpy()
+    v = nodes.loc[edges.index.get_level_values('v'), ['x', 'y']].to_numpy()
+    return gpd.GeoDataFrame(
+        edges[['osmid', 'length']],
+        geometry=shapely.linestrings(np.stack([u, v], axis=1)),
+        crs=edges.crs,
+    )
+
+
+def overpass_filter_clauses(custom_filter):
+    """Parse an Overpass QL tag filter (e.g. '["highway"]["foot"!~"no"]') into a list of clauses.
+
+    Each clause is a tuple of (negated, key, operator, value, case_insensitive), where the operator is one of None (key existence), '=', '!=', '~' or '!~'.
+    """
+    pattern = re.compile(
+        r'\[\s*(!)?\s*"([^"]+)"\s*(?:(!?[=~])\s*"([^"]*)"\s*(,\s*i)?)?\s*\]',
+    )
+    clauses = [
+        (x[0] == '!', x[1], x[2] or None, x[3], x[4] != '')
+        for x in pattern.findall(custom_filter)
+    ]
+    if len(clauses) == 0:
+        raise ValueError(
+            f'The network filter could not be interpreted: {custom_filter}',
+        )
+    return clauses
+
+
+def tags_match_filter(tags, clauses):
+    """Whether a dictionary of OpenStreetMap tags satisfies all parsed Overpass QL filter clauses."""
+    for negated, key, operator, value, case_insensitive in clauses:
+        present = key in tags
+        if operator is None:
+            match = present != negated
+        elif operator == '=':
+            match = present and tags[key] == value
+        elif operator == '!=':
+            match = not (present and tags[key] == value)
+        else:
+            flags = re.IGNORECASE if case_insensitive else 0
+            found = present and re.search(value, tags[key], flags) is not None
+            match = found if operator == '~' else not found
+        if not match:
+            return False
+    return True
+
+
+def pedestrian_osm_xml(r, pedestrian):
+    """Write the ways of the region's OpenStreetMap extract matching the pedestrian network filter, with their nodes, to an OSM XML file.
+
+    Ways are first reduced to those having the keys required by the filter using osmfilter, and the full filter is then applied as it would be by the Overpass API.  The file is retained in the region output directory, named using a hash of the filter clauses so that a changed filter is not served by a stale network, and recreated if the extract is more recent.
+    """
+    osm_region = r.config['OpenStreetMap']['osm_region']
+    if not os.path.isfile(osm_region):
+        sys.exit(
+            f'The OpenStreetMap extract for this region ({osm_region}) could not be located, so the pedestrian network cannot be derived from it.',
+        )
+    clauses = overpass_filter_clauses(pedestrian)
+    filter_key = hashlib.sha256(repr(clauses).encode()).hexdigest()[:16]
+    osm_xml = f'{os.path.splitext(osm_region)[0]}_pedestrian_{filter_key}.osm'
+    if os.path.isfile(osm_xml) and os.path.getmtime(
+        osm_xml,
+    ) >= os.path.getmtime(osm_region):
+        return osm_xml
+    required = [x[1] for x in clauses if x[2] is None and not x[0]]
+    if len(required) > 0:
+        keep = ' and '.join([f'{key}=' for key in required])
+        keep = f' --keep="{keep}"'
+    else:
+        # without a required key to pre-filter on, all ways are retained
+        # and the full filter is applied below
+        keep = ''
+    o5m = f'{os.path.splitext(osm_region)[0]}_network.o5m'
+    prefiltered = f'{os.path.splitext(osm_region)[0]}_network.osm'
+    for command in [
+        f'osmconvert "{osm_region}" --drop-author --out-o5m -o="{o5m}"',
+        f'osmfilter "{o5m}"{keep} --drop-author -o="{prefiltered}"',
+    ]:
+        print(f'\n{command}')
+        if sp.call(command, shell=True) != 0:
+            sys.exit(
+                f'Preparation of the pedestrian network failed: {command}'
+            )
+    # ways are retained if they satisfy the full filter; nodes are retained
+    # only if they are referenced by a retained way, as for Overpass queries
+    # of the form way[...];(._;>;)
+    ways = []
+    referenced = set()
+    for event, element in ET.iterparse(prefiltered):
+        if element.tag == 'way':
+            tags = {x.get('k'): x.get('v') for x in element.findall('tag')}
+            if tags_match_filter(tags, clauses):
+                ways.append(ET.tostring(element, encoding='unicode'))
+                referenced.update(x.get('ref') for x in element.findall('nd'))
+            element.clear()
+        elif element.tag in ['node', 'relation']:
+            element.clear()
+    with open(osm_xml, 'w', encoding='utf-8') as f:
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="ghsci">\n',
+        )
+        for event, element in ET.iterparse(prefiltered):
+            if element.tag == 'node':
+                if element.get('id') in referenced:
+                    f.write(ET.tostring(element, encoding='unicode'))
+                element.clear()
+            elif element.tag in ['way', 'relation']:
+                element.clear()
+        f.write(''.join(ways))
+        f.write('</osm>\n')
+    for temporary in [o5m, prefiltered]:
+        os.remove(temporary)
+    return osm_xml
+
+
+def graph_from_polygon_extract(G_extract, polygon, retain_all=False):
+    """Return the network within a polygon from a graph of the region's OpenStreetMap extract.
+
+    This follows the steps taken by OSMnx to derive a graph from a polygon using the Overpass API: the graph is truncated to a 500 metre buffer of the polygon and simplified, before truncation to the polygon itself, retaining street counts for nodes with neighbours outside it.
+    """
+    poly_proj, crs_utm = ox.projection.project_geometry(polygon)
+    poly_buff, _ = ox.projection.project_geometry(
+        poly_proj.buffer(500),
+        crs=crs_utm,
+        to_latlong=True,
+    )
+    G_buff = ox.truncate.truncate_graph_polygon(G_extract, poly_buff)
+    if not retain_all:
+        G_buff = ox.truncate.largest_component(G_buff, strongly=False)
+    G_buff = ox.simplify_graph(G_buff)
+    G = ox.truncate.truncate_graph_polygon(G_buff, polygon)
+    if not retain_all:
+        G = ox.truncate.largest_component(G, strongly=False)
+    street_count = ox.stats.count_streets_per_node(G_buff, nodes=G.nodes)
+    nx.set_node_attributes(G, values=street_count, name='street_count')
+    return G
+
+
 def derive_pedestrian_network(
     r,
     network_study_region,
     pedestrian,
 ):
-    """Derive routable pedestrian network using OSMnx."""
+    """Derive routable pedestrian network using OSMnx.
+
+    The network is retrieved using the Overpass API, or if the network 'osm_extract' parameter is configured, derived from the region's local OpenStreetMap extract without requiring internet access.
+    """
     print(
         'Creating and saving pedestrian roads network... ',
         end='',
@@ -113,56 +260,65 @@ def derive_pedestrian_network(
     # load buffered study region in EPSG4326 from postgis
     sql = f"""SELECT ST_Transform(geom,4326) AS geom FROM {network_study_region}"""
     polygon = r.get_gdf(text(sql), geom_col='geom')['geom'][0]
-    if not r.config['network']['polygon_iteration']:
-        G = ox.graph_from_polygon(
-            polygon,
-            custom_filter=pedestrian,
-            retain_all=r.config['network']['osmnx_retain_all'],
-            network_type='walk',
+    retain_all = r.config['network']['osmnx_retain_all']
+    if r.config['network']['osm_extract']:
+        G_extract = ox.graph_from_xml(
+            pedestrian_osm_xml(r, pedestrian),
+            bidirectional='walk' in ox.settings.bidirectional_network_types,
+            simplify=False,
+            retain_all=True,
         )
+    else:
+        G_extract = None
+    if not r.config['network']['polygon_iteration']:
+        G = network_from_polygon(polygon, pedestrian, retain_all, G_extract)
     else:
         # We allow for the possibility that multiple legitimate network islands may exist in this region (e.g. Hong Kong).
         # These are accounted for by retrieving the network for each polygon in the buffered study region boundary,
-        # and then taking the union of these using network compose if more than one network was retrieved.
-        N = list()
+        # and then taking the union of these if more than one network was retrieved.
         # Handle both Polygon and MultiPolygon cases
         polygons = (
-            polygon.geoms if isinstance(polygon, MultiPolygon) else [polygon]
+            list(polygon.geoms)
+            if isinstance(polygon, MultiPolygon)
+            else [polygon]
         )
-        for poly in polygons:
-            try:
-                N.append(
-                    ox.graph_from_polygon(
-                        poly,
-                        custom_filter=pedestrian,
-                        retain_all=r.config['network']['osmnx_retain_all'],
-                        network_type='walk',
+        processes = min(
+            len(polygons),
+            ghsci.settings['project'].get('multiprocessing', 1) or 1,
+        )
+        if processes > 1:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_network_worker_setup,
+                initargs=(osmnx_settings(), G_extract),
+            ) as executor:
+                N = list(
+                    executor.map(
+                        _network_from_polygon_worker,
+                        polygons,
+                        [pedestrian] * len(polygons),
+                        [retain_all] * len(polygons),
                     ),
                 )
-            except (ValueError, TypeError):
-                # if the polygon results in no return results from overpass, an error is thrown
-                pass
-
-        G = N[0]
-        if len(N) > 1:
-            for additional_network in N[1:]:
-                G = nx.compose(G, additional_network)
+        else:
+            N = [
+                _network_from_polygon_worker(
+                    poly,
+                    pedestrian,
+                    retain_all,
+                    G_extract,
+                )
+                for poly in polygons
+            ]
+        N = [x for x in N if x is not None]
+        G = graph_union(N)
 
         if type(r.config['network']['connection_threshold']) == int:
             # A minimum total distance has been set for each induced network island; so, extract the node IDs of network components exceeding this threshold distance
-            # get all connected graph components, sorted by size
-            cc = sorted(
-                nx.weakly_connected_components(G),
-                key=len,
-                reverse=True,
+            nodes = connected_nodes(
+                G,
+                r.config['network']['connection_threshold'],
             )
-            nodes = []
-            for c in cc:
-                if len(c) >= r.config['network']['connection_threshold']:
-                    nodes.extend(c)
-
-            nodes = set(nodes)
-
             # induce a subgraph on those nodes
             G = nx.MultiDiGraph(G.subgraph(nodes))
 
@@ -171,6 +327,103 @@ def derive_pedestrian_network(
     return G
 
 
+def network_from_polygon(polygon, pedestrian, retain_all, G_extract=None):
+    """Return the pedestrian network for a polygon, using the Overpass API or otherwise a graph of the region's OpenStreetMap extract."""
+    if G_extract is not None:
+        return graph_from_polygon_extract(
+            G_extract,
+            polygon,
+            retain_all=retain_all,
+        )
+    return ox.graph_from_polygon(
+        polygon,
+        custom_filter=pedestrian,
+        retain_all=retain_all,
+        network_type='walk',
+    )
+
+
+def osmnx_settings():
+    """Return the configured OSMnx settings, so these may be applied in worker processes."""
+    return {
+        k: v
+        for k, v in vars(ox.settings).items()
+        if k.islower()
+        and not k.startswith('_')
+        and isinstance(v, (bool, int, float, str, list, dict, type(None)))
+    }
+
+
+def _network_worker_setup(osmnx_settings, G_extract=None):
+    """Apply OSMnx settings and the optional extract graph in a network retrieval worker process."""
+    global _G_extract
+    for setting, value in osmnx_settings.items():
+        setattr(ox.settings, setting, value)
+    _G_extract = G_extract
+
+
+_G_extract = None
+
+
+def _network_from_polygon_worker(
+    polygon,
+    pedestrian,
+    retain_all,
+    G_extract=None,
+):
+    """Return the pedestrian network for a polygon, or None if no network was found within it."""
+    if G_extract is None:
+        G_extract = _G_extract
+    try:
+        return network_from_polygon(polygon, pedestrian, retain_all, G_extract)
+    except (ValueError, TypeError):
+        # if the polygon results in no return results from overpass, an error is thrown
+        return None
+
+
+def graph_union(graphs):
+    """Return the union of a list of graphs, with attributes of later graphs taking precedence for shared nodes and edges.
+
+    Unlike repeatedly composing pairs of graphs, nodes and edges are added to a single graph in one pass.
+    """
+    if len(graphs) == 0:
+        raise ValueError(
+            'No pedestrian network could be retrieved for the study region.',
+        )
+    if len(graphs) == 1:
+        return graphs[0]
+    G = graphs[0].__class__()
+    for graph in graphs:
+        G.graph.update(graph.graph)
+    G.add_nodes_from(x for graph in graphs for x in graph.nodes(data=True))
+    G.add_edges_from(
+        x for graph in graphs for x in graph.edges(keys=True, data=True)
+    )
+    return G
+
+
+def connected_nodes(G, threshold):
+    """Return the set of nodes in weakly connected components of a graph having at least the threshold number of nodes.
+
+    Components are labelled from arrays of edge end node indices, rather than by traversal of the graph.
+    """
+    nodes = np.array(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array(
+        [(index[u], index[v]) for u, v in G.edges()],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    adjacency = sparse.coo_matrix(
+        (np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])),
+        shape=(len(nodes), len(nodes)),
+    )
+    n, labels = connected_components(
+        adjacency, directed=True, connection='weak'
+    )
+    size = np.bincount(labels, minlength=n)
+    return set(nodes[size[labels] >= threshold].tolist())
+
+
 def graph_to_postgis(
     G,
     engine,
@@ -194,18 +447,75 @@ def graph_to_postgis(
 
 
 def gdf_to_postgis_format(gdf, engine, table, geometry_name='geom'):
-    """Sets geometry with optional new name (e.g. 'geom') and writes to PostGIS, returning the reformatted GeoDataFrame."""
+    """Sets geometry with optional new name (e.g. 'geom') and writes to PostGIS, building the table's indexes once the data have been loaded."""
     gdf.columns = [
         geometry_name if x == 'geometry' else x for x in gdf.columns
     ]
     gdf = gdf.set_geometry(geometry_name)
-    with engine.connect() as connection:
-        gdf.to_postgis(
+    geometry_types = gdf.geom_type.dropna().unique()
+    geometry_type = (
+        geometry_types[0] if len(geometry_types) == 1 else 'Geometry'
+    )
+    with engine.begin() as connection:
+        gdf.iloc[:0].to_postgis(
             table,
             connection,
             index=True,
             if_exists='replace',
         )
+        connection.execute(
+            text(
+                f'ALTER TABLE {table} ALTER COLUMN {geometry_name} TYPE geometry({geometry_type}, {gdf.crs.to_epsg()});',
+            ),
+        )
+        indexes = connection.execute(
+            text(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = :table;",
+            ),
+            {'table': table},
+        ).fetchall()
+        for index, definition in indexes:
+            connection.execute(text(f'DROP INDEX "{index}";'))
+        gdf.to_postgis(
+            table,
+            connection,
+            index=True,
+            if_exists='append',
+        )
+        for index, definition in indexes:
+            connection.execute(text(f'{definition};'))
+        connection.execute(text(f'ANALYZE {table};'))
+
+
+def consolidate_intersections(r, tolerance, table):
+    """Consolidate network nodes within the tolerance distance of one another as intersections, stored as a database table.
+
+    This gives the same result as the OSMnx consolidate_intersections() function (excluding dead ends, without rebuilding the graph): nodes are buffered by the tolerance distance, and the centroids of the merged buffers are taken as intersections.  However, rather than merging the buffers of all nodes in memory, nodes are clustered in the database using ST_ClusterDBSCAN so that only the buffers of nodes whose buffers may overlap are merged.
+    """
+    sql = f"""
+    DROP TABLE IF EXISTS {table};
+    CREATE TABLE {table} AS
+    WITH clusters AS (
+        SELECT
+            ST_ClusterDBSCAN(geom, eps := {2 * tolerance}, minpoints := 1) OVER () AS cluster,
+            geom
+        FROM nodes
+        WHERE street_count > 1
+    ),
+    merged AS (
+        SELECT (ST_Dump(ST_Union(ST_Buffer(geom, {tolerance}, 'quad_segs=16')))).geom AS geom
+        FROM clusters
+        GROUP BY cluster
+    )
+    SELECT
+        (row_number() OVER () - 1)::bigint AS "index",
+        ST_Centroid(geom)::geometry(Point, {r.config['crs']['srid']}) AS geom
+    FROM merged;
+    CREATE INDEX {table}_geom_idx ON {table} USING GIST (geom);
+    ANALYZE {table};
+    """
+    with r.engine.begin() as connection:
+        connection.execute(text(sql))
 
 
 def load_intersections(r, G_proj):
@@ -216,23 +526,30 @@ def load_intersections(r, G_proj):
             == f"intersections_osmnx_{r.config['network']['intersection_tolerance']}m"
         ):
             print(
-                f"\nRepresent intersections using OpenStreetMap derived data using OSMnx consolidate intersections function with tolerance of {r.config['network']['intersection_tolerance']} metres... ",
-            )
-            intersections = ox.consolidate_intersections(
-                G_proj,
-                tolerance=r.config['network']['intersection_tolerance'],
-                rebuild_graph=False,
-                dead_ends=False,
+                f"\nRepresent intersections using OpenStreetMap derived data, consolidating network nodes ({r.config['network']['intersection_consolidation']}) with tolerance of {r.config['network']['intersection_tolerance']} metres... ",
             )
-            intersections = gpd.GeoDataFrame(
-                intersections,
-                columns=['geom'],
-            ).set_geometry('geom')
-            with r.engine.connect() as connection:
-                intersections.to_postgis(
+            if r.config['network']['intersection_consolidation'] == 'osmnx':
+                intersections = ox.consolidate_intersections(
+                    G_proj,
+                    tolerance=r.config['network']['intersection_tolerance'],
+                    rebuild_graph=False,
+                    dead_ends=False,
+                )
+                intersections = gpd.GeoDataFrame(
+                    intersections,
+                    columns=['geom'],
+                ).set_geometry('geom')
+                with r.engine.connect() as connection:
+                    intersections.to_postgis(
+                        r.config['intersections_table'],
+                        connection,
+                        index=True,
+                    )
+            else:
+                consolidate_intersections(
+                    r,
+                    r.config['network']['intersection_tolerance'],
                     r.config['intersections_table'],
-                    connection,
-                    index=True,
                 )
         else:
             print(
@@ -249,44 +566,60 @@ def load_intersections(r, G_proj):
         )
 
 
+def edges_to_postgis(r, edges):
+    """Save projected graph edges to postgis, with the routing topology used by pgRouting derived from the graph's node identifiers.
+
+    The "from" and "to" node identifiers, and the "source" and "target" vertices used by pgRouting, are set from the OSMnx u and v node identifiers, so the network topology does not have to be rebuilt by geometric snapping of edge end points using pgr_createTopology.
+    """
+    u = edges.index.get_level_values('u')
+    v = edges.index.get_level_values('v')
+    reverse = edges.index.get_level_values('key') != 2
+    edges = edges.assign(
+        **{
+            'from': np.where(reverse, v, u),
+            'to': np.where(reverse, u, v),
+        },
+    )
+    edges['source'] = edges['from']
+    edges['target'] = edges['to']
+    edges['ogc_fid'] = np.arange(1, len(edges) + 1)
+    gdf_to_postgis_format(edges, r.engine, 'edges')
+
+
 def create_pgrouting_network_topology(r):
-    """Create network topology for pgrouting for later analysis of node relations for sample points."""
+    """Index network topology for pgrouting for later analysis of node relations for sample points."""
     sql = """SELECT 1 WHERE to_regclass('public.edges_target_idx') IS NOT NULL;"""
     with r.engine.begin() as connection:
         res = connection.execute(text(sql)).first()
     if res is None:
-        print('\nCreate network topology...')
-        sql = f"""
-        ALTER TABLE edges ADD COLUMN IF NOT EXISTS "geom" geometry;
-        UPDATE edges SET geom = ST_Transform(geom_4326, {r.config['crs']['srid']});
-        ALTER TABLE edges ADD COLUMN IF NOT EXISTS "from" bigint;
-        ALTER TABLE edges ADD COLUMN IF NOT EXISTS "to" bigint;
-        UPDATE edges SET "from" = v, "to" = u WHERE key != 2;
-        UPDATE edges SET "from" = u, "to" = v WHERE key = 2;
-        ALTER TABLE edges ADD COLUMN IF NOT EXISTS "source" INTEGER;
-        ALTER TABLE edges ADD COLUMN IF NOT EXISTS "target" INTEGER;
-        ALTER TABLE edges ADD COLUMN IF NOT EXISTS "ogc_fid" SERIAL PRIMARY KEY;
-        SELECT MIN(ogc_fid), MAX(ogc_fid) FROM edges;
-        """
-        with r.engine.begin() as connection:
-            min_id, max_id = connection.execute(text(sql)).first()
-        print(f'there are {max_id - min_id + 1} edges to be processed')
-        interval = 10000
-        for x in range(min_id, max_id + 1, interval):
-            sql = f"select pgr_createTopology('edges', 1, 'geom', 'ogc_fid', rows_where:='ogc_fid>={x} and ogc_fid<{x+interval}');"
+        print('\nIndex network topology... ', end='', flush=True)
+        columns = [x['name'] for x in inspect(r.engine).get_columns('edges')]
+        if 'source' not in columns:
+            # edges saved prior to topology being recorded on creation
+            sql = f"""
+            ALTER TABLE edges ADD COLUMN IF NOT EXISTS "geom" geometry;
+            UPDATE edges SET geom = ST_Transform(geom_4326, {r.config['crs']['srid']});
+            ALTER TABLE edges ADD COLUMN IF NOT EXISTS "from" bigint;
+            ALTER TABLE edges ADD COLUMN IF NOT EXISTS "to" bigint;
+            UPDATE edges SET "from" = v, "to" = u WHERE key != 2;
+            UPDATE edges SET "from" = u, "to" = v WHERE key = 2;
+            ALTER TABLE edges ADD COLUMN IF NOT EXISTS "source" bigint;
+            ALTER TABLE edges ADD COLUMN IF NOT EXISTS "target" bigint;
+            UPDATE edges SET "source" = "from", "target" = "to";
+            ALTER TABLE edges ADD COLUMN IF NOT EXISTS "ogc_fid" SERIAL;
+            """
             with r.engine.begin() as connection:
                 connection.execute(text(sql))
-            x_max = x + interval - 1
-            if x_max > max_id:
-                x_max = max_id
-            print(f'edges {x} - {x_max} processed')
-
         sql = """
+        ALTER TABLE edges ADD PRIMARY KEY (ogc_fid);
+        CREATE INDEX IF NOT EXISTS edges_geom_gix ON edges USING GIST (geom);
         CREATE INDEX IF NOT EXISTS edges_source_idx ON edges("source");
         CREATE INDEX IF NOT EXISTS edges_target_idx ON edges("target");
+        ANALYZE edges;
         """
         with r.engine.begin() as connection:
             connection.execute(text(sql))
+        print('Done.')
     else:
         print(
             '\nIt appears that the routable pedestrian network has already been set up for use by pgRouting.',
@@ -311,6 +644,9 @@ def create_network_resources(codename):
         )
         create_pgrouting_network_topology(r)
         load_intersections(r, G_proj)
+        print('\nWrite network snapshot... ', end='', flush=True)
+        r.write_network_snapshot()
+        print('Done.')
         # ensure user is granted access to the newly created tables
         with r.engine.begin() as connection:
             connection.execute(text(ghsci.grant_query))
@@ -36,6 +36,7 @@ def population_to_db(r):
             f"""ALTER TABLE {r.config["population_grid"]} ADD grid_id bigserial;""",
             f"""ALTER TABLE {r.config["population_grid"]} RENAME {r.config["population"]["vector_population_data_field"]} TO pop_est;""",
             f"""CREATE INDEX {r.config["population_grid"]}_ix  ON {r.config["population_grid"]} (grid_id);""",
+            f"""DROP TABLE IF EXISTS {r.config["population_grid"]}_lattice;""",
         ]
         for sql in queries:
             with r.engine.begin() as connection:
@@ -49,18 +50,27 @@ def derive_population_grid_variables(r):
         end='',
         flush=True,
     )
+    grid_id = r.grid_bin('i.geom')
+    if grid_id is None:
+        # identify cells of vector grids containing intersections using a spatial join
+        intersection_join = f"""LEFT JOIN {r.config["intersections_table"]} i
+    ON st_contains(h.geom,i.geom)"""
+    else:
+        # identify cells of regular grids containing intersections from their coordinates
+        intersection_join = f"""LEFT JOIN (
+        SELECT {grid_id} AS grid_id FROM {r.config["intersections_table"]} i
+    ) i
+    ON h.grid_id = i.grid_id"""
     queries = [
         f"""ALTER TABLE {r.config["population_grid"]} ADD COLUMN IF NOT EXISTS area_sqkm float;""",
         f"""ALTER TABLE {r.config["population_grid"]} ADD COLUMN IF NOT EXISTS pop_per_sqkm float;""",
         f"""ALTER TABLE {r.config["population_grid"]} ADD COLUMN IF NOT EXISTS intersection_count int;""",
         f"""ALTER TABLE {r.config["population_grid"]} ADD COLUMN IF NOT EXISTS intersections_per_sqkm float;""",
         f"""
-    DELETE FROM {r.config["population_grid"]}
-        WHERE {r.config["population_grid"]}.grid_id NOT IN (
-            SELECT p.grid_id
-            FROM
-                {r.config["population_grid"]} p,
-                {r.config["buffered_urban_study_region"]} b
+    DELETE FROM {r.config["population_grid"]} p
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM {r.config["buffered_urban_study_region"]}_subdivided b
             WHERE ST_Intersects (
                 p.geom,
                 b.geom
@@ -70,13 +80,14 @@ def derive_population_grid_variables(r):
         f"""UPDATE {r.config["population_grid"]} SET area_sqkm = ST_Area(geom)/10^6;""",
         f"""UPDATE {r.config["population_grid"]} SET pop_per_sqkm = {r._get_population_denominator()}/area_sqkm;""",
         f"""
-    CREATE MATERIALIZED VIEW pop_temp AS
+    DROP TABLE IF EXISTS pop_temp;
+    CREATE UNLOGGED TABLE pop_temp AS
     SELECT h."grid_id",
             COUNT(i.*) intersection_count
     FROM {r.config["population_grid"]} h
-    LEFT JOIN {r.config["intersections_table"]} i
-    ON st_contains(h.geom,i.geom)
-    GROUP BY "grid_id";
+    {intersection_join}
+    GROUP BY h."grid_id";
+    ANALYZE pop_temp;
     """,
         f"""
     UPDATE {r.config["population_grid"]} a
@@ -85,7 +96,7 @@ def derive_population_grid_variables(r):
         FROM pop_temp b
     WHERE a."grid_id" = b."grid_id";
     """,
-        """DROP MATERIALIZED VIEW pop_temp;""",
+        """DROP TABLE pop_temp;""",
         """
     ALTER TABLE urban_study_region ADD COLUMN IF NOT EXISTS area_sqkm double precision;
     ALTER TABLE urban_study_region ADD COLUMN IF NOT EXISTS pop_est int;
@@ -110,7 +121,12 @@ def derive_population_grid_variables(r):
                 SUM(p.intersection_count) intersection_count
             FROM urban_study_region u,
                     {r.config['population_grid']} p
-            WHERE ST_Intersects(u.geom,p.geom)
+            WHERE EXISTS (
+                SELECT 1
+                FROM urban_study_region_subdivided s
+                WHERE s."study_region" = u."study_region"
+                AND ST_Intersects(s.geom,p.geom)
+            )
             GROUP BY u."study_region",u.geom
             ) b
         WHERE a.study_region = b.study_region;
@@ -15,9 +15,142 @@ from script_running_log import script_running_log
 from sqlalchemy import text
 
 
+def osm_destination_rules(df_osm_dest, skip_dest_names=None):
+    """Return the key/value rules for destinations identified by any matching tag, and their descriptions.
+
+    Destinations having 'AND' or 'NOT' pre-conditions are excluded, as these
+    are identified using combined conditions (see compile_osm_destinations).
+
+    Parameters
+    ----------
+    df_osm_dest : pandas.DataFrame
+        OpenStreetMap destination definitions (i.e. ghsci.df_osm_dest).
+    skip_dest_names : set, optional
+        dest_name keys to skip.
+
+    Returns
+    -------
+    rules : pandas.DataFrame
+        Unique dest_name, key and value rules, with value None where
+        any value of the key identifies the destination.
+    dest_types : pandas.DataFrame
+        The dest_name_full and domain of each destination in rules.
+    """
+    skip = set(skip_dest_names or set())
+    conditional = set(
+        df_osm_dest.loc[
+            df_osm_dest['pre-condition'].isin(['AND', 'NOT']),
+            'dest_name',
+        ],
+    )
+    df = df_osm_dest[~df_osm_dest['dest_name'].isin(skip | conditional)]
+    rules = (
+        df[['dest_name', 'key', 'value']]
+        .replace({'value': {'NULL': None}})
+        .drop_duplicates()
+        .reset_index(drop=True)
+    )
+    dest_types = (
+        df[['dest_name', 'dest_full_name', 'domain']]
+        .drop_duplicates(subset=['dest_name'])
+        .rename(columns={'dest_full_name': 'dest_name_full'})
+        .reset_index(drop=True)
+    )
+    return rules, dest_types
+
+
+def classify_osm_destinations(r, rules, dest_types):
+    """Import destinations from OpenStreetMap point and polygon layers identified by any matching key/value rule, in a single pass over each layer.
+
+    Rules are loaded to a temporary lookup table, against which the tags of
+    features (as an hstore of their destination key columns) are joined, so
+    that each layer is scanned once rather than once per destination.
+    Features matching more than one rule for a destination are imported once
+    for that destination.
+    """
+    if rules.empty:
+        return
+    keys = sorted(rules['key'].unique())
+    tags = 'hstore(ARRAY[{}], ARRAY[{}])'.format(
+        ', '.join(f"'{key}'" for key in keys),
+        ', '.join(f'd.{key}::text' for key in keys),
+    )
+    with r.engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                CREATE TEMPORARY TABLE osm_destination_rules
+                (dest_name varchar, key text, value text) ON COMMIT DROP;
+                CREATE TEMPORARY TABLE osm_destination_types
+                (dest_name varchar PRIMARY KEY, dest_name_full varchar, domain varchar)
+                ON COMMIT DROP;
+                """,
+            ),
+        )
+        connection.execute(
+            text(
+                'INSERT INTO osm_destination_rules VALUES (:dest_name, :key, :value);',
+            ),
+            rules.to_dict('records'),
+        )
+        connection.execute(
+            text(
+                'INSERT INTO osm_destination_types VALUES (:dest_name, :dest_name_full, :domain);',
+            ),
+            dest_types.to_dict('records'),
+        )
+        connection.execute(
+            text(
+                """
+                CREATE INDEX ON osm_destination_rules (key, value);
+                ANALYZE osm_destination_rules;
+                ANALYZE osm_destination_types;
+                """,
+            ),
+        )
+        for layer, geom in [
+            ('point', 'd.geom'),
+            ('polygon', 'ST_Centroid(d.geom)'),
+        ]:
+            classify_destinations = f"""
+              INSERT INTO destinations (osm_id, dest_name, dest_name_full, geom)
+              SELECT d.osm_id, t.dest_name, t.dest_name_full, {geom}
+                FROM {r.config["osm_prefix"]}_{layer} d
+                CROSS JOIN LATERAL (
+                    SELECT DISTINCT rule.dest_name
+                      FROM each({tags}) tag
+                      JOIN osm_destination_rules rule
+                        ON rule.key = tag.key
+                       AND COALESCE(rule.value, tag.value) = tag.value
+                ) m
+                JOIN osm_destination_types t ON t.dest_name = m.dest_name
+               ORDER BY t.dest_name;
+            """
+            connection.execute(text(classify_destinations))
+        summarise_dest_type = """
+            INSERT INTO dest_type (dest_name, dest_name_full, domain, count)
+            SELECT t.dest_name,
+                   t.dest_name_full,
+                   t.domain,
+                   COUNT(*)
+              FROM destinations d
+              JOIN osm_destination_types t ON t.dest_name = d.dest_name
+             GROUP BY t.dest_name, t.dest_name_full, t.domain
+            RETURNING dest_name, count;
+        """
+        dest_counts = connection.execute(text(summarise_dest_type)).all()
+    # print destination name and tally which have been imported
+    for dest, dest_count in sorted(dest_counts):
+        print(f'\n{dest:50} {dest_count:=10d}')
+
+
 def compile_osm_destinations(r, skip_dest_names=None):
     """Import destinations from OpenStreetMap point and polygon layers.
 
+    Destinations identified by any matching tag are classified in a single
+    pass (see classify_osm_destinations), while those having 'AND' or 'NOT'
+    pre-conditions are imported individually using combined conditions.
+
     Parameters
     ----------
     r : ghsci.Region
@@ -33,9 +166,12 @@ def compile_osm_destinations(r, skip_dest_names=None):
     ghsci.df_osm_dest['pre-condition'] = ghsci.df_osm_dest[
         'pre-condition'
     ].replace('NULL', 'OR')
+    rules, dest_types = osm_destination_rules(ghsci.df_osm_dest, skip)
+    classify_osm_destinations(r, rules, dest_types)
+    classified = set(dest_types['dest_name'])
     for row in df_osm_dest_unique.itertuples():
         dest = getattr(row, 'dest_name')
-        if dest in skip:
+        if dest in skip or dest in classified:
             continue
         dest_name_full = getattr(row, 'dest_full_name')
         domain = getattr(row, 'domain')
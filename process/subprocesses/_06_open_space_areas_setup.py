@@ -6,12 +6,48 @@ Prepare Areas of Open Space (AOS) for urban liveability indicators.
 
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up project and region parameters for GHSCIC analyses
 import ghsci
+import numpy as np
+import pandas as pd
 from script_running_log import script_running_log
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
 from sqlalchemy import inspect, text
 
+# Open spaces within this distance of one another are clustered as an Area of Open Space (AOS)
+open_space_cluster_tolerance = 0.001
+
+# Open spaces are clustered within groups, according to their public access
+# and whether they are linear features; linear features that are not
+# acceptable as open space, and waterways, are each an AOS in their own right
+open_space_cluster_group = """CASE
+    WHEN linear_features IS TRUE THEN 'waterway'
+    WHEN linear_features IS NOT NULL THEN NULL
+    WHEN (public_access IS TRUE
+        OR
+        (public_access IS FALSE
+            AND
+            within_public IS TRUE
+            AND (acceptable_linear_feature IS TRUE
+                OR
+                linear_feature IS FALSE)))
+    AND (linear_feature IS FALSE
+            OR
+            (acceptable_linear_feature IS TRUE
+            ))
+        THEN 'public'
+    WHEN public_access IS FALSE
+    AND within_public IS FALSE
+        THEN 'not_public'
+    WHEN linear_feature IS TRUE
+    AND acceptable_linear_feature IS FALSE
+    AND public_access IS TRUE
+        THEN 'linear'
+    END"""
+
 
 def add_required_osm_tags(r):
     """Define tags for which presence of values is suggestive of some kind of open space, given configuration parameter ('required tags')."""
@@ -32,6 +68,243 @@ def add_required_osm_tags(r):
             connection.execute(text(required_tags))
 
 
+def execute_queries(r, queries):
+    """Execute a list of SQL queries in turn, reporting the time taken by each."""
+    for sql in queries:
+        query_start = time.time()
+        print(f'\nExecuting: {sql}')
+        with r.engine.begin() as connection:
+            connection.execute(text(sql))
+        print(f'Executed in {(time.time() - query_start) / 60:04.2f} mins')
+
+
+def open_space_cluster_labels_query(source='open_space', where='TRUE'):
+    """Return a query labelling open spaces by their cluster group and cluster, using ST_ClusterDBSCAN with minpoints of 1 as a window function.
+
+    With a minimum of one point, DBSCAN clusters comprise geometries connected by chains of geometries within the cluster tolerance of one another, as for ST_ClusterWithin; however, clusters are identified as labels of open spaces rather than as geometry collections to be matched back to their open spaces.  Open spaces that are not clustered are labelled using their os_id.
+    """
+    return f"""
+    WITH candidates AS (
+        SELECT os_id, geom, {open_space_cluster_group} AS cluster_group
+        FROM {source}
+        WHERE {where}
+    )
+    SELECT os_id,
+           cluster_group,
+           ST_ClusterDBSCAN(
+               geom,
+               eps := {open_space_cluster_tolerance},
+               minpoints := 1
+           ) OVER (PARTITION BY cluster_group) AS cluster
+    FROM candidates
+    WHERE cluster_group IN ('public', 'not_public')
+    UNION ALL
+    SELECT os_id, cluster_group, os_id AS cluster
+    FROM candidates
+    WHERE cluster_group IN ('linear', 'waterway')
+    """
+
+
+def merge_tile_clusters(labels):
+    """Return Area of Open Space identifiers (aos_id) for open spaces given their cluster labels within each of a set of overlapping tiles.
+
+    Clusters identified within different tiles sharing an open space are merged, as connected components of a graph linking open spaces with their tile clusters.  Areas of open space are numbered from 1 in the order of their lowest os_id.
+    """
+    if len(labels) == 0:
+        return pd.DataFrame(
+            {
+                'os_id': pd.Series(dtype='int64'),
+                'aos_id': pd.Series(dtype='int64'),
+            },
+        )
+    os_ids, os_index = np.unique(
+        labels['os_id'].to_numpy('int64'),
+        return_inverse=True,
+    )
+    cluster_index = labels.groupby(
+        ['tile_id', 'cluster_group', 'cluster'],
+        dropna=False,
+    ).ngroup()
+    n = len(os_ids)
+    adjacency = sparse.coo_matrix(
+        (
+            np.ones(len(labels), dtype=np.int8),
+            (os_index, n + cluster_index.to_numpy()),
+        ),
+        shape=(n + cluster_index.max() + 1, n + cluster_index.max() + 1),
+    )
+    components = connected_components(adjacency, directed=False)[1][:n]
+    # os_ids are sorted, so the first os_id of each component is its lowest
+    first = pd.Series(os_ids).groupby(components).transform('first')
+    return pd.DataFrame(
+        {
+            'os_id': os_ids,
+            'aos_id': first.rank(method='dense').astype('int64').to_numpy(),
+        },
+    )
+
+
+def open_space_clusters(
+    r,
+    method='database',
+    source='open_space',
+    table='open_space_clusters',
+    tile_size=None,
+):
+    """Record the Area of Open Space (aos_id) of each open space (os_id) in a table, clustering open spaces within a small distance of one another.
+
+    Clusters are identified using ST_ClusterDBSCAN over the whole study region ('database'), or within tiles having a halo exceeding the cluster tolerance, whose clusters are then merged ('tiles'); the latter bounds the number of geometries clustered at once for regions with very many open spaces, with equivalent results.  Areas of open space are numbered from 1 in the order of their lowest os_id.
+    """
+    if method == 'tiles':
+        srid = r.config['crs']['srid']
+        tiles = r.get_tiles(
+            tile_size=tile_size,
+            halo=2 * open_space_cluster_tolerance,
+            table=source,
+        )
+
+        def tile_labels(tile):
+            xmin, ymin, xmax, ymax = tile['extent']
+            labels = r.get_df(
+                open_space_cluster_labels_query(
+                    source,
+                    f'geom && ST_MakeEnvelope({xmin}, {ymin}, {xmax}, {ymax}, {srid})',
+                ),
+            )
+            return labels.assign(tile_id=tile['tile_id'])
+
+        processes = ghsci.settings['project'].get('multiprocessing', 1) or 1
+        with ThreadPoolExecutor(max_workers=processes) as executor:
+            tile_label_list = list(executor.map(tile_labels, tiles))
+        if len(tile_label_list) > 0:
+            labels = pd.concat(tile_label_list, ignore_index=True)
+        else:
+            labels = pd.DataFrame(
+                columns=['os_id', 'cluster_group', 'cluster', 'tile_id'],
+            )
+        clusters = merge_tile_clusters(labels)
+        clusters.to_sql(table, r.engine, if_exists='replace', index=False)
+    elif method == 'database':
+        with r.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"""
+                DROP TABLE IF EXISTS {table};
+                CREATE TABLE {table} AS
+                SELECT os_id,
+                       dense_rank() OVER (ORDER BY cluster_os_id) AS aos_id
+                FROM (
+                    SELECT os_id,
+                           min(os_id) OVER (PARTITION BY cluster_group, cluster) AS cluster_os_id
+                    FROM ({open_space_cluster_labels_query(source)}) labels
+                ) t;
+                """,
+                ),
+            )
+    else:
+        raise ValueError(
+            f"Open space clustering method must be 'database' or 'tiles' (received '{method}').",
+        )
+    with r.engine.begin() as connection:
+        connection.execute(
+            text(
+                f"""
+            CREATE UNIQUE INDEX {table}_idx ON {table} (os_id);
+            ANALYZE {table};
+            """,
+            ),
+        )
+
+
+def create_open_space_areas(r):
+    """Create the Areas of Open Space (AOS) table, aggregating clusters of open space.
+
+    Open space is clustered using ST_ClusterDBSCAN by default (see open_space_clusters); the previous ST_ClusterWithin approach remains available using the region setting open_space_clustering: within.
+    """
+    method = r.config['open_space_clustering']
+    if method == 'within':
+        sql = f"""
+-- Create Areas of Open Space (AOS) table
+-- the 'geom' attributes is the area within an AOS
+--    -- this is what we want to use to evaluate collective OS area within the AOS (aos_ha)
+
+-- DROP TABLE IF EXISTS open_space_areas;
+CREATE TABLE IF NOT EXISTS open_space_areas AS
+WITH clusters AS(
+    SELECT unnest(ST_ClusterWithin(open_space.geom, {open_space_cluster_tolerance})) AS gc
+    FROM open_space
+    WHERE (public_access IS TRUE
+        OR
+        (public_access IS FALSE
+            AND
+            within_public IS TRUE
+            AND (acceptable_linear_feature IS TRUE
+                OR
+                linear_feature IS FALSE)))
+    AND (linear_feature IS FALSE
+            OR
+            (acceptable_linear_feature IS TRUE
+            ))
+    AND linear_features IS NULL
+UNION
+    SELECT unnest(ST_ClusterWithin(not_public_os.geom, {open_space_cluster_tolerance})) AS gc
+    FROM open_space AS not_public_os
+    WHERE public_access IS FALSE
+    AND within_public IS FALSE
+    AND linear_features IS NULL
+UNION
+    SELECT  linear_os.geom AS gc
+    FROM open_space AS linear_os
+    WHERE (linear_feature IS TRUE
+    AND acceptable_linear_feature IS FALSE
+    AND public_access IS TRUE
+    AND linear_features IS NULL)
+UNION
+    SELECT  waterway_os.geom AS gc
+    FROM open_space AS waterway_os
+    WHERE linear_features IS TRUE
+    )
+, unclustered AS( --unpacking GeomCollections
+    SELECT row_number() OVER () AS cluster_id, (ST_DUMP(gc)).geom AS geom
+    FROM clusters)
+SELECT cluster_id as aos_id,
+    jsonb_agg(jsonb_strip_nulls(to_jsonb((SELECT d FROM (SELECT {ghsci.osm_open_space['os_add_as_tags']['criteria']}) d))
+        || hstore_to_jsonb(tags)
+        || jsonb_build_object('tags_line',tags_line)
+        || jsonb_build_object('tags_point',tags_point))) AS attributes,
+    COUNT(1) AS numgeom,
+    ST_Union(geom_public) AS geom_public,
+    ST_Union(geom_not_public) AS geom_not_public,
+    ST_Union(water_geom) AS geom_water,
+    ST_Union(geom) AS geom
+    FROM open_space
+    INNER JOIN unclustered USING(geom)
+    GROUP BY cluster_id;
+"""
+    else:
+        open_space_clusters(r, method)
+        sql = f"""
+-- Create Areas of Open Space (AOS) table
+-- the 'geom' attributes is the area within an AOS
+--    -- this is what we want to use to evaluate collective OS area within the AOS (aos_ha)
+CREATE TABLE IF NOT EXISTS open_space_areas AS
+SELECT aos_id,
+    jsonb_agg(jsonb_strip_nulls(to_jsonb((SELECT d FROM (SELECT {ghsci.osm_open_space['os_add_as_tags']['criteria']}) d))
+        || hstore_to_jsonb(tags)
+        || jsonb_build_object('tags_line',tags_line)
+        || jsonb_build_object('tags_point',tags_point))) AS attributes,
+    COUNT(1) AS numgeom,
+    ST_Union(geom_public) AS geom_public,
+    ST_Union(geom_not_public) AS geom_not_public,
+    ST_Union(water_geom) AS geom_water,
+    ST_Union(geom) AS geom
+    FROM open_space
+    INNER JOIN open_space_clusters USING(os_id)
+    GROUP BY aos_id;
+"""
+    execute_queries(r, [sql])
+
+
 def aos_setup_queries(r):
     """A set of queries used to set up a dataset of open space areas using OpenStreetMap data, given a set of configuration definitions."""
     if 'aos_public_large_nodes_30m_line' in r.tables:
@@ -254,64 +527,10 @@ ALTER TABLE open_space ADD COLUMN IF NOT EXISTS geom_not_public geometry;
 UPDATE open_space SET geom_public = geom WHERE public_access = TRUE;
 UPDATE open_space SET geom_not_public = geom WHERE public_access = FALSE;
 """,
-            f"""
--- Create Areas of Open Space (AOS) table
--- the 'geom' attributes is the area within an AOS
---    -- this is what we want to use to evaluate collective OS area within the AOS (aos_ha)
-
--- DROP TABLE IF EXISTS open_space_areas;
-CREATE TABLE IF NOT EXISTS open_space_areas AS
-WITH clusters AS(
-    SELECT unnest(ST_ClusterWithin(open_space.geom, .001)) AS gc
-    FROM open_space
-    WHERE (public_access IS TRUE
-        OR
-        (public_access IS FALSE
-            AND
-            within_public IS TRUE
-            AND (acceptable_linear_feature IS TRUE
-                OR
-                linear_feature IS FALSE)))
-    AND (linear_feature IS FALSE
-            OR
-            (acceptable_linear_feature IS TRUE
-            ))
-    AND linear_features IS NULL
-UNION
-    SELECT unnest(ST_ClusterWithin(not_public_os.geom, .001)) AS gc
-    FROM open_space AS not_public_os
-    WHERE public_access IS FALSE
-    AND within_public IS FALSE
-    AND linear_features IS NULL
-UNION
-    SELECT  linear_os.geom AS gc
-    FROM open_space AS linear_os
-    WHERE (linear_feature IS TRUE
-    AND acceptable_linear_feature IS FALSE
-    AND public_access IS TRUE
-    AND linear_features IS NULL)
-UNION
-    SELECT  waterway_os.geom AS gc
-    FROM open_space AS waterway_os
-    WHERE linear_features IS TRUE
-    )
-, unclustered AS( --unpacking GeomCollections
-    SELECT row_number() OVER () AS cluster_id, (ST_DUMP(gc)).geom AS geom
-    FROM clusters)
-SELECT cluster_id as aos_id,
-    jsonb_agg(jsonb_strip_nulls(to_jsonb((SELECT d FROM (SELECT {ghsci.osm_open_space['os_add_as_tags']['criteria']}) d))
-        || hstore_to_jsonb(tags)
-        || jsonb_build_object('tags_line',tags_line)
-        || jsonb_build_object('tags_point',tags_point))) AS attributes,
-    COUNT(1) AS numgeom,
-    ST_Union(geom_public) AS geom_public,
-    ST_Union(geom_not_public) AS geom_not_public,
-    ST_Union(water_geom) AS geom_water,
-    ST_Union(geom) AS geom
-    FROM open_space
-    INNER JOIN unclustered USING(geom)
-    GROUP BY cluster_id;
-""",
+        ]
+        execute_queries(r, aos_setup_queries)
+        create_open_space_areas(r)
+        aos_summary_queries = [
             """
 CREATE UNIQUE INDEX aos_idx ON open_space_areas (aos_id);
 CREATE INDEX idx_aos_jsb ON open_space_areas USING GIN (attributes);
@@ -346,84 +565,202 @@ UPDATE open_space_areas SET water_percent = 0;
 UPDATE open_space_areas SET water_percent = 100 * aos_ha_water/aos_ha::numeric WHERE aos_ha > 0;
 """,
         ]
-        for sql in aos_setup_queries:
-            query_start = time.time()
-            print(f'\nExecuting: {sql}')
-            with r.engine.begin() as connection:
-                connection.execute(text(sql))
-            print(f'Executed in {(time.time() - query_start) / 60:04.2f} mins')
+        execute_queries(r, aos_summary_queries)
 
 
-def public_open_space_nodes_setup_query(r):
-    public_open_space_nodes_setup_query = [
+def aos_entry_points_by_nodes(
+    r,
+    any_table='aos_public_any_nodes_30m_line',
+    large_table='aos_public_large_nodes_30m_line',
+):
+    """Identify entry points of public open space by generating points every 20m along the boundaries of all areas of open space, and retaining those within 30m of the pedestrian network.
+
+    This was the approach used prior to aos_entry_points, which gives the same results more efficiently; it is retained for comparison.
+    """
+    queries = [
         f"""
     -- Create a linestring aos table
     DROP TABLE IF EXISTS aos_line;
-    CREATE TABLE IF NOT EXISTS aos_line AS
+    CREATE UNLOGGED TABLE IF NOT EXISTS aos_line AS
     WITH bounds AS
-    (SELECT aos_id, ST_SetSRID(st_astext((ST_Dump(geom)).geom),{r.config['crs']['srid']}) AS geom  FROM open_space_areas)
-    SELECT aos_id, ST_Length(geom)::numeric AS length, geom
-    FROM (SELECT aos_id, ST_ExteriorRing(geom) AS geom FROM bounds) t;
+    (SELECT a.aos_id, COALESCE(d.path[1], 1) AS part, ST_SetSRID(st_astext(d.geom),{r.config['crs']['srid']}) AS geom  FROM open_space_areas a, ST_Dump(a.geom) d)
+    SELECT aos_id, part, ST_Length(geom)::numeric AS length, geom
+    FROM (SELECT aos_id, part, ST_ExteriorRing(geom) AS geom FROM bounds) t;
+    ANALYZE aos_line;
     """,
         """
-    -- Generate a point every 20m along a park outlines:
+    -- Generate a point every 20m along a park outlines, numbered in order
+    -- along each of an area's boundaries in turn
     DROP TABLE IF EXISTS aos_nodes;
-    CREATE TABLE IF NOT EXISTS aos_nodes AS
+    CREATE UNLOGGED TABLE IF NOT EXISTS aos_nodes AS
     WITH aos AS
     (SELECT aos_id,
+            part,
             length,
             generate_series(0,1,20/length) AS fraction,
             geom FROM aos_line)
     SELECT aos_id,
-        row_number() over(PARTITION BY aos_id) AS node,
+        row_number() over(PARTITION BY aos_id ORDER BY part, fraction) AS node,
         ST_LineInterpolatePoint(geom, fraction)  AS geom
     FROM aos;
 
     CREATE INDEX aos_nodes_idx ON aos_nodes USING GIST (geom);
     ALTER TABLE aos_nodes ADD COLUMN IF NOT EXISTS aos_entryid varchar;
     UPDATE aos_nodes SET aos_entryid = aos_id::text || ',' || node::text;
+    ANALYZE aos_nodes;
     """,
-        """
-    -- Create subset data for public_open_space_areas
-    DROP TABLE IF EXISTS aos_public;
-    CREATE TABLE IF NOT EXISTS aos_public AS
-    -- restrict to features > 10 sqm (e.g. 5m x 2m; this is very small, but plausible - and should be excluded)
-    SELECT * FROM open_space_areas WHERE aos_ha_public > 0.001;
-    CREATE INDEX aos_public_idx ON aos_public (aos_id);
-    CREATE INDEX aos_public_gix ON aos_public USING GIST (geom);
-    """,
-        """
+        f"""
     -- Create table of points within 30m of lines (should be your road network)
     -- Distinct is used to avoid redundant duplication of points where they are within 20m of multiple roads
-    DROP TABLE IF EXISTS aos_public_any_nodes_30m_line;
-    CREATE TABLE IF NOT EXISTS aos_public_any_nodes_30m_line AS
+    DROP TABLE IF EXISTS {any_table};
+    CREATE TABLE IF NOT EXISTS {any_table} AS
     SELECT DISTINCT n.*
     FROM aos_nodes n LEFT JOIN aos_public a ON n.aos_id = a.aos_id,
         edges l
     WHERE a.aos_id IS NOT NULL
     AND ST_DWithin(n.geom ,l.geom,30);
-    CREATE INDEX aos_public_any_nodes_30m_line_gix ON aos_public_any_nodes_30m_line USING GIST (geom);
+    CREATE INDEX {any_table}_gix ON {any_table} USING GIST (geom);
     """,
-        """
+        f"""
     -- Create table of points within 30m of lines (should be your road network)
     -- Distinct is used to avoid redundant duplication of points where they are within 20m of multiple roads
-     DROP TABLE IF EXISTS aos_public_large_nodes_30m_line;
-    CREATE TABLE IF NOT EXISTS aos_public_large_nodes_30m_line AS
+     DROP TABLE IF EXISTS {large_table};
+    CREATE TABLE IF NOT EXISTS {large_table} AS
     SELECT DISTINCT n.*
     FROM aos_nodes n LEFT JOIN aos_public a ON n.aos_id = a.aos_id,
         edges l
     WHERE a.aos_id IS NOT NULL
     AND a.aos_ha_public > 1.5
     AND ST_DWithin(n.geom ,l.geom,30);
-    CREATE INDEX aos_public_large_nodes_30m_line_gix ON aos_public_large_nodes_30m_line USING GIST (geom);
+    CREATE INDEX {large_table}_gix ON {large_table} USING GIST (geom);
     """,
     ]
-    for sql in public_open_space_nodes_setup_query:
-        query_start = time.time()
-        print(f'\nExecuting: {sql}')
-        with r.engine.begin() as connection:
-            connection.execute(text(sql))
-        print(f'Executed in {(time.time() - query_start) / 60:04.2f} mins')
+    execute_queries(r, queries)
+
+
+def aos_entry_points(
+    r,
+    any_table='aos_public_any_nodes_30m_line',
+    large_table='aos_public_large_nodes_30m_line',
+):
+    """Identify entry points of public open space: points every 20m along the boundaries of areas of public open space, within 30m of the pedestrian network.
+
+    Boundaries are first intersected with buffered edges of the pedestrian network within 30m of them, using the spatial index of edges, so that points are only interpolated at intervals along portions of boundaries within reach of the network, before confirming their distance from it.  Points are numbered along each area's boundaries as if every 20m interval had been generated (see aos_entry_points_by_nodes), so entry points retain their identifiers.  Large areas of public open space (over 1.5 hectares) are a subset of these.
+    """
+    queries = [
+        f"""
+    -- Create table of points every 20m along public open space boundaries within 30m of lines (should be your road network)
+    DROP TABLE IF EXISTS {any_table};
+    CREATE TABLE IF NOT EXISTS {any_table} AS
+    WITH rings AS (
+        SELECT a.aos_id,
+               COALESCE(d.path[1], 1) AS part,
+               ST_ExteriorRing(d.geom) AS geom
+        FROM aos_public a, ST_Dump(a.geom) d
+    ),
+    lines AS (
+        SELECT aos_id,
+               part,
+               geom,
+               20/ST_Length(geom)::numeric AS step,
+               (SELECT count(*) FROM generate_series(0, 1, 20/ST_Length(geom)::numeric)) AS nodes
+        FROM rings
+    ),
+    boundaries AS (
+        -- node numbering continues across the boundaries of each area
+        SELECT *,
+               COALESCE(
+                   sum(nodes) OVER (
+                       PARTITION BY aos_id
+                       ORDER BY part
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ),
+                   0
+               ) AS node_offset
+        FROM lines
+    ),
+    pieces AS (
+        -- portions of boundaries within reach of nearby edges, with a 1m margin
+        SELECT b.aos_id,
+               b.part,
+               (ST_Dump(ST_Intersection(b.geom, ST_Buffer(l.geom, 31)))).geom AS geom
+        FROM boundaries b, edges l
+        WHERE ST_DWithin(b.geom, l.geom, 30)
+    ),
+    located AS (
+        SELECT p.aos_id,
+               p.part,
+               ST_LineLocatePoint(b.geom, ST_StartPoint(p.geom)) AS f0,
+               ST_LineLocatePoint(b.geom, ST_LineInterpolatePoint(p.geom, 0.5)) AS fm,
+               ST_LineLocatePoint(b.geom, ST_EndPoint(p.geom)) AS f1
+        FROM pieces p
+        JOIN boundaries b USING (aos_id, part)
+        WHERE ST_Dimension(p.geom) = 1
+    ),
+    candidates AS (
+        -- node intervals within each portion; portions wrapping around the
+        -- start of a boundary are taken to include all of its nodes
+        SELECT DISTINCT
+               b.aos_id,
+               b.part,
+               generate_series(
+                   GREATEST(floor(CASE WHEN f0 <= fm AND fm <= f1 THEN f0 ELSE 0 END / b.step) - 1, 0)::bigint,
+                   LEAST(ceil(CASE WHEN f0 <= fm AND fm <= f1 THEN f1 ELSE 1 END / b.step) + 1, b.nodes - 1)::bigint
+               ) AS i
+        FROM located x
+        JOIN boundaries b USING (aos_id, part)
+    ),
+    points AS (
+        SELECT c.aos_id,
+               (b.node_offset + c.i + 1)::bigint AS node,
+               ST_LineInterpolatePoint(b.geom, c.i * b.step) AS geom
+        FROM candidates c
+        JOIN boundaries b USING (aos_id, part)
+    )
+    SELECT aos_id,
+           node,
+           geom,
+           (aos_id::text || ',' || node::text)::varchar AS aos_entryid
+    FROM points n
+    WHERE EXISTS (
+        SELECT 1 FROM edges l
+        WHERE ST_DWithin(n.geom, l.geom, 30)
+    );
+    CREATE INDEX {any_table}_gix ON {any_table} USING GIST (geom);
+    ANALYZE {any_table};
+    """,
+        f"""
+    -- Create table of entry points for large public open space (over 1.5 hectares)
+    DROP TABLE IF EXISTS {large_table};
+    CREATE TABLE IF NOT EXISTS {large_table} AS
+    SELECT n.*
+    FROM {any_table} n
+    WHERE EXISTS (
+        SELECT 1 FROM aos_public a
+        WHERE a.aos_id = n.aos_id
+        AND a.aos_ha_public > 1.5
+    );
+    CREATE INDEX {large_table}_gix ON {large_table} USING GIST (geom);
+    ANALYZE {large_table};
+    """,
+    ]
+    execute_queries(r, queries)
+
+
+def public_open_space_nodes_setup_query(r):
+    public_open_space_nodes_setup_query = [
+        """
+    -- Create subset data for public_open_space_areas
+    DROP TABLE IF EXISTS aos_public;
+    CREATE TABLE IF NOT EXISTS aos_public AS
+    -- restrict to features > 10 sqm (e.g. 5m x 2m; this is very small, but plausible - and should be excluded)
+    SELECT * FROM open_space_areas WHERE aos_ha_public > 0.001;
+    CREATE INDEX aos_public_idx ON aos_public (aos_id);
+    CREATE INDEX aos_public_gix ON aos_public USING GIST (geom);
+    """,
+    ]
+    execute_queries(r, public_open_space_nodes_setup_query)
+    aos_entry_points(r)
 
 
 def custom_open_space_setup(r):
@@ -5,14 +5,157 @@ Calculate and store the distances to the two nearest nodes (node pairs)
 on edges for all sample point origins.  Previously this was also done for destinations at this point, but this has now been re-located to the neighbourhood analysis step in order to process all destinations at once.
 """
 
+import io
 import sys
 import time
 
 import ghsci
+import numpy as np
+import pandas as pd
+import shapely
 from script_running_log import script_running_log
 from sqlalchemy import text
 
 
+def sample_points_along_edges(edges, interval, tolerance=0.001):
+    """Return sample points at a regular interval along network edges, with their distances along the edge to its end nodes.
+
+    Points are located every interval metres from the start of each edge geometry, up to its length.  Points coinciding with points of other edges (i.e. at the junctions of edges), as identified by their coordinates snapped to a grid of the tolerance size, are only retained for the first edge.
+
+    Parameters
+    ----------
+    edges : geopandas.GeoDataFrame
+        Edges having 'ogc_fid', 'from' and 'to' node identifiers, and the
+        locations of these nodes along the edge as fractions of its length
+        ('llp1' and 'llp2'), with LineString geometries.
+    interval : int
+        Sampling interval in metres.
+    tolerance : float, optional
+        Snapping tolerance for identifying coincident points.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Sample points numbered from 1 as point_id, with their edge_ogc_fid,
+        metres along the edge, n1 and n2 node identifiers and rounded
+        n1_distance and n2_distance, and Point geometries.
+    """
+    geoms = edges.geometry.values
+    length = shapely.length(geoms)
+    # intervals from 0 to the length rounded to whole metres, as for generate_series
+    counts = (np.floor(length + 0.5) // interval).astype('int64') + 1
+    edge = np.repeat(np.arange(len(edges)), counts)
+    metres = (
+        np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ) * interval
+    located = metres <= length[edge]
+    edge, metres = edge[located], metres[located]
+    geom = shapely.line_interpolate_point(geoms[edge], metres)
+    keys = np.rint(shapely.get_coordinates(geom) / tolerance).astype('int64')
+    first = np.sort(np.unique(keys, axis=0, return_index=True)[1])
+    edge, metres, geom = edge[first], metres[first], geom[first]
+    points = pd.DataFrame(
+        {
+            'point_id': np.arange(1, len(edge) + 1),
+            'edge_ogc_fid': edges['ogc_fid'].to_numpy()[edge],
+            'metres': metres,
+            'n1': edges['from'].to_numpy()[edge],
+            'n2': edges['to'].to_numpy()[edge],
+        },
+    )
+    for node in ['n1', 'n2']:
+        llp = edges[f'llp{node[1]}'].to_numpy('float64', na_value=np.nan)
+        points[f'{node}_distance'] = pd.Series(
+            np.floor(np.abs(llp[edge] * length[edge] - metres) + 0.5),
+        ).astype('Int64')
+    points['geom'] = geom
+    return points
+
+
+def sample_points_to_db(r, points, additional_sampling_clause=''):
+    """Create a table of sample points every point_sampling_interval metres along network edges within the population grid (or other sampled areas), loaded using a single COPY."""
+    print('\nCreate sampling points along network at a regular interval... ')
+    start_time = time.time()
+    srid = r.config['crs']['srid']
+    edges = r.get_gdf(
+        text(
+            """
+        SELECT e.ogc_fid,
+               e."from",
+               e."to",
+               ST_LineLocatePoint(e.geom, n1.geom) llp1,
+               ST_LineLocatePoint(e.geom, n2.geom) llp2,
+               e.geom
+        FROM edges e
+        LEFT JOIN nodes n1 ON e."from" = n1.osmid
+        LEFT JOIN nodes n2 ON e."to" = n2.osmid
+        """,
+        ),
+        geom_col='geom',
+    )
+    sample_points = sample_points_along_edges(
+        edges,
+        ghsci.settings['sample_points']['point_sampling_interval'],
+    )
+    sample_points['geom'] = shapely.to_wkb(
+        shapely.set_srid(sample_points['geom'].values, srid),
+        hex=True,
+        include_srid=True,
+    )
+    columns = list(sample_points.columns)
+    data = io.StringIO()
+    sample_points.to_csv(
+        data,
+        sep='\t',
+        header=False,
+        index=False,
+        na_rep='\\N',
+    )
+    data.seek(0)
+    with r.engine.begin() as connection:
+        connection.execute(
+            text(
+                f"""
+            DROP TABLE IF EXISTS {points};
+            CREATE TABLE {points} (
+                point_id bigint,
+                edge_ogc_fid bigint,
+                grid_id bigint,
+                metres int,
+                n1 bigint,
+                n2 bigint,
+                n1_distance int,
+                n2_distance int,
+                geom geometry(Point, {srid})
+            );
+            """,
+            ),
+        )
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f'COPY {points} ({", ".join(columns)}) FROM STDIN',
+            data,
+        )
+        connection.execute(
+            text(
+                f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS {points}_ix ON {points} (point_id);
+            CREATE INDEX IF NOT EXISTS {points}_gix ON {points} USING GIST (geom);
+            DELETE FROM {points} p
+            WHERE NOT (
+                EXISTS (
+                    SELECT 1
+                    FROM {r.config['population_grid']} o
+                    WHERE ST_Intersects(p.geom, o.geom)
+                ){additional_sampling_clause}
+            );
+            ANALYZE {points};
+            """,
+            ),
+        )
+    print(f'Completed in {(time.time() - start_time) / 60:.02f} minutes.')
+
+
 def nearest_node_locations(codename):
     """A set of queries used to set up a dataset of open space areas using OpenStreetMap data, given a set of configuration definitions."""
     start = time.time()
@@ -25,7 +168,7 @@ def nearest_node_locations(codename):
     custom_sample_points = sampling.get('custom_sample_points')
     if sample_unpopulated is True:
         # sample the full urban study region regardless of population coverage
-        unpopulated_sampling_areas = 'urban_study_region'
+        unpopulated_sampling_areas = 'urban_study_region_subdivided'
         print(
             'Sampling has been configured to include network within areas lacking population data coverage throughout the urban study region.',
         )
@@ -46,56 +189,12 @@ def nearest_node_locations(codename):
            OR EXISTS (
             SELECT 1
             FROM {unpopulated_sampling_areas} a
-            WHERE ST_Intersects(geometries.geom, a.geom)
+            WHERE ST_Intersects(p.geom, a.geom)
         )"""
     else:
         additional_sampling_clause = ''
+    sample_points_to_db(r, points, additional_sampling_clause)
     sql_queries = {}
-    sql_queries[
-        'Create sampling points along network at a regular interval'
-    ] = f"""
-        DROP TABLE IF EXISTS {points};
-        CREATE TABLE IF NOT EXISTS {points} AS
-        WITH line AS
-                (SELECT
-                    ogc_fid,
-                    (ST_Dump(ST_Transform(geom,{r.config['crs']['srid']}))).geom AS geom
-                FROM edges),
-            linemeasure AS
-                (SELECT
-                    ogc_fid,
-                    ST_AddMeasure(line.geom, 0, ST_Length(line.geom)) AS linem,
-                    generate_series(0, ST_Length(line.geom)::int, {ghsci.settings['sample_points']['point_sampling_interval']}) AS metres
-                FROM line),
-            geometries AS (
-                SELECT
-                    ogc_fid,
-                    metres,
-                    (ST_Dump(ST_GeometryN(ST_LocateAlong(linem, metres), 1))).geom AS geom
-                FROM linemeasure)
-        SELECT
-            row_number() OVER() AS point_id,
-            geometries.ogc_fid,
-            geometries.metres,
-            ST_SetSRID(ST_MakePoint(ST_X(geometries.geom), ST_Y(geometries.geom)), {r.config['crs']['srid']}) AS geom
-        FROM geometries
-        WHERE EXISTS (
-            SELECT 1
-            FROM {r.config['population_grid']} p
-            WHERE ST_Intersects(geometries.geom, p.geom)
-        ){additional_sampling_clause};
-        CREATE UNIQUE INDEX IF NOT EXISTS {points}_idx ON {points} (point_id);
-        CREATE INDEX IF NOT EXISTS {points}_geom_idx ON {points} USING GIST (geom);
-        """
-    sql_queries[
-        'Only retain point locations with unique geometries (discard duplicates co-located at junction of edges, retaining only single point)'
-    ] = f"""
-        DELETE FROM {points} a
-            USING {points} b
-        WHERE a.point_id > b.point_id
-          AND st_equals(a.geom, b.geom)
-          AND a.geom && b.geom;
-        """
     sql_queries[
         'Delete any sampling points which were created within the bounds of areas of open space (ie. along paths through parks)...'
     ] = f"""
@@ -135,75 +234,53 @@ def nearest_node_locations(codename):
             source=custom_sample_points,
             layer='sampling_points_custom',
         )
+        # points are snapped using the snapping cache, so that on reruns only
+        # new or moved points are located along the network
+        with r.engine.begin() as connection:
+            connection.execute(
+                text(
+                    """
+            CREATE INDEX IF NOT EXISTS edges_geom_gix ON edges USING GIST (geom);
+            DROP TABLE IF EXISTS sampling_points_custom_snapped;
+            CREATE TABLE sampling_points_custom_snapped AS
+            SELECT (ST_Dump(geom)).geom AS geom
+            FROM sampling_points_custom;
+            """,
+                ),
+            )
+        r.add_nearest_node_associations('sampling_points_custom_snapped')
         sql_queries[
             'Insert custom sample points, snapped to their nearest network edge...'
         ] = f"""
-        CREATE INDEX IF NOT EXISTS edges_geom_gix ON edges USING GIST (geom);
-        INSERT INTO {points} (point_id, ogc_fid, metres, geom)
+        INSERT INTO {points} (point_id, edge_ogc_fid, metres, n1, n2, n1_distance, n2_distance, geom)
         SELECT (SELECT COALESCE(MAX(point_id), 0) FROM {points})
                 + row_number() OVER () AS point_id,
-            e.ogc_fid,
-            (ST_LineLocatePoint(e.geom, c.geom) * ST_Length(e.geom))::int AS metres,
-            ST_ClosestPoint(e.geom, c.geom) AS geom
-        FROM (
-            SELECT (ST_Dump(geom)).geom AS geom
-            FROM sampling_points_custom
-        ) c
-        CROSS JOIN LATERAL (
-            SELECT ogc_fid, geom
-            FROM edges
-            ORDER BY geom <-> c.geom
-            LIMIT 1
-        ) e
-        WHERE ST_Distance(e.geom, c.geom) <= {sampling.get('custom_sample_points_snap_tolerance', 500)};
+            c.edge_ogc_fid,
+            (ST_LineLocatePoint(e.geom, c.match_point_geom) * ST_Length(e.geom))::int AS metres,
+            c.n1,
+            c.n2,
+            c.n1_distance,
+            c.n2_distance,
+            c.match_point_geom AS geom
+        FROM sampling_points_custom_snapped c
+        JOIN edges e ON e.ogc_fid = c.edge_ogc_fid
+        WHERE c.match_point_distance <= {sampling.get('custom_sample_points_snap_tolerance', 500)};
         """
+    grid_id = r.grid_bin('p.geom')
+    if grid_id is None:
+        grid_join = 'ST_Intersects(o.geom, p.geom)'
+    else:
+        grid_join = f'o.grid_id = {grid_id}'
     sql_queries[
-        'Create new columns and indices for sampling point edge and node relations'
+        'Associate sampling points with population grid cells, and index'
     ] = f"""
-        -- Split query in two parts to avoid memory errors
-        -- Both parts of full query took just over 30 seconds for Bangkok (1472479 sampling points
-        -- part 1
-        DROP TABLE IF EXISTS sampling_locate_line;
-        CREATE TABLE sampling_locate_line AS
-        SELECT  s.point_id,
-                s.ogc_fid edge_ogc_fid,
-                o.grid_id,
-                s.metres,
-                "from" n1,
-                "to" n2,
-                e.geom AS edge_geom,
-                ST_LineLocatePoint(e.geom, n1.geom) llp1,
-                ST_LineLocatePoint(e.geom, s.geom) llpm,
-                ST_LineLocatePoint(e.geom, n2.geom) llp2,
-                s.geom
-            FROM {points} s
-            LEFT JOIN edges e  ON s.ogc_fid = e.ogc_fid
-            LEFT JOIN nodes n1 ON e."from" = n1.osmid
-            LEFT JOIN nodes n2 ON e."to" = n2.osmid
-            LEFT JOIN {r.config['population_grid']} o
-                ON ST_Intersects(o.geom,s.geom);
-
-        -- part 2 (split to save memory on parallel worker query)
-        DROP TABLE IF EXISTS sampling_temp;
-        CREATE TABLE sampling_temp AS
-        SELECT point_id,
-               edge_ogc_fid,
-               grid_id,
-               metres,
-               n1,
-               n2,
-               ST_Length(ST_LineSubstring(t.edge_geom, LEAST(t.llp1,t.llpm),GREATEST(t.llp1,t.llpm)))::int n1_distance,
-               ST_Length(ST_LineSubstring(t.edge_geom, LEAST(t.llp2,t.llpm),GREATEST(t.llp2,t.llpm)))::int n2_distance,
-               t.geom
-        FROM sampling_locate_line t;
-        DROP TABLE {points};
-        DROP TABLE sampling_locate_line;
-        ALTER TABLE sampling_temp RENAME TO {points};
-        CREATE UNIQUE INDEX IF NOT EXISTS {points}_ix ON {points} (point_id);
+        UPDATE {points} p SET grid_id = o.grid_id
+        FROM {r.config['population_grid']} o
+        WHERE {grid_join};
         CREATE INDEX IF NOT EXISTS {points}_edge_ogc_fid_idx ON {points} (edge_ogc_fid);
         CREATE INDEX IF NOT EXISTS {points}_n1_idx ON {points} (n1);
         CREATE INDEX IF NOT EXISTS {points}_n2_idx ON {points} (n2);
-        CREATE INDEX IF NOT EXISTS {points}_gix ON {points} USING GIST (geom);
+        ANALYZE {points};
         """
     sql_queries[
         'Recreate urban sample points'
@@ -214,9 +291,8 @@ def nearest_node_locations(codename):
         FROM {points} a
         WHERE EXISTS (
             SELECT 1
-            FROM urban_study_region b
-            WHERE a.geom && b.geom
-            AND ST_Intersects(a.geom, b.geom)
+            FROM urban_study_region_subdivided b
+            WHERE ST_Intersects(a.geom, b.geom)
         );
         CREATE UNIQUE INDEX IF NOT EXISTS urban_sample_points_ix ON urban_sample_points (point_id);
         CREATE INDEX IF NOT EXISTS urban_sample_points_gix ON urban_sample_points USING GIST (geom);
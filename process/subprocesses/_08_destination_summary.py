@@ -17,18 +17,37 @@ def destination_summary(codename):
     script = '_08_destination_summary'
     task = 'Summarise destinations'
     r = ghsci.Region(codename)
-    sql = f"""
-    DROP TABLE IF EXISTS population_dest_summary;
-    CREATE TABLE IF NOT EXISTS population_dest_summary AS
-    SELECT p.grid_id,
-           d.dest_name_full,
-           COUNT(d.geom) AS count,
-           p.geom
-    FROM {r.config['population_grid']} p,
-    destinations d
-    WHERE ST_Intersects(p.geom,d.geom)
-    GROUP BY p.grid_id, d.dest_name_full, p.geom;
-    """
+    grid_id = r.grid_bin('d.geom')
+    if grid_id is None:
+        # identify cells of vector grids containing destinations using a spatial join
+        sql = f"""
+        DROP TABLE IF EXISTS population_dest_summary;
+        CREATE TABLE IF NOT EXISTS population_dest_summary AS
+        SELECT p.grid_id,
+               d.dest_name_full,
+               COUNT(d.geom) AS count,
+               p.geom
+        FROM {r.config['population_grid']} p,
+        destinations d
+        WHERE ST_Intersects(p.geom,d.geom)
+        GROUP BY p.grid_id, d.dest_name_full, p.geom;
+        """
+    else:
+        # identify cells of regular grids containing destinations from their coordinates
+        sql = f"""
+        DROP TABLE IF EXISTS population_dest_summary;
+        CREATE TABLE IF NOT EXISTS population_dest_summary AS
+        SELECT p.grid_id,
+               d.dest_name_full,
+               COUNT(*) AS count,
+               p.geom
+        FROM {r.config['population_grid']} p,
+        (SELECT {grid_id} AS grid_id,
+                dest_name_full
+           FROM destinations d) d
+        WHERE p.grid_id = d.grid_id
+        GROUP BY p.grid_id, d.dest_name_full, p.geom;
+        """
     with r.engine.begin() as conn:
         result = conn.execute(text(sql))
 
@@ -46,9 +65,12 @@ def destination_summary(codename):
     FROM urban_study_region a,
          (SELECT d.dest_name_full,
                  COUNT(d.*) count
-            FROM destinations d,
-                 urban_study_region c
-        WHERE ST_Intersects(d.geom, c.geom)
+            FROM destinations d
+        WHERE EXISTS (
+            SELECT 1
+            FROM urban_study_region_subdivided c
+            WHERE ST_Intersects(d.geom, c.geom)
+        )
         GROUP BY dest_name_full ) t
     ;
     """
@@ -29,6 +29,62 @@ def check_covariate_list(covariate_list, covariates):
     return covariate_list
 
 
+def read_urban_covariates(source, query, covariate_list, region=None):
+    """Read the configured covariates for urban region records matching a query.
+
+    Only the covariate columns (and any referenced by the query) of records
+    matching the query, and intersecting the bounds of the study region if
+    provided, are read; the query and bounds are evaluated by the data source
+    driver, as the query is when creating the study region.  Should the query
+    not be understood by the driver, all records are read and the query is
+    evaluated using pandas.
+
+    Parameters
+    ----------
+    source: str
+        Path to the urban region data
+    query: str
+        Query identifying the urban region record, e.g. "UC_NM_MN=='Baltimore'"
+    covariate_list: list
+        Names of the configured covariates
+    region: GeoDataFrame, optional
+        Study region, used to restrict the records read to those within its bounds
+
+    Returns
+    -------
+    tuple of DataFrame of covariates, and the list of covariates present
+    """
+    import re
+
+    import pyogrio
+
+    info = pyogrio.read_info(source)
+    fields = list(info['fields'])
+    covariate_list = check_covariate_list(covariate_list, fields)
+    query_fields = [
+        x for x in fields
+        if re.search(rf'\b{re.escape(x)}\b', query) and x not in covariate_list
+    ]
+    bbox = None
+    if region is not None and info['crs'] is not None:
+        bbox = tuple(region.to_crs(info['crs']).total_bounds)
+    try:
+        covariates = pyogrio.read_dataframe(
+            source,
+            where=query,
+            bbox=bbox,
+            columns=covariate_list + query_fields,
+            read_geometry=False,
+        )
+    except Exception as e:
+        print(
+            f'The urban query could not be evaluated when reading the urban region data ({e}); '
+            'all records will be read to evaluate the query.',
+        )
+        covariates = gpd.read_file(source).query(query)
+    return covariates[covariate_list], covariate_list
+
+
 def link_urban_covariates(codename):
     start = time.time()
     script = '_09_urban_covariates'
@@ -45,15 +101,13 @@ def link_urban_covariates(codename):
         covariate_list = []
     if len(covariate_list) > 0:
         if r.config['covariate_data'] == 'urban_query':
-            # load covariate data
-            covariates = gpd.read_file(r.config['urban_region']['data_dir'])
-            covariate_list = check_covariate_list(
-                covariate_list, covariates.columns,
-            )
-            # filter and retrieve covariate data for study region
-            covariates = covariates.query(
+            # retrieve covariate data for the study region's urban region record
+            covariates, covariate_list = read_urban_covariates(
+                r.config['urban_region']['data_dir'],
                 r.config['urban_query'].split(':')[1],
-            )[covariate_list]
+                list(covariate_list),
+                region=r.get_gdf('urban_study_region'),
+            )
         elif r.config['covariate_data'] is not None and (
             str(r.config['covariate_data']) not in ['', 'nan']
         ):
@@ -63,42 +63,25 @@ def check_and_load_stop_times(
             sys.exit(
                 f'\n**WARNING**: {null_stop_times_stops} stops with null departure times found in stop_times.txt for this GTFS feed:\n{feed_name}: {feed_config}.\n\n  Use of this feed in analysis without specialised cleaning will result in inaccurate service frequencies.\n\nIt is recommended to interpolate stop_times values.  Optionally, this GTFS feed can be configured to have interpolation applied by adding an entry of "interpolate_stop_times: true" within its settings in the region configuration file.  This will attempt to fill null arrival and departure values using a linear interpolation according to the provided stop sequence start and end times within each trip_id.  This is an approximation based on the available information, but results may still differ from the actual service frequencies at these stops.  See documentation and the example configuration file for further details.',
             )
-    loaded_feeds.stop_times = loaded_feeds.stop_times.query(
-        f"stop_id in {list(loaded_feeds.stops['stop_id'].values)}",
-    )
+    loaded_feeds.stop_times = loaded_feeds.stop_times[
+        loaded_feeds.stop_times['stop_id'].isin(loaded_feeds.stops['stop_id'])
+    ]
     return loaded_feeds
 
 
 def interpolate_stop_times(df: pd.DataFrame):
     """Interpolates stop_times values based on a linear interpolation according to stop sequence start and end times within each trip_id.  This is an approximation based on the available information, but results may still differ from the actual service frequencies at these stops."""
     df = df.copy()
-    columns = df.columns
-    df[['td_a', 'td_d']] = df[['arrival_time', 'departure_time']].astype(
-        'timedelta64[ns]',
-    )
+    times = ['arrival_time', 'departure_time']
     interpolated = (
-        df.groupby(['trip_id'])[['stop_sequence', 'td_a', 'td_d']]
-        .apply(lambda trip: trip.interpolate())
-        .reset_index('trip_id')
-    )
-    df = df.merge(
-        interpolated,
-        how='left',
-        on=['trip_id', 'stop_sequence'],
-        suffixes=['', '_interpolated'],
-    )
-    df['arrival_time'] = format_timedelta_hhmmss(df['td_a_interpolated'])
-    df['departure_time'] = format_timedelta_hhmmss(df['td_d_interpolated'])
-    return df[columns]
-
-
-def format_timedelta_hhmmss(pd_timedelta_series: pd.Series):
-    """Formats a pandas timedelta series as HH:MM:SS string, allowing for relative times later than 24 hours."""
-    return pd_timedelta_series.apply(
-        lambda x: f'{(x.components.days*24)+x.components.hours:02d}:{x.components.minutes:02d}:{x.components.seconds:02d}'
-        if not pd.isnull(x)
-        else '',
+        df[times]
+        .astype(float)
+        .groupby(df['trip_id'])
+        .transform(lambda trip: trip.interpolate())
     )
+    # times are in whole seconds
+    df[times] = np.floor(interpolated).astype('Int64')
+    return df
 
 
 def stops_by_mode(loaded_feeds, route_types, agency_ids) -> set:
@@ -228,28 +211,25 @@ def load_gtfs_feed(r, gtfs_feed: dict, gtfsfeed_path) -> gtfslite.GTFS:
     print(f'\n{gtfs_feed}')
     if 'modes' not in feed or feed['modes'] in [None, 'null', '']:
         feed['modes'] = ghsci.datasets['gtfs']['default_modes']
-    if gtfsfeed_path.endswith('zip'):
-        loaded_feeds = gtfslite.GTFS.load_zip(gtfsfeed_path)
-    else:
-        loaded_feeds = gtfslite.GTFS.load_zip(f'{gtfsfeed_path}.zip')
+    if not gtfsfeed_path.endswith('zip'):
+        gtfsfeed_path = f'{gtfsfeed_path}.zip'
+    # only the required columns are read (with identifiers stripped of
+    # whitespace), for stops within the study region bounding box; where stop
+    # times are to be interpolated, stop times for all stops are retained
+    # until this has been done
+    loaded_feeds = _gtfs_utils.load_gtfs_zip(
+        gtfsfeed_path,
+        bbox=r.bbox,
+        filter_stop_times=not feed.get('interpolate_stop_times', False),
+        cache_dir=f'{ghsci.folder_path}/process/data/_gtfs_cache',
+    )
     loaded_feeds = stop_id_na_check(loaded_feeds)
     if loaded_feeds is None:
         print('Skipping feed due to multiple null stop_id values')
         return None
-    loaded_feeds.stops = loaded_feeds.stops.query(
-        f"(stop_lat>={r.bbox['ymin']}) and (stop_lat<={r.bbox['ymax']}) and (stop_lon>={r.bbox['xmin']}) and (stop_lon<={r.bbox['xmax']})",
-    )
     loaded_feeds.stop_times = check_and_load_stop_times(
         loaded_feeds=loaded_feeds, feed_config=feed, feed_name=gtfs_feed,
     ).stop_times
-    loaded_feeds.routes['route_id'] = loaded_feeds.routes[
-        'route_id'
-    ].str.strip()
-    loaded_feeds.trips['route_id'] = loaded_feeds.trips['route_id'].str.strip()
-    loaded_feeds.trips['trip_id'] = loaded_feeds.trips['trip_id'].str.strip()
-    loaded_feeds.stop_times['trip_id'] = loaded_feeds.stop_times[
-        'trip_id'
-    ].str.strip()
     return loaded_feeds
 
 
@@ -297,13 +277,18 @@ def gtfs_analysis(codename):
             )
             # initialise a counter for stops aligned with mode
             stops_aligned_with_mode = 0
+            # stop headways are derived for all modes of this feed at once
+            stop_frequency = _gtfs_utils.get_stop_frequency_by_mode(
+                loaded_feeds,
+                feed['modes'],
+                analysis_period[0],
+                analysis_period[1],
+                feed['start_date_mmdd'],
+                feed['end_date_mmdd'],
+                dow=dow,
+            )
             for mode in feed['modes'].keys():
                 # print(mode)
-                start_date = feed['start_date_mmdd']
-                end_date = feed['end_date_mmdd']
-                start_hour = analysis_period[0]
-                end_hour = analysis_period[1]
-
                 route_types = (
                     feed['modes'][f'{mode}'].copy().pop('route_types', None)
                 )
@@ -324,16 +309,9 @@ def gtfs_analysis(codename):
                         print(
                             f'  - configured {mode} agency id numbers: {agency_ids}',
                         ),
-                    stops_headway = _gtfs_utils.get_hlc_stop_frequency(
-                        loaded_feeds,
-                        start_hour,
-                        end_hour,
-                        start_date,
-                        end_date,
-                        route_types,
-                        agency_ids,
-                        dow=dow,
-                    )
+                    stops_headway = stop_frequency.loc[
+                        stop_frequency['mode'] == mode, ['stop_id', 'headway'],
+                    ].set_index('stop_id')
 
                     stop_count = len(stops_headway)
                     if stop_count > 0:
@@ -24,7 +24,6 @@ import geopandas as gpd
 import ghsci
 import networkx as nx
 import numpy as np
-import osmnx as ox
 import pandas as pd
 from geoalchemy2 import Geometry
 from script_running_log import script_running_log
@@ -34,6 +33,7 @@ from setup_sp import (
     cal_dist_node_to_nearest_pois,
     create_full_nodes,
     drop_dest_node_lookup,
+    edge_parametric_estimates,
     filter_ids,
     spatial_join_index_to_gdf,
 )
@@ -46,9 +46,81 @@ density_statistics = {
 }
 
 
+def tile_neighbourhood_densities(
+    tile,
+    nodes,
+    edges,
+    grid,
+    neighbourhood_distance,
+    required_nodes=None,
+):
+    """Calculate average population and intersection density for the intersection nodes of a tile, taking mean values from distinct grid cells within neighbourhood buffer distance.
+
+    Given a halo of at least the neighbourhood distance, the nodes, edges and grid cells of the halo-expanded tile include all of those reachable within this network distance of nodes in the tile core, so results match those for the network as a whole.  Nodes outside the population grid are only retained if listed as required (e.g. being associated with sample points).
+    """
+    grid = grid.set_index('grid_id')
+    nodes = nodes.set_index('osmid')[['tile_core', 'geom']].rename_geometry(
+        'geometry',
+    )
+    gdf_nodes = spatial_join_index_to_gdf(
+        nodes,
+        grid[['geom']],
+        dropna=False,
+    )
+    retain = gdf_nodes['tile_core'] & ~gdf_nodes['grid_id'].isna()
+    if required_nodes is not None:
+        retain = retain | (
+            gdf_nodes['tile_core'] & gdf_nodes.index.isin(required_nodes)
+        )
+    nodes_simple = gdf_nodes.loc[retain, ['grid_id', 'geometry']].copy()
+    if len(nodes_simple) == 0:
+        return None
+    # the shortest of any parallel edges between nodes is added last, as
+    # for the network snapshot
+    edges = edges.loc[
+        edges['u'].isin(nodes.index)
+        & edges['v'].isin(nodes.index)
+        & (edges['u'] != edges['v'])
+    ].sort_values('length', ascending=False)
+    G = nx.Graph()
+    G.add_nodes_from(nodes.index)
+    G.add_weighted_edges_from(
+        zip(edges['u'], edges['v'], edges['length']),
+        weight='length',
+    )
+    nh_grid_fields = list(density_statistics.keys())
+    result = pd.DataFrame(
+        [
+            tuple(
+                grid.loc[
+                    gdf_nodes.loc[
+                        list(
+                            nx.single_source_dijkstra_path_length(
+                                G,
+                                n,
+                                neighbourhood_distance,
+                                'length',
+                            ).keys(),
+                        ),
+                        'grid_id',
+                    ]
+                    .dropna()
+                    .unique(),
+                    nh_grid_fields,
+                ]
+                .mean()
+                .values,
+            )
+            for n in nodes_simple.index.values
+        ],
+        columns=list(density_statistics.values()),
+        index=nodes_simple.index.values,
+    )
+    return nodes_simple.join(result).assign(tile_core=True)
+
+
 def node_level_neighbourhood_analysis(
     r,
-    edges,
     nodes,
     neighbourhood_distance,
 ):
@@ -62,12 +134,51 @@ def node_level_neighbourhood_analysis(
             index_col='osmid',
             geom_col='geometry',
         )
+    elif ghsci.settings['project'].get('tile_size', None):
+        print(
+            f'  - Generate {neighbourhood_distance}m neighbourhoods '
+            'for nodes and summarise attributes, tile by tile',
+        )
+        sampling = r.config.get('sampling', {})
+        required_nodes = None
+        if sampling.get('sample_unpopulated_areas') or sampling.get(
+            'custom_sample_points',
+        ):
+            required_nodes = r.get_df(
+                """
+                SELECT n1 AS osmid FROM urban_sample_points
+                UNION
+                SELECT n2 AS osmid FROM urban_sample_points
+                """,
+            )['osmid'].to_numpy(dtype='int64')
+        nodes_simple = r.map_tiles(
+            tile_neighbourhood_densities,
+            {
+                'nodes': 'nodes',
+                'edges': 'edges_simplified',
+                'grid': r.config['population_grid'],
+            },
+            halo=neighbourhood_distance,
+            processes=ghsci.settings['project'].get('multiprocessing', 1),
+            worker_kwargs={
+                'neighbourhood_distance': neighbourhood_distance,
+                'required_nodes': required_nodes,
+            },
+        )
+        if nodes_simple is None:
+            sys.exit(
+                'Neighbourhood statistics could not be calculated, as no network nodes were located within the population grid.',
+            )
+        nodes_simple = nodes_simple.sort_index()
+        nodes_simple.index.name = 'osmid'
+        with r.engine.connect() as connection:
+            nodes_simple.to_postgis(
+                'nodes_pop_intersect_density',
+                connection,
+                index='osmid',
+            )
     else:
-        G_proj = ox.graph_from_gdfs(
-            nodes,
-            edges,
-            graph_attrs=None,
-        ).to_undirected()
+        G_proj = r.get_network(networkx=True)
         grid = r.get_gdf(r.config['population_grid'], index_col='grid_id')
         print('  - Set up simple nodes')
         gdf_nodes = spatial_join_index_to_gdf(nodes, grid, dropna=False)
@@ -296,6 +407,90 @@ def calculate_sample_point_access_scores(
     return sample_points
 
 
+def sample_point_geometry_required(r):
+    """Whether sample point geometries are required, for export, custom aggregation, or sample point analyses of polygon layers."""
+    if r.config['sampling'].get('export_sample_points', False):
+        return True
+    if any(
+        x.get('aggregation_source') == 'point'
+        for x in (r.config.get('custom_aggregations') or {}).values()
+    ):
+        return True
+    return any(
+        'layer' in variable
+        for analysis in r.indicators['sample_point_analyses'].values()
+        for variable in analysis.values()
+    )
+
+
+def calculate_edge_parametric_access_scores(
+    r,
+    nodes_simple,
+    nodes_poi_dist,
+    density_statistics,
+    accessibility_distance,
+):
+    """Calculate sample point access scores from the distances of the nodes at either end of their edges.
+
+    Only the location of each sample point along its edge is read from the database, with node distances and densities looked up once per edge end node.  Sample point geometries are only retrieved if required.
+    """
+    points = r.get_df(
+        'SELECT point_id, grid_id, edge_ogc_fid, metres FROM urban_sample_points',
+        index_col='point_id',
+    )
+    edges = r.get_df(
+        """
+        SELECT e.ogc_fid,
+               e."from" AS n1,
+               e."to" AS n2,
+               ST_LineLocatePoint(e.geom, n1.geom) * ST_Length(e.geom) AS n1_metres,
+               ST_LineLocatePoint(e.geom, n2.geom) * ST_Length(e.geom) AS n2_metres
+        FROM edges e
+        LEFT JOIN nodes n1 ON e."from" = n1.osmid
+        LEFT JOIN nodes n2 ON e."to" = n2.osmid
+        """,
+        index_col='ogc_fid',
+    )
+    full_nodes = edge_parametric_estimates(
+        points,
+        edges,
+        nodes_simple,
+        nodes_poi_dist,
+        list(density_statistics.values()),
+    )
+    print(
+        f'  {len(points) - len(full_nodes)} sample points discarded, '
+        f'leaving {len(full_nodes)} remaining.',
+    )
+    sample_points = (
+        points[['grid_id', 'edge_ogc_fid']]
+        .astype({'grid_id': 'Int64', 'edge_ogc_fid': 'int64'})
+        .join(full_nodes, how='inner')
+    )
+    if sample_point_geometry_required(r):
+        geometry = r.get_gdf(
+            'SELECT point_id, geom AS geometry FROM urban_sample_points',
+            index_col='point_id',
+            geom_col='geometry',
+        )
+        sample_points.insert(2, 'geometry', geometry['geometry'])
+        sample_points = gpd.GeoDataFrame(
+            sample_points,
+            geometry='geometry',
+            crs=geometry.crs,
+        )
+    distance_names = list(nodes_poi_dist.columns)
+    access_score_names = [
+        f"{x.replace('nearest_node','access')}_score" for x in distance_names
+    ]
+    sample_points[access_score_names] = binary_access_score(
+        sample_points,
+        distance_names,
+        accessibility_distance,
+    )
+    return sample_points
+
+
 def calculate_sample_point_indicators(
     r,
     sample_points,
@@ -347,9 +542,12 @@ def calculate_sample_point_indicators(
     sample_points['grid_id'] = sample_points['grid_id'].astype('Int64')
     sample_points['edge_ogc_fid'] = sample_points['edge_ogc_fid'].astype(int)
     # remaining non-geometry fields are float
-    sample_points[sample_points.columns[3:]] = sample_points[
-        sample_points.columns[3:]
-    ].astype(float)
+    fields = [
+        x
+        for x in sample_points.columns
+        if x not in ['grid_id', 'edge_ogc_fid', 'geometry']
+    ]
+    sample_points[fields] = sample_points[fields].astype(float)
     return sample_points
 
 
@@ -388,20 +586,23 @@ def neighbourhood_analysis(codename):
         if table in r.tables:
             print(f'\t- {table}... ')
             r.add_nearest_node_associations(table)
-    nodes = r.get_gdf('nodes', index_col='osmid')
-    nodes.columns = ['geometry' if x == 'geom' else x for x in nodes.columns]
-    nodes = nodes.set_geometry('geometry')
-    edges = r.get_gdf('edges_simplified', index_col=['u', 'v', 'key'])
-    edges.columns = ['geometry' if x == 'geom' else x for x in edges.columns]
-    edges = edges.set_geometry('geometry')
+    nodes = r.get_network()[0]
+    nodes = gpd.GeoDataFrame(
+        nodes,
+        geometry=gpd.points_from_xy(nodes['x'], nodes['y']),
+        crs=r.config['crs_srid'],
+    )
     nodes_simple = node_level_neighbourhood_analysis(
         r,
-        edges,
         nodes,
         ghsci.settings['network_analysis']['neighbourhood_distance'],
     )
     nodes_poi_dist = calculate_poi_accessibility(r)
-    sample_points = calculate_sample_point_access_scores(
+    if r.config['sampling'].get('accessibility_method') == 'edges':
+        calculate_access_scores = calculate_edge_parametric_access_scores
+    else:
+        calculate_access_scores = calculate_sample_point_access_scores
+    sample_points = calculate_access_scores(
         r,
         nodes_simple,
         nodes_poi_dist,
@@ -415,14 +616,22 @@ def neighbourhood_analysis(codename):
     sample_points.columns = [
         'geom' if x == 'geometry' else x for x in sample_points.columns
     ]
-    sample_points = sample_points.set_geometry('geom')
     with r.engine.connect() as connection:
-        sample_points.to_postgis(
-            r.config['point_summary'],
-            connection,
-            index=True,
-            if_exists='replace',
-        )
+        if 'geom' in sample_points.columns:
+            sample_points.set_geometry('geom').to_postgis(
+                r.config['point_summary'],
+                connection,
+                index=True,
+                if_exists='replace',
+            )
+        else:
+            # sample point geometries were not required
+            sample_points.to_sql(
+                r.config['point_summary'],
+                connection,
+                index=True,
+                if_exists='replace',
+            )
     # output to completion log
     script_running_log(r.config, script, task, start)
     r.engine.dispose()
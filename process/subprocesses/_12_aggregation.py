@@ -4,7 +4,6 @@ Aggregation.
 Aggregate sample point indicators for population grid and overall study region summaries.
 """
 
-import subprocess as sp
 import sys
 import time
 
@@ -37,16 +36,23 @@ def calc_grid_pct_sp_indicators(r: ghsci.Region, indicators: dict) -> None:
     gdf_grid = r.get_gdf(
         f"""
         SELECT p.*
-        FROM {r.config['population_grid']} p,
-                urban_study_region u
-        WHERE ST_Intersects(p.geom, u.geom)
-        AND (ST_Area(ST_Intersection(p.geom, u.geom)) / ST_Area(p.geom)) >= 0.1
+        FROM {r.config['population_grid']} p
+        CROSS JOIN LATERAL (
+            -- the subdivided parts do not overlap, so their summed
+            -- intersections equal the intersection with the whole region
+            SELECT SUM(ST_Area(ST_Intersection(p.geom, u.geom))) AS area
+            FROM urban_study_region_subdivided u
+            WHERE ST_Intersects(p.geom, u.geom)
+        ) u
+        WHERE (u.area / ST_Area(p.geom)) >= 0.1
         """,
     )
-    gdf_sample_points = r.get_gdf(r.config['point_summary'])
-    gdf_sample_points = gdf_sample_points[
-        ['grid_id'] + indicators['output']['sample_point_variables']
-    ]
+    # sample point geometries are not required (and may not have been
+    # retained, if sample point indicators were derived from network edges)
+    gdf_sample_points = r.get_df(
+        r.config['point_summary'],
+        columns=['grid_id'] + indicators['output']['sample_point_variables'],
+    ).astype(float)
     gdf_sample_points.columns = ['grid_id'] + indicators['output'][
         'neighbourhood_variables'
     ]
@@ -189,22 +195,13 @@ def custom_data_load(r: ghsci.Region, agg) -> str:
             query = gpkg[1]
         else:
             query = ''
-        command = (
-            '            ogr2ogr -overwrite -progress -f "PostgreSQL" '
-            f' PG:"host={r.config["db_host"]} port={r.config["db_port"]} dbname={r.config["db"]}'
-            f' user={r.config["db_user"]} password={r.config["db_pwd"]}" '
-            f' "/home/ghsci/process/data/{boundary_data}" '
-            f' -lco geometry_name="geom" -lco precision=NO '
-            f' -t_srs {r.config["crs_srid"]} -nln "{table}" '
-            f' -nlt PROMOTE_TO_MULTI -makevalid'
-            f' {query}'
+        r.ogr_to_db(
+            source=f'/home/ghsci/process/data/{boundary_data}',
+            layer=table,
+            query=query,
+            promote_to_multi=True,
+            make_valid=True,
         )
-        print(command)
-        failure = sp.call(command, shell=True)
-        if failure == 1:
-            sys.exit(
-                f"Error when attempting to aggregate for {agg} '{boundary_data}' (check custom aggregation configuration).",
-            )
         return table
     except Exception as e:
         sys.exit(
@@ -478,15 +475,19 @@ def custom_aggregation(r: ghsci.Region, indicators: dict) -> None:
         # contributed.
         clipped_boundaries = f"""WITH clipped AS (
         SELECT b.*,
-               ST_Multi(
-                   ST_CollectionExtract(
-                       ST_Intersection(b.geom, u.geom), 3
-                   )
-               )::geometry(MultiPolygon, {r.config['crs']['srid']})
-                   AS analysed_geom
-        FROM "{boundaries}" b,
-             (SELECT ST_Union(geom) AS geom FROM urban_study_region) u
-        WHERE ST_Intersects(b.geom, u.geom)
+               u.analysed_geom
+        FROM "{boundaries}" b
+        CROSS JOIN LATERAL (
+            SELECT ST_Multi(
+                       ST_CollectionExtract(
+                           ST_Union(ST_Intersection(b.geom, s.geom)), 3
+                       )
+                   )::geometry(MultiPolygon, {r.config['crs']['srid']})
+                       AS analysed_geom
+            FROM urban_study_region_subdivided s
+            WHERE ST_Intersects(b.geom, s.geom)
+        ) u
+        WHERE u.analysed_geom IS NOT NULL
     ), analysed AS (
         -- Boundaries that merely touch the urban study region along an edge
         -- intersect it in a line or a point, and clip to an empty polygon.
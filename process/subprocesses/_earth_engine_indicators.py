@@ -645,20 +645,24 @@ def lpugs_indicators(r, accessible_nodes):
     # CALCULATE LPUGS GIVEN ACCESSIBILITY
     crs_metric = r.config['crs_srid']
     srid_int = int(crs_metric.split(':')[1])
-    # Fetch network data
-    nodes = r.get_gdf('nodes', index_col='osmid')
-    nodes.columns = ['geometry' if x == 'geom' else x for x in nodes.columns]
-    nodes = nodes.set_geometry('geometry')
-    edges = r.get_gdf('edges')
-    edges.columns = ['geometry' if x == 'geom' else x for x in edges.columns]
-    edges = edges.set_geometry('geometry')
-
-    # Filter nodes and edges using the accessible_nodes list
-    filtered_nodes = nodes.loc[nodes.index.isin(accessible_nodes)].copy()
-    filtered_edges = edges[
-        (edges['u'].isin(accessible_nodes))
-        & (edges['v'].isin(accessible_nodes))
-    ].copy()
+    # Fetch network data, filtering nodes and edges using the accessible_nodes list
+    nodes = r.get_network()[0]
+    filtered_nodes = nodes.loc[nodes.index.isin(accessible_nodes)]
+    filtered_nodes = gpd.GeoDataFrame(
+        filtered_nodes,
+        geometry=gpd.points_from_xy(filtered_nodes['x'], filtered_nodes['y']),
+        crs=crs_metric,
+    )
+    filtered_edges = r.get_gdf(
+        text(
+            """
+            SELECT u, v, key, length, osmid, geom FROM edges
+            WHERE u = ANY(:nodes) AND v = ANY(:nodes)
+            """,
+        ),
+        params={'nodes': filtered_nodes.index.tolist()},
+    )
+    filtered_edges = filtered_edges.rename_geometry('geometry')
 
     # Load population grid
     population_grid_gdf = r.get_gdf(
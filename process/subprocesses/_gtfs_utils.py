@@ -4,12 +4,74 @@ GTFS-related Utility functions.
 Utility functions to support GTFS headway analysis for cities.
 """
 
+import csv
+import hashlib
+import io
+import json
 import os
+import shutil
 import time
+import zipfile
 from datetime import datetime, timedelta
 
+import gtfslite
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Columns read from GTFS feed tables, and how their values are parsed: 'str'
+# values are stripped of surrounding whitespace, with empty values treated as
+# null; 'time' values (HH:MM:SS, which may exceed 24 hours for services
+# continuing past midnight) are parsed to integer seconds.  Optional columns
+# are only read if present.
+gtfs_tables = {
+    'stops.txt': {
+        'stop_id': 'str',
+        'stop_name': 'str',
+        'stop_lat': 'float',
+        'stop_lon': 'float',
+    },
+    'routes.txt': {'route_id': 'str', 'agency_id': 'str', 'route_type': 'int'},
+    'trips.txt': {
+        'route_id': 'str',
+        'service_id': 'str',
+        'trip_id': 'str',
+        'direction_id': 'int',
+    },
+    'calendar.txt': {
+        'service_id': 'str',
+        'monday': 'int',
+        'tuesday': 'int',
+        'wednesday': 'int',
+        'thursday': 'int',
+        'friday': 'int',
+        'saturday': 'int',
+        'sunday': 'int',
+        'start_date': 'str',
+        'end_date': 'str',
+    },
+    'calendar_dates.txt': {
+        'service_id': 'str',
+        'date': 'str',
+        'exception_type': 'int',
+    },
+    'frequencies.txt': {
+        'trip_id': 'str',
+        'start_time': 'time',
+        'end_time': 'time',
+        'headway_secs': 'int',
+    },
+    'stop_times.txt': {
+        'trip_id': 'str',
+        'stop_id': 'str',
+        'arrival_time': 'time',
+        'departure_time': 'time',
+        'stop_sequence': 'int',
+    },
+}
 
 
 def get_date_weekday_df(start, end):
@@ -310,12 +372,23 @@ def get_weekly_extract_start_date(
 def hours(time_str):
     """Get hours from time.
 
-    time_str: str (hh:mm:ss)
+    time_str: str (hh:mm:ss) or int (seconds)
     """
+    if not isinstance(time_str, str):
+        return time_str / 3600.0
     h, m, s = (int(x) for x in time_str.split(':'))
     return h + m / 60.0 + s / 3600.0
 
 
+def time_to_seconds(time_str):
+    """Get seconds from time.
+
+    time_str: str (hh:mm:ss)
+    """
+    h, m, s = (int(x) for x in time_str.split(':'))
+    return h * 3600 + m * 60 + s
+
+
 def not_neg(x):
     if x < 0:
         return 0
@@ -463,10 +536,14 @@ def get_hlc_stop_frequency(
         loaded_feeds.stop_times.trip_id.isin(trips_routes.trip_id.unique())
     ]
 
-    # filter stop times within the timerange
-    selected_stop_times_df = stop_times.query(
-        f"('{start_hour}' <= departure_time) and (departure_time < '{end_hour}')",
-    )
+    # filter stop times within the timerange (departure times are in seconds)
+    departure_time = stop_times['departure_time']
+    selected_stop_times_df = stop_times[
+        (
+            (time_to_seconds(start_hour) <= departure_time)
+            & (departure_time < time_to_seconds(end_hour))
+        ).fillna(False)
+    ]
     selected_stop_times_df = selected_stop_times_df[
         ['trip_id', 'stop_id']
     ].set_index('trip_id')
@@ -598,3 +675,485 @@ def get_hlc_stop_frequency(
             else:
                 stops_headway = freq_headway
     return stops_headway
+
+
+def _group_codes(*keys):
+    """Return group numbers for the combinations of integer coded keys, and the unique key combinations."""
+    dims = [int(x.max()) + 1 if len(x) else 1 for x in keys]
+    combined = np.ravel_multi_index(keys, dims)
+    unique, groups = np.unique(combined, return_inverse=True)
+    return groups, np.unravel_index(unique, dims)
+
+
+def _mode_trips(loaded_feeds, modes, service_ids):
+    """Return trips with valid services, tagged with the code of each configured mode whose route types and agency ids they match."""
+    trips_routes = pd.merge(
+        loaded_feeds.trips,
+        loaded_feeds.routes,
+        on='route_id',
+        how='left',
+    )
+    trips_routes = trips_routes[trips_routes['service_id'].isin(service_ids)]
+    if 'direction_id' in trips_routes.columns:
+        direction_id = trips_routes['direction_id'].fillna(-1)
+    else:
+        direction_id = pd.Series(0, index=trips_routes.index)
+    tagged = []
+    for code, mode in enumerate(modes):
+        route_types = modes[mode].get('route_types', None)
+        agency_ids = modes[mode].get('agency_id', None)
+        selected = np.ones(len(trips_routes), dtype=bool)
+        if route_types is not None:
+            selected &= trips_routes['route_type'].isin(route_types).to_numpy()
+        if agency_ids is not None:
+            selected &= trips_routes['agency_id'].isin(agency_ids).to_numpy()
+        tagged.append(
+            pd.DataFrame(
+                {
+                    'trip_id': trips_routes['trip_id'].to_numpy()[selected],
+                    'service_id': trips_routes['service_id'].to_numpy()[
+                        selected
+                    ],
+                    'direction_id': direction_id.to_numpy('int64')[selected],
+                    'mode': code,
+                },
+            ),
+        )
+    return pd.concat(tagged, ignore_index=True)
+
+
+def get_stop_frequency_by_mode(
+    loaded_feeds,
+    modes,
+    start_hour,
+    end_hour,
+    start_date,
+    end_date,
+    dow=['monday', 'tuesday', 'wednesday', 'thursday', 'friday'],
+):
+    """Summarize stops with average headway for each configured mode, based on the number of daily departures within a given timeframe.
+
+    This derives the same estimates as get_hlc_stop_frequency() for all modes of a feed at once.  Active service dates are identified once, stop times are joined with trips once and tagged with the mode(s) of their route, and departures and headways are derived for all stops and modes together using grouped array operations.  Departures for each stop, direction and mode are first counted by service, and then summed across the services active on each date.
+
+    Parameters
+    ----------
+    loaded_feeds: gtfsfeeds_dataframe with GTFS objects, with times in seconds
+
+    modes: dict
+        modes, with optional lists of route_types and agency_id
+
+    start_hour: str
+        a str indicating the start hour, for example: '07:00:00'
+
+    end_hour: str
+        a str indicating the end hour, for example: '19:00:00'
+
+    start_date: str or datetime
+
+    end_date: str or datetime
+
+    dow: list
+        optional, default to list of weekdays ['monday','tuesday','wednesday','thursday','friday']
+
+    Returns
+    -------
+    stops_headway : pandas.DataFrame
+        with columns mode, stop_id and headway
+    """
+    start_seconds = time_to_seconds(start_hour)
+    end_seconds = time_to_seconds(end_hour)
+    mode_names = np.array(list(modes), dtype=object)
+    null_headway = pd.DataFrame({'mode': [], 'stop_id': [], 'headway': []})
+    # active service dates, identified once for all modes
+    service_dates = set_date_service_table(loaded_feeds)
+    service_dates = service_dates[
+        service_dates['weekday'].isin(dow)
+        & (service_dates['date'] >= pd.to_datetime(str(start_date)))
+        & (service_dates['date'] < pd.to_datetime(str(end_date)))
+    ][['service_id', 'date']].drop_duplicates()
+    trips = _mode_trips(
+        loaded_feeds,
+        modes,
+        service_dates['service_id'].unique(),
+    )
+    if len(trips) == 0 or len(loaded_feeds.stop_times) == 0:
+        return null_headway
+    service_codes, services = pd.factorize(
+        pd.concat([trips['service_id'], service_dates['service_id']]),
+    )
+    trips['service'] = service_codes[: len(trips)]
+    service_dates['service'] = service_codes[len(trips) :]
+    stop_codes, stops = pd.factorize(loaded_feeds.stop_times['stop_id'])
+    stop_times = pd.DataFrame(
+        {
+            'trip_id': loaded_feeds.stop_times['trip_id'].to_numpy(),
+            'stop': stop_codes,
+            'departure_time': loaded_feeds.stop_times[
+                'departure_time'
+            ].to_numpy('float64', na_value=np.nan),
+        },
+    ).merge(trips, on='trip_id')
+    stops_headway = []
+    in_window = (
+        (stop_times['departure_time'] >= start_seconds)
+        & (stop_times['departure_time'] < end_seconds)
+    ).to_numpy()
+    if in_window.any():
+        window = stop_times[in_window]
+        direction = window['direction_id'].to_numpy() + 1
+        # departures by mode, direction, stop and service ...
+        groups, (mode, direction, stop, service) = _group_codes(
+            window['mode'].to_numpy(),
+            direction,
+            window['stop'].to_numpy(),
+            window['service'].to_numpy(),
+        )
+        by_service = pd.DataFrame(
+            {
+                'mode': mode,
+                'direction': direction,
+                'stop': stop,
+                'service': service,
+                'departures': np.bincount(groups),
+            },
+        )
+        # ... summed for each date these services are active
+        by_date = by_service.merge(service_dates, on='service')
+        date_codes = pd.factorize(by_date['date'])[0]
+        groups, (mode, direction, stop, date) = _group_codes(
+            by_date['mode'].to_numpy(),
+            by_date['direction'].to_numpy(),
+            by_date['stop'].to_numpy(),
+            date_codes,
+        )
+        departures = np.bincount(groups, weights=by_date['departures'])
+        window_minutes = (end_seconds - start_seconds) // 60
+        headway = np.round(window_minutes / departures)
+        # average headway over dates, for each direction ...
+        groups, (mode, direction, stop) = _group_codes(mode, direction, stop)
+        headway = np.bincount(groups, weights=headway) / np.bincount(groups)
+        # ... taking the lowest headway out of each direction
+        groups, (mode, stop) = _group_codes(mode, stop)
+        lowest = np.full(groups.max() + 1, np.inf)
+        np.minimum.at(lowest, groups, headway)
+        stops_headway.append(
+            pd.DataFrame({'mode': mode, 'stop': stop, 'headway': lowest}),
+        )
+    frequencies = (
+        loaded_feeds.frequencies
+        if loaded_feeds.frequencies is not None
+        else pd.DataFrame({'trip_id': []})
+    )
+    if len(frequencies) != 0:
+        # hours of frequencies within the analysis window, rounded to one
+        # decimal place, as for weight_hours()
+        start_time = (
+            frequencies['start_time'].to_numpy('float64', na_value=np.nan)
+            / 3600
+        )
+        end_time = (
+            frequencies['end_time'].to_numpy('float64', na_value=np.nan) / 3600
+        )
+        weight = np.round(
+            np.maximum(
+                np.maximum(end_time - start_time, 0)
+                - np.maximum(start_seconds / 3600 - start_time, 0)
+                - np.maximum(end_time - end_seconds / 3600, 0),
+                0,
+            ),
+            1,
+        )
+        frequencies = pd.DataFrame(
+            {
+                'trip_id': frequencies['trip_id'].to_numpy(),
+                'headway_secs': frequencies['headway_secs'].to_numpy(
+                    'float64',
+                    na_value=np.nan,
+                ),
+                'weight': weight,
+            },
+        )[weight > 0]
+        # each frequency is weighted by the number of dates its trip is active
+        service_date_counts = np.bincount(
+            service_dates['service'],
+            minlength=len(services),
+        )
+        frequent = stop_times[
+            ['trip_id', 'stop', 'mode', 'direction_id', 'service']
+        ].merge(frequencies, on='trip_id')
+        if len(frequent) != 0:
+            weight = (
+                frequent['weight'].to_numpy()
+                * service_date_counts[frequent['service'].to_numpy()]
+            )
+            groups, (mode, direction, stop) = _group_codes(
+                frequent['mode'].to_numpy(),
+                frequent['direction_id'].to_numpy() + 1,
+                frequent['stop'].to_numpy(),
+            )
+            headway = np.bincount(
+                groups,
+                weights=weight * frequent['headway_secs'].to_numpy(),
+            ) / np.bincount(groups, weights=weight)
+            groups, (mode, stop) = _group_codes(mode, stop)
+            lowest = np.full(groups.max() + 1, np.inf)
+            np.minimum.at(lowest, groups, headway)
+            # headways derived from frequencies are preferred where defined
+            stops_headway.insert(
+                0,
+                pd.DataFrame(
+                    {'mode': mode, 'stop': stop, 'headway': lowest / 60},
+                ),
+            )
+    if len(stops_headway) == 0:
+        return null_headway
+    stops_headway = pd.concat(
+        stops_headway, ignore_index=True
+    ).drop_duplicates(
+        ['mode', 'stop'],
+    )
+    return (
+        pd.DataFrame(
+            {
+                'mode': mode_names[stops_headway['mode'].to_numpy()],
+                'stop_id': stops.to_numpy()[stops_headway['stop'].to_numpy()],
+                'headway': stops_headway['headway'].to_numpy(),
+            },
+        )
+        .sort_values(['mode', 'stop_id'])
+        .reset_index(drop=True)
+    )
+
+
+def gtfs_time_to_seconds(times):
+    """Parse GTFS times (HH:MM:SS, which may exceed 24 hours) to integer seconds.
+
+    Parameters
+    ----------
+    times: pyarrow.Array
+        string array of times, with null values for missing times
+
+    Returns
+    -------
+    pyarrow.Array of int64
+    """
+    parts = pc.split_pattern(times, ':')
+    seconds = pa.scalar(0, pa.int64())
+    for i, factor in enumerate([3600, 60, 1]):
+        seconds = pc.add(
+            seconds,
+            pc.multiply(
+                pc.cast(pc.list_element(parts, i), pa.int64()),
+                factor,
+            ),
+        )
+    return seconds
+
+
+def _parse_gtfs_columns(table, columns):
+    """Parse the string columns of a GTFS table read using pyarrow."""
+    parsed = {}
+    for column in table.column_names:
+        values = pc.utf8_trim_whitespace(table[column])
+        values = pc.if_else(
+            pc.equal(values, ''),
+            pa.scalar(None, pa.string()),
+            values,
+        )
+        if columns[column] == 'int':
+            values = pc.cast(values, pa.int64())
+        elif columns[column] == 'float':
+            values = pc.cast(values, pa.float64())
+        elif columns[column] == 'time':
+            values = gtfs_time_to_seconds(values)
+        parsed[column] = values
+    return pa.table(parsed)
+
+
+def _gtfs_csv_options(zip_file, member, columns):
+    """Read options for a GTFS table, whose header is read with any byte order mark and whitespace removed."""
+    with zip_file.open(member) as file:
+        header = next(
+            csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig')),
+            [],
+        )
+    names = [x.strip() for x in header]
+    include = [x for x in columns if x in names]
+    return (
+        pacsv.ReadOptions(
+            column_names=names,
+            skip_rows=1,
+            block_size=1 << 24,
+        ),
+        pacsv.ConvertOptions(
+            include_columns=include,
+            column_types={x: pa.string() for x in include},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+
+
+def read_gtfs_table(zip_file, member, columns, stop_ids=None):
+    """Read the required columns of a GTFS table from a zipped feed using pyarrow.
+
+    Parameters
+    ----------
+    zip_file: zipfile.ZipFile
+    member: str
+        name of the table in the zip file
+    columns: dict
+        columns to be read, and how their values are parsed
+    stop_ids: pyarrow.Array, optional
+        if provided, only records for these stops are retained, as they are read
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    read_options, convert_options = _gtfs_csv_options(
+        zip_file,
+        member,
+        columns,
+    )
+    if len(read_options.column_names) == 0:
+        return pa.table({})
+    with zip_file.open(member) as file:
+        reader = pacsv.open_csv(
+            file,
+            read_options=read_options,
+            convert_options=convert_options,
+        )
+        batches = []
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            if stop_ids is not None:
+                table = table.filter(
+                    pc.is_in(
+                        pc.utf8_trim_whitespace(table['stop_id']),
+                        value_set=stop_ids,
+                    ),
+                )
+            batches.append(_parse_gtfs_columns(table, columns))
+    if len(batches) == 0:
+        return _parse_gtfs_columns(reader.schema.empty_table(), columns)
+    return pa.concat_tables(batches)
+
+
+def gtfs_feed_key(path, bbox=None, filter_stop_times=True):
+    """Return a key identifying a GTFS feed file's contents, and how it is to be loaded."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 24), b''):
+            digest.update(chunk)
+    return hashlib.sha256(
+        json.dumps(
+            [digest.hexdigest(), bbox, filter_stop_times, gtfs_tables],
+            sort_keys=True,
+            default=str,
+        ).encode(),
+    ).hexdigest()
+
+
+def load_gtfs_zip(path, bbox=None, filter_stop_times=True, cache_dir=None):
+    """Load the tables of a zipped GTFS feed required for headway analysis.
+
+    Only the required columns of stops, routes, trips, calendar, calendar_dates, frequencies and stop_times are read, using pyarrow, with times parsed to integer seconds.  Stops are restricted to those within the bounding box, if provided, and unless filter_stop_times is False (e.g. where stop times are to be interpolated along trips), stop times are restricted to these stops as they are read.  If a cache directory is provided, the loaded tables are cached as Parquet files keyed by the feed's contents and these options, and read from there on subsequent loads.
+
+    Parameters
+    ----------
+    path: str
+        path to the zipped GTFS feed
+    bbox: dict, optional
+        bounding box with xmin, ymin, xmax and ymax coordinates in EPSG 4326
+    filter_stop_times: bool
+        whether stop times are restricted to stops within the bounding box
+    cache_dir: str, optional
+        directory for cached feed tables
+
+    Returns
+    -------
+    gtfslite.GTFS
+    """
+    tables = None
+    if cache_dir is not None:
+        feed_cache = (
+            f'{cache_dir}/{gtfs_feed_key(path, bbox, filter_stop_times)}'
+        )
+        if os.path.exists(feed_cache):
+            tables = {
+                x.replace('.parquet', '.txt'): pq.read_table(
+                    f'{feed_cache}/{x}'
+                )
+                for x in os.listdir(feed_cache)
+            }
+    if tables is None:
+        tables = {}
+        with zipfile.ZipFile(path) as zip_file:
+            members = {os.path.basename(x): x for x in zip_file.namelist()}
+            stops = read_gtfs_table(
+                zip_file,
+                members['stops.txt'],
+                gtfs_tables['stops.txt'],
+            )
+            if bbox is not None:
+                stops = stops.filter(
+                    pc.and_kleene(
+                        pc.and_kleene(
+                            pc.greater_equal(
+                                stops['stop_lat'], float(bbox['ymin'])
+                            ),
+                            pc.less_equal(
+                                stops['stop_lat'], float(bbox['ymax'])
+                            ),
+                        ),
+                        pc.and_kleene(
+                            pc.greater_equal(
+                                stops['stop_lon'], float(bbox['xmin'])
+                            ),
+                            pc.less_equal(
+                                stops['stop_lon'], float(bbox['xmax'])
+                            ),
+                        ),
+                    ),
+                )
+            tables['stops.txt'] = stops
+            for table, columns in gtfs_tables.items():
+                if table == 'stops.txt' or table not in members:
+                    continue
+                tables[table] = read_gtfs_table(
+                    zip_file,
+                    members[table],
+                    columns,
+                    stop_ids=(
+                        stops['stop_id'].combine_chunks()
+                        if table == 'stop_times.txt' and filter_stop_times
+                        else None
+                    ),
+                )
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            temporary_cache = f'{feed_cache}.tmp{os.getpid()}'
+            os.makedirs(temporary_cache, exist_ok=True)
+            for table in tables:
+                pq.write_table(
+                    tables[table],
+                    f'{temporary_cache}/{table.replace(".txt", ".parquet")}',
+                )
+            try:
+                os.replace(temporary_cache, feed_cache)
+            except OSError:
+                # the feed has been cached concurrently
+                shutil.rmtree(temporary_cache, ignore_errors=True)
+    feed = {}
+    for table in gtfs_tables:
+        if table in tables and tables[table].num_columns > 0:
+            feed[table.replace('.txt', '')] = tables[table].to_pandas(
+                types_mapper={pa.int64(): pd.Int64Dtype()}.get,
+            )
+        else:
+            feed[table.replace('.txt', '')] = None
+    for table in ['calendar', 'calendar_dates', 'frequencies']:
+        if feed[table] is not None and len(feed[table]) == 0:
+            feed[table] = None
+    return gtfslite.GTFS(agency=None, **feed)
@@ -10,6 +10,8 @@ codename = 'example_ES_Las_Palmas_2023'
 r = ghsci.Region(codename)
 """
 
+import glob
+import io
 import os
 import shutil
 import sys
@@ -23,7 +25,7 @@ import pandas as pd
 import pyarrow as pa
 import yaml
 from geoalchemy2 import Geometry
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, event, inspect, text
 
 warnings.filterwarnings(
     action='ignore',
@@ -158,6 +160,365 @@ def _configured_resolution(resolution):
     return (size, size) if size > 0 else None
 
 
+def _session_profile(memory=None, processes=None, database_size=None) -> dict:
+    """Return PostgreSQL settings for analysis database sessions.
+
+    Memory settings are sized from the physical memory of the host (in
+    bytes; determined automatically if not supplied) shared between the
+    configured number of processes, and are capped by the size of the
+    database, beyond which additional memory offers no benefit.  As
+    intermediate results can be regenerated by re-running the analysis,
+    commits are made asynchronously.  Any settings configured under 'sql:
+    session' in config.yml take precedence.
+    """
+    mb = 1024**2
+    if memory is None:
+        try:
+            memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (AttributeError, ValueError, OSError):
+            memory = 4096 * mb
+    if processes is None:
+        processes = settings['project'].get('multiprocessing', 1) or 1
+    workers = max(0, min(int(processes), 8) // 2)
+    work_mem = memory // (8 * (workers + 1))
+    maintenance_work_mem = memory // 8
+    if database_size is not None:
+        work_mem = min(work_mem, database_size)
+        maintenance_work_mem = min(maintenance_work_mem, database_size)
+    profile = {
+        'work_mem': f'{int(np.clip(work_mem // mb, 16, 1024))}MB',
+        'maintenance_work_mem': f'{int(np.clip(maintenance_work_mem // mb, 64, 2048))}MB',
+        'max_parallel_workers_per_gather': workers,
+        'synchronous_commit': 'off',
+    }
+    profile.update(settings['sql'].get('session', None) or {})
+    return profile
+
+
+def _apply_session_profile(dbapi_connection, profile):
+    """Apply the analysis session profile to a new database connection.
+
+    The profile is sized using the database size when the supplied
+    dictionary is empty, and recorded in it, so that the size is queried
+    only once for connections sharing the dictionary.
+    """
+    autocommit = dbapi_connection.autocommit
+    try:
+        # settings are applied outside of a transaction, so that they
+        # persist for the session rather than being rolled back
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            if len(profile) == 0:
+                cursor.execute('SELECT pg_database_size(current_database());')
+                profile.update(
+                    _session_profile(database_size=cursor.fetchone()[0]),
+                )
+            for setting, value in profile.items():
+                cursor.execute(f"SET {setting} = '{value}';")
+    except Exception as e:
+        print(
+            f'Note: the analysis database session profile could not be applied ({e}).',
+        )
+    finally:
+        dbapi_connection.autocommit = autocommit
+
+
+def _analysis_engine(db_uri, **kwargs):
+    """Create a database engine whose connections apply the analysis session profile, sized once per engine."""
+    engine = create_engine(db_uri, future=True, pool_pre_ping=True, **kwargs)
+    profile = {}
+    event.listen(
+        engine,
+        'connect',
+        lambda dbapi_connection, connection_record: _apply_session_profile(
+            dbapi_connection,
+            profile,
+        ),
+    )
+    return engine
+
+
+def _raster_cells(raster, field, nodata=None, id_col='grid_id', srid=None):
+    """Return a DataFrame of the cells of a single band raster having data, with their values and polygon geometries as hex encoded EWKB.
+
+    Cells are identified using the id column by their position in the raster numbered from 1 in row-major order (see _grid_bin), and values are rounded to integers.  The nodata value is used if the raster band does not define one.
+    """
+    import rasterio
+    import shapely
+
+    with rasterio.open(raster) as src:
+        values = src.read(1)
+        transform = src.transform
+        if src.nodata is not None:
+            nodata = src.nodata
+        if srid is None:
+            srid = src.crs.to_epsg()
+    valid = np.ones(values.shape, dtype=bool)
+    if values.dtype.kind == 'f':
+        valid &= ~np.isnan(values)
+    if nodata is not None:
+        valid &= values != nodata
+    rows, cols = np.nonzero(valid)
+    x = transform.c + transform.a * np.array([cols, cols + 1])
+    y = transform.f + transform.e * np.array([rows, rows + 1])
+    cells = shapely.set_srid(
+        shapely.box(x.min(0), y.min(0), x.max(0), y.max(0)),
+        srid,
+    )
+    return pd.DataFrame(
+        {
+            id_col: rows.astype('int64') * values.shape[1] + cols + 1,
+            field: np.rint(values[rows, cols]).astype('int64'),
+            'geom': shapely.to_wkb(cells, hex=True, include_srid=True),
+        },
+    )
+
+
+def _raster_cache_key(sources, clipping, srid, resolution) -> str:
+    """Return a key identifying a raster clipped and reprojected from source files, so that cached outputs may be re-used across study regions and reruns.
+
+    The key is a hash of the source file paths, sizes and modification times, the clipping geometry (as WKB), and the target coordinate reference system and resolution, so that it changes if any of these do.
+    """
+    import hashlib
+    import json
+
+    return hashlib.sha256(
+        json.dumps(
+            [
+                [
+                    os.path.abspath(source),
+                    os.stat(source).st_size,
+                    os.stat(source).st_mtime_ns,
+                ]
+                for source in sorted(sources)
+            ]
+            + [
+                hashlib.sha256(clipping).hexdigest(),
+                srid,
+                None if resolution is None else list(resolution),
+            ],
+        ).encode(),
+    ).hexdigest()[:32]
+
+
+def _warp_raster(
+    source,
+    destination,
+    srid,
+    nodata=None,
+    resolution=None,
+    cutline=None,
+    processes=1,
+):
+    """Reproject a raster to a coordinate reference system using GDAL, optionally clipping it to a cutline in the same pass, and summing values to conserve totals.
+
+    If a resolution (cell width and height, in the units of the target coordinate reference system) is supplied, cells are aligned to it, so that grids for neighbouring regions share a common lattice; otherwise, GDAL chooses a cell size.  The result is written to a temporary file that is only moved into place once complete.
+    """
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    options = {
+        'format': 'GTiff',
+        'dstSRS': f'EPSG:{srid}',
+        'resampleAlg': 'sum',
+        'srcNodata': nodata,
+        'dstNodata': nodata,
+        'multithread': True,
+        'warpOptions': [f'NUM_THREADS={processes or 1}'],
+        'creationOptions': ['COMPRESS=DEFLATE', 'TILED=YES'],
+    }
+    if cutline is not None:
+        options.update(
+            {
+                'cutlineDSName': cutline,
+                'cropToCutline': True,
+                'warpOptions': options['warpOptions']
+                + ['CUTLINE_ALL_TOUCHED=TRUE'],
+            },
+        )
+    if resolution is not None:
+        options.update(
+            {
+                'xRes': resolution[0],
+                'yRes': resolution[1],
+                'targetAlignedPixels': True,
+            },
+        )
+    warped = gdal.Warp(
+        f'{destination}.tmp',
+        source,
+        options=gdal.WarpOptions(**options),
+    )
+    # close the dataset, so that it is written before being moved
+    warped = None
+    os.replace(f'{destination}.tmp', destination)
+
+
+def _raster_lattice(raster):
+    """Return the lattice parameters of a north-up raster: the coordinates of its origin (upper left corner), its resolution and its dimensions in cells."""
+    import rasterio
+
+    with rasterio.open(raster) as src:
+        return {
+            'x_origin': src.transform.c,
+            'y_origin': src.transform.f,
+            'x_resolution': src.transform.a,
+            'y_resolution': -src.transform.e,
+            'width': src.width,
+            'height': src.height,
+        }
+
+
+def _grid_bin(x, y, lattice):
+    """Return the identifiers of the cells of a regular grid containing points, given arrays of their coordinates and the grid lattice parameters.
+
+    Cells of a grid derived from a raster are numbered from 1 in row-major order from the raster origin (its upper left corner), so that a cell may be identified from coordinates in constant time; points outside the grid are assigned 0.
+    """
+    col = np.floor(
+        (np.asarray(x) - lattice['x_origin']) / lattice['x_resolution']
+    )
+    row = np.floor(
+        (lattice['y_origin'] - np.asarray(y)) / lattice['y_resolution']
+    )
+    inside = (
+        (col >= 0)
+        & (col < lattice['width'])
+        & (row >= 0)
+        & (row < lattice['height'])
+    )
+    return np.where(inside, row * lattice['width'] + col + 1, 0).astype(
+        'int64'
+    )
+
+
+def _tile_extents(bounds, tile_size, halo=0) -> list:
+    """Partition a bounding box into a regular grid of square tiles.
+
+    Returns a list of dictionaries, one per tile, recording its 'tile_id',
+    its 'core' extent and its halo-expanded 'extent', each as a tuple of
+    (xmin, ymin, xmax, ymax).  Tiles are aligned to the lower left corner of
+    the supplied bounds, and together their core extents cover the bounds
+    without overlap.
+    """
+    if tile_size is None or tile_size <= 0:
+        raise ValueError(
+            f'Tile size must be a positive distance (received {tile_size}).',
+        )
+    xmin, ymin, xmax, ymax = bounds
+    columns = max(int(np.ceil((xmax - xmin) / tile_size)), 1)
+    rows = max(int(np.ceil((ymax - ymin) / tile_size)), 1)
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            core = (
+                xmin + column * tile_size,
+                ymin + row * tile_size,
+                xmin + (column + 1) * tile_size,
+                ymin + (row + 1) * tile_size,
+            )
+            tiles.append(
+                {
+                    'tile_id': len(tiles),
+                    'core': core,
+                    'extent': (
+                        core[0] - halo,
+                        core[1] - halo,
+                        core[2] + halo,
+                        core[3] + halo,
+                    ),
+                },
+            )
+    return tiles
+
+
+def _in_tile_core(x, y, core):
+    """Whether coordinates lie within a tile core, as a half-open interval.
+
+    Tile cores share their edges, so the lower and left edges are treated
+    as inclusive and the upper and right edges as exclusive to ensure that
+    a location on a shared edge is attributed to exactly one tile.
+    """
+    xmin, ymin, xmax, ymax = core
+    return (x >= xmin) & (x < xmax) & (y >= ymin) & (y < ymax)
+
+
+def _stitch_tile_result(result, tile, geom_col='geom'):
+    """Retain only the rows of a tile result which belong to its core.
+
+    Rows may be flagged by the worker using the 'tile_core' column that is
+    provided with each tile's input data, which is then dropped; otherwise,
+    where the result has geometry, rows are retained if a representative
+    point lies within the tile core.  Results with neither are returned
+    unchanged, to be de-duplicated once stitched.
+    """
+    if result is None or len(result) == 0:
+        return result
+    if 'tile_core' in result.columns:
+        return result.loc[result['tile_core'].astype(bool)].drop(
+            columns='tile_core',
+        )
+    if geom_col in result.columns:
+        points = gpd.GeoSeries(result[geom_col]).representative_point()
+        return result.loc[
+            _in_tile_core(points.x, points.y, tile['core']).values
+        ]
+    return result
+
+
+def _read_tile_tables(connection, tile, tables, geom_col='geom'):
+    """Return the halo-expanded subsets of tables for a tile as GeoDataFrames, keyed by worker argument name.
+
+    Errors are raised rather than reported, so that a tile is never
+    processed with missing data.
+    """
+    return {
+        name: gpd.read_postgis(
+            _tile_query(table, tile, geom_col),
+            connection,
+            geom_col=geom_col,
+        )
+        for name, table in tables.items()
+    }
+
+
+def _process_tile(
+    db_uri,
+    tile,
+    tables,
+    worker,
+    geom_col='geom',
+    worker_kwargs=None,
+):
+    """Retrieve the halo-expanded subset of tables for a tile and apply a worker function.
+
+    This is run as a separate process when tiles are processed in parallel,
+    so it creates (and disposes of) its own database engine, applying the
+    analysis session profile.
+    """
+    engine = _analysis_engine(db_uri)
+    try:
+        with engine.begin() as connection:
+            subsets = _read_tile_tables(connection, tile, tables, geom_col)
+    finally:
+        engine.dispose()
+    result = worker(tile, **subsets, **(worker_kwargs or {}))
+    return _stitch_tile_result(result, tile, geom_col)
+
+
+def _tile_query(table, tile, geom_col='geom'):
+    """Return SQL selecting the rows of a table intersecting a tile's halo-expanded extent."""
+    extent = ', '.join(str(x) for x in tile['extent'])
+    xmin, ymin, xmax, ymax = tile['core']
+    return f"""
+        SELECT t.*,
+               (ST_X(p.geom) >= {xmin} AND ST_X(p.geom) < {xmax}
+                AND ST_Y(p.geom) >= {ymin} AND ST_Y(p.geom) < {ymax}) AS tile_core
+        FROM {table} t
+        CROSS JOIN LATERAL (SELECT ST_PointOnSurface(t.{geom_col}) geom) p
+        WHERE t.{geom_col} && ST_MakeEnvelope({extent}, ST_SRID(t.{geom_col}));
+        """
+
+
 # get names of regions for which configuration files exist
 def get_region_names() -> list:
     region_names = [
@@ -228,8 +589,12 @@ def region_boundary_blurb_attribution(
 
 def network_description(region_config):
     blurbs = []
+    if region_config['network']['osm_extract']:
+        retrieval = f"""This definition was used to select matching data from the local OpenStreetMap extract for the study region ({os.path.basename(region_config['OpenStreetMap']['osm_region'])}), with ways first reduced to those having the keys required by the definition using osmfilter."""
+    else:
+        retrieval = f"""This definition was used to retrieve matching data via Overpass API for {region_config['OpenStreetMap']['publication_date']}."""
     blurbs.append(
-        f"""The [OSMnx](https://geoffboeing.com/2016/11/osmnx-python-street-networks/#) software package was used to derive an undirected [non-planar](https://geoffboeing.com/publications/osmnx-complex-street-networks/) pedestrian network of edges (lines) and nodes (vertices, or intersections) for the buffered study region area using the following custom definition: **{region_config['network']['pedestrian']}**.  This definition was used to retrieve matching data via Overpass API for {region_config['OpenStreetMap']['publication_date']}.""",
+        f"""The [OSMnx](https://geoffboeing.com/2016/11/osmnx-python-street-networks/#) software package was used to derive an undirected [non-planar](https://geoffboeing.com/publications/osmnx-complex-street-networks/) pedestrian network of edges (lines) and nodes (vertices, or intersections) for the buffered study region area using the following custom definition: **{region_config['network']['pedestrian']}**.  {retrieval}""",
     )
     if region_config['network']['osmnx_retain_all']:
         blurbs.append(
@@ -244,8 +609,12 @@ def network_description(region_config):
         if isinstance(region_config['network']['connection_threshold'], int):
             blurb = f"""{blurb}.  Network islands were only included if meeting a minimum total network distance threshold set at {region_config['network']['connection_threshold']} metres. """
         blurbs.append(blurb)
+    if region_config['network']['intersection_consolidation'] == 'osmnx':
+        consolidation = f"""The OSMnx [consolidate_intersections()](https://osmnx.readthedocs.io/en/stable/osmnx.html#osmnx.simplification.consolidate_intersections) function was used to prepare a dataset of cleaned intersections with three or more legs, using a tolerance parameter of {region_config['network']['intersection_tolerance']} to consolidate network nodes within this distance as a single node."""
+    else:
+        consolidation = f"""A dataset of cleaned intersections with three or more legs was prepared in the PostGIS database, using a tolerance parameter of {region_config['network']['intersection_tolerance']} to consolidate network nodes within this distance as a single node.  Network nodes were grouped using [ST_ClusterDBSCAN](https://postgis.net/docs/ST_ClusterDBSCAN.html) where within twice this tolerance of one another, and the union of the buffers of nodes in each group was taken, with the centroid of each resulting merged buffer area representing an intersection (equivalent to the OSMnx [consolidate_intersections()](https://osmnx.readthedocs.io/en/stable/osmnx.html#osmnx.simplification.consolidate_intersections) function)."""
     blurbs.append(
-        f"""The OSMnx [consolidate_intersections()](https://osmnx.readthedocs.io/en/stable/osmnx.html#osmnx.simplification.consolidate_intersections) function was used to prepare a dataset of cleaned intersections with three or more legs, using a tolerance parameter of {region_config['network']['intersection_tolerance']} to consolidate network nodes within this distance as a single node.  This ensures that intersections that exist for representational or connectivity purposes (for example a roundabout, that may be modelled with multiple nodes but in effect is a single intersections) do not inflate estimates when evaluating street connectivity for pedestrians.""",
+        f"""{consolidation}  This ensures that intersections that exist for representational or connectivity purposes (for example a roundabout, that may be modelled with multiple nodes but in effect is a single intersections) do not inflate estimates when evaluating street connectivity for pedestrians.""",
     )
     blurbs.append(
         'The derived pedestrian network nodes and edges, and the dataset of cleaned intersections were stored in the PostGIS database.',
@@ -833,6 +1202,8 @@ class Region:
             r['public_open_space'][
                 'data'
             ] = f"{data_path}/{r['public_open_space']['data']}"
+        if 'open_space_clustering' not in r:
+            r['open_space_clustering'] = 'database'
         if 'points_of_interest' in r and isinstance(
             r['points_of_interest'],
             dict,
@@ -884,6 +1255,11 @@ class Region:
             (int, float),
         ):
             sampling['custom_sample_points_snap_tolerance'] = 500
+        if sampling.get('accessibility_method') not in ['points', 'edges']:
+            sampling['accessibility_method'] = 'points'
+        sampling['export_sample_points'] = (
+            sampling.get('export_sample_points', False) is True
+        )
         r['sampling'] = sampling
         return r
 
@@ -1115,6 +1491,10 @@ class Region:
             r['network']['polygon_iteration'] = False
         if 'connection_threshold' not in r['network']:
             r['network']['connection_threshold'] = None
+        if 'osm_extract' not in r['network']:
+            r['network']['osm_extract'] = False
+        if 'intersection_consolidation' not in r['network']:
+            r['network']['intersection_consolidation'] = 'osmnx'
         if (
             'intersections' in r['network']
             and r['network']['intersections'] is not None
@@ -1557,10 +1937,8 @@ class Region:
 
     def get_engine(self):
         """Given configuration details, create a database engine."""
-        engine = create_engine(
+        return _analysis_engine(
             self.adbc_uri,
-            future=True,
-            pool_pre_ping=True,
             connect_args={
                 'keepalives': 1,
                 'keepalives_idle': 30,
@@ -1568,7 +1946,6 @@ class Region:
                 'keepalives_count': 5,
             },
         )
-        return engine
 
     def get_tables(self) -> list:
         """Given configuration details, create a database engine."""
@@ -1731,6 +2108,8 @@ class Region:
         self,
         table: str,
         geom_col: str = 'geom',
+        batch_size: int = 10000,
+        n_workers: int = None,
     ) -> None:
         """Add nearest-edge node associations to a table.
 
@@ -1738,8 +2117,24 @@ class Region:
         and match_point_geom by snapping each row to its nearest edge.
 
         Skips processing if the columns already exist in the table.
-        Rows are matched via ctid so no primary-key knowledge is required.
+
+        Rows are snapped in spatially ordered batches (so that consecutive
+        nearest-edge searches visit the same parts of the index), run
+        concurrently across n_workers connections (by default, the
+        configured multiprocessing setting), with the results recorded in an
+        unlogged staging table.  The table is then recreated with the
+        associations in a single parallel query, and swapped in place of the
+        original table (retaining its keys, indexes and column defaults) in
+        one transaction, rather than updating every row.
+
+        Associations are recorded in the snapping_cache table, keyed by a hash
+        of each geometry and the version of the network it was snapped to
+        (see network_version), so that when a table is recreated only new or
+        moved geometries are snapped, with prior associations reused for the
+        rest.
         """
+        from concurrent.futures import ThreadPoolExecutor
+
         check_sql = text(
             """
             SELECT COUNT(*) FROM information_schema.columns
@@ -1755,58 +2150,481 @@ class Region:
             ).scalar()
         if already_exists:
             return
+        if n_workers is None:
+            n_workers = settings['project'].get('multiprocessing', 1) or 1
+        associations = [
+            'n1',
+            'n2',
+            'n1_distance',
+            'n2_distance',
+            'edge_ogc_fid',
+            'match_point_distance',
+            'match_point_geom',
+        ]
+        order_table = f'_{table}_snap_order'
+        snap_table = f'_{table}_snap'
+        version = self._snapping_cache_setup()
+        # only rows whose geometries have not previously been snapped to this
+        # version of the network are ordered for snapping; associations for
+        # the remainder are copied from the cache
         sql = f"""
-    ALTER TABLE {table}
-        ADD COLUMN IF NOT EXISTS n1 bigint,
-        ADD COLUMN IF NOT EXISTS n2 bigint,
-        ADD COLUMN IF NOT EXISTS n1_distance integer,
-        ADD COLUMN IF NOT EXISTS n2_distance integer,
-        ADD COLUMN IF NOT EXISTS edge_ogc_fid integer,
-        ADD COLUMN IF NOT EXISTS match_point_distance integer,
-        ADD COLUMN IF NOT EXISTS match_point_geom geometry;
-    UPDATE {table} t
-    SET n1                   = x.n1,
-        n2                   = x.n2,
-        n1_distance          = ST_Length(ST_LineSubstring(x.edge_geom,
-                                 LEAST(   ST_LineLocatePoint(x.edge_geom, x.n1_geom),
-                                          ST_LineLocatePoint(x.edge_geom, x.match_pt)),
-                                 GREATEST(ST_LineLocatePoint(x.edge_geom, x.n1_geom),
-                                          ST_LineLocatePoint(x.edge_geom, x.match_pt))))::int,
-        n2_distance          = ST_Length(ST_LineSubstring(x.edge_geom,
-                                 LEAST(   ST_LineLocatePoint(x.edge_geom, x.n2_geom),
-                                          ST_LineLocatePoint(x.edge_geom, x.match_pt)),
-                                 GREATEST(ST_LineLocatePoint(x.edge_geom, x.n2_geom),
-                                          ST_LineLocatePoint(x.edge_geom, x.match_pt))))::int,
-        edge_ogc_fid         = x.edge_ogc_fid,
-        match_point_distance = ST_Distance(t.{geom_col}, x.match_pt)::int,
-        match_point_geom     = x.match_pt
+    DROP TABLE IF EXISTS {snap_table};
+    CREATE UNLOGGED TABLE {snap_table} (
+        row_ctid tid,
+        geom_hash text,
+        n1 bigint,
+        n2 bigint,
+        n1_distance integer,
+        n2_distance integer,
+        edge_ogc_fid integer,
+        match_point_distance integer,
+        match_point_geom geometry
+    );
+    INSERT INTO {snap_table}
+    SELECT t.ctid,
+           c.geom_hash,
+           {', '.join([f'c.{x}' for x in associations])}
+    FROM {table} t
+    JOIN snapping_cache c
+      ON c.network_version = :version
+     AND c.geom_hash = md5(ST_AsEWKB(t.{geom_col}));
+    DROP TABLE IF EXISTS {order_table};
+    CREATE UNLOGGED TABLE {order_table} AS
+        SELECT t.ctid AS row_ctid,
+               t.{geom_col} AS geom,
+               md5(ST_AsEWKB(t.{geom_col})) AS geom_hash,
+               row_number() OVER (ORDER BY t.{geom_col}) AS seq
+        FROM {table} t
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM snapping_cache c
+            WHERE c.network_version = :version
+              AND c.geom_hash = md5(ST_AsEWKB(t.{geom_col}))
+        );
+    CREATE INDEX {order_table}_seq_idx ON {order_table} (seq);
+    ANALYZE {order_table};
+    """
+        with self.engine.begin() as connection:
+            connection.execute(text(sql), {'version': version})
+            total = connection.execute(
+                text(f'SELECT count(*) FROM {order_table};'),
+            ).scalar()
+            cached = connection.execute(
+                text(f'SELECT count(*) FROM {snap_table};'),
+            ).scalar()
+        # Each row's position along its nearest edge, and that of the edge's
+        # nodes, is located once and used to derive both node distances
+        batch_sql = text(
+            f"""
+    INSERT INTO {snap_table}
+    SELECT x.row_ctid,
+           x.geom_hash,
+           x.n1,
+           x.n2,
+           ST_Length(ST_LineSubstring(x.edge_geom,
+               LEAST(x.llp1, x.llpm), GREATEST(x.llp1, x.llpm)))::int,
+           ST_Length(ST_LineSubstring(x.edge_geom,
+               LEAST(x.llp2, x.llpm), GREATEST(x.llp2, x.llpm)))::int,
+           x.edge_ogc_fid,
+           ST_Distance(x.geom, x.match_pt)::int,
+           x.match_pt
     FROM (
-        SELECT t2.ctid,
-               e."from"                               AS n1,
-               e."to"                                 AS n2,
-               n1_node.geom                           AS n1_geom,
-               n2_node.geom                           AS n2_geom,
-               e.geom                                 AS edge_geom,
-               e.ogc_fid                              AS edge_ogc_fid,
-               ST_ClosestPoint(e.geom, t2.{geom_col}) AS match_pt
-        FROM {table} t2
+        SELECT o.row_ctid,
+               o.geom,
+               o.geom_hash,
+               e.n1,
+               e.n2,
+               e.edge_geom,
+               e.edge_ogc_fid,
+               e.match_pt,
+               ST_LineLocatePoint(e.edge_geom, n1_node.geom) AS llp1,
+               ST_LineLocatePoint(e.edge_geom, n2_node.geom) AS llp2,
+               ST_LineLocatePoint(e.edge_geom, e.match_pt)   AS llpm
+        FROM {order_table} o
         CROSS JOIN LATERAL (
-            SELECT e.ogc_fid, e."from", e."to", e.geom
+            SELECT e.ogc_fid                         AS edge_ogc_fid,
+                   e."from"                          AS n1,
+                   e."to"                            AS n2,
+                   e.geom                            AS edge_geom,
+                   ST_ClosestPoint(e.geom, o.geom)   AS match_pt
             FROM edges e
-            ORDER BY e.geom <-> t2.{geom_col}
+            ORDER BY e.geom <-> o.geom
             LIMIT 1
         ) e
-        LEFT JOIN nodes n1_node ON e."from" = n1_node.osmid
-        LEFT JOIN nodes n2_node ON e."to"   = n2_node.osmid
-    ) x
-    WHERE t.ctid = x.ctid;
-    CREATE INDEX IF NOT EXISTS {table}_n1_idx ON {table} (n1);
-    CREATE INDEX IF NOT EXISTS {table}_n2_idx ON {table} (n2);
-    CREATE INDEX IF NOT EXISTS {table}_edge_ogc_fid_idx ON {table} (edge_ogc_fid);
-    """
+        LEFT JOIN nodes n1_node ON e.n1 = n1_node.osmid
+        LEFT JOIN nodes n2_node ON e.n2 = n2_node.osmid
+        WHERE o.seq > :start AND o.seq <= :end
+    ) x;
+    """,
+        )
+
+        def snap_batch(start):
+            with self.engine.begin() as connection:
+                connection.execute(
+                    batch_sql,
+                    {'start': start, 'end': start + batch_size},
+                )
+            return min(start + batch_size, total)
+
+        if cached:
+            print(
+                f'  Reusing cached nearest edge associations for {cached} rows of {table}',
+            )
+        print(
+            f'  Snapping {total} rows of {table} to the nearest network edge'
+        )
+        with ThreadPoolExecutor(
+            max_workers=max(int(n_workers), 1)
+        ) as executor:
+            # batches are reported in order as they are completed
+            for completed in executor.map(
+                snap_batch,
+                range(0, total, batch_size),
+            ):
+                print(
+                    f'\r  Snapped {completed} of {total} rows',
+                    end='',
+                    flush=True,
+                )
+        print('')
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"""
+            INSERT INTO snapping_cache
+            SELECT :version,
+                   s.geom_hash,
+                   {', '.join([f's.{x}' for x in associations])}
+            FROM {snap_table} s
+            JOIN {order_table} o ON o.row_ctid = s.row_ctid
+            WHERE s.geom_hash IS NOT NULL
+            ON CONFLICT DO NOTHING;
+            """,
+                ),
+                {'version': version},
+            )
+        self._swap_with_nearest_node_associations(
+            table,
+            snap_table,
+            order_table,
+            associations,
+        )
+
+    def network_version(self) -> str:
+        """Return a hash of the pedestrian network edges, identifying the version of the network that geometries have been snapped to."""
+        sql = """
+            SELECT md5(
+                string_agg(
+                    md5(concat_ws('|', ogc_fid, "from", "to", encode(ST_AsEWKB(geom), 'hex'))),
+                    '' ORDER BY ogc_fid
+                )
+            )
+            FROM edges;
+            """
+        with self.engine.begin() as connection:
+            return connection.execute(text(sql)).scalar()
+
+    def _snapping_cache_setup(self) -> str:
+        """Create the snapping cache table if required, discarding associations with other versions of the network, and return the current network version."""
+        version = self.network_version()
         with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    """
+                CREATE TABLE IF NOT EXISTS snapping_cache (
+                    network_version text NOT NULL,
+                    geom_hash text NOT NULL,
+                    n1 bigint,
+                    n2 bigint,
+                    n1_distance integer,
+                    n2_distance integer,
+                    edge_ogc_fid integer,
+                    match_point_distance integer,
+                    match_point_geom geometry,
+                    PRIMARY KEY (network_version, geom_hash)
+                );
+                DELETE FROM snapping_cache
+                WHERE network_version IS DISTINCT FROM :version;
+                """,
+                ),
+                {'version': version},
+            )
+        return version
+
+    def _swap_with_nearest_node_associations(
+        self,
+        table: str,
+        snap_table: str,
+        order_table: str,
+        associations: list,
+    ) -> None:
+        """Recreate a table joined with its staged nearest-edge associations, replacing the original in a single transaction.
+
+        Constraints (including NOT NULL constraints and foreign keys of other tables referencing it), indexes and column defaults of the table are retained, and any views depending on it are recreated.
+        """
+        with self.engine.begin() as connection:
+            columns = [
+                x[0]
+                for x in connection.execute(
+                    text(
+                        """
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :table
+                ORDER BY ordinal_position;
+                """,
+                    ),
+                    {'table': table},
+                ).fetchall()
+                if x[0] not in associations
+            ]
+            # constraints, indexes and column defaults (e.g. serial
+            # identifiers) are retained, along with ownership of any
+            # sequences; keys are added first, as foreign keys may refer to
+            # them.  NOT NULL constraints are recorded separately, as they
+            # are only listed in pg_constraint from PostgreSQL 18.
+            constraints = connection.execute(
+                text(
+                    """
+                SELECT conname, pg_get_constraintdef(oid)
+                FROM pg_constraint
+                WHERE conrelid = to_regclass(:table)
+                  AND contype IN ('p', 'u', 'c', 'f', 'x')
+                ORDER BY contype NOT IN ('p', 'u'), conname;
+                """,
+                ),
+                {'table': table},
+            ).fetchall()
+            not_null = [
+                x[0]
+                for x in connection.execute(
+                    text(
+                        """
+                SELECT attname
+                FROM pg_attribute
+                WHERE attrelid = to_regclass(:table)
+                  AND attnum > 0
+                  AND NOT attisdropped
+                  AND attnotnull;
+                """,
+                    ),
+                    {'table': table},
+                ).fetchall()
+                if x[0] not in associations
+            ]
+            references = connection.execute(
+                text(
+                    """
+                SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+                FROM pg_constraint
+                WHERE confrelid = to_regclass(:table)
+                  AND conrelid != confrelid
+                  AND contype = 'f';
+                """,
+                ),
+                {'table': table},
+            ).fetchall()
+            # views (and views of views) depending on the table would
+            # otherwise prevent it from being dropped; these are dropped and
+            # recreated in order of dependency, along with the indexes of
+            # materialized views
+            views = connection.execute(
+                text(
+                    """
+                WITH RECURSIVE dependents AS (
+                    SELECT r.ev_class AS oid, 1 AS depth
+                    FROM pg_depend d
+                    JOIN pg_rewrite r ON r.oid = d.objid
+                    WHERE d.classid = 'pg_rewrite'::regclass
+                      AND d.refobjid = to_regclass(:table)
+                      AND r.ev_class != d.refobjid
+                    UNION ALL
+                    SELECT r.ev_class, v.depth + 1
+                    FROM dependents v
+                    JOIN pg_depend d ON d.refobjid = v.oid
+                    JOIN pg_rewrite r ON r.oid = d.objid
+                    WHERE d.classid = 'pg_rewrite'::regclass
+                      AND r.ev_class != d.refobjid
+                )
+                SELECT c.oid::regclass::text,
+                       c.relkind,
+                       pg_get_viewdef(c.oid),
+                       ARRAY(
+                           SELECT pg_get_indexdef(i.indexrelid)
+                           FROM pg_index i
+                           WHERE i.indrelid = c.oid
+                       )
+                FROM dependents v
+                JOIN pg_class c ON c.oid = v.oid
+                GROUP BY c.oid, c.relkind
+                ORDER BY max(v.depth);
+                """,
+                ),
+                {'table': table},
+            ).fetchall()
+            indexes = connection.execute(
+                text(
+                    """
+                SELECT i.indexdef
+                FROM pg_indexes i
+                WHERE i.schemaname = 'public'
+                  AND i.tablename = :table
+                  AND i.indexname NOT IN (
+                      SELECT conname FROM pg_constraint
+                      WHERE conrelid = to_regclass(:table)
+                  );
+                """,
+                ),
+                {'table': table},
+            ).fetchall()
+            defaults = connection.execute(
+                text(
+                    """
+                SELECT a.attname,
+                       pg_get_expr(d.adbin, d.adrelid),
+                       pg_get_serial_sequence(:table, a.attname)
+                FROM pg_attrdef d
+                JOIN pg_attribute a
+                  ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+                WHERE d.adrelid = to_regclass(:table);
+                """,
+                ),
+                {'table': table},
+            ).fetchall()
+            select_columns = ', '.join([f't."{x}"' for x in columns])
+            sql = f"""
+        DROP TABLE IF EXISTS {table}_snapped;
+        CREATE TABLE {table}_snapped AS
+            SELECT {select_columns},
+                   {', '.join([f's.{x}' for x in associations])}
+            FROM {table} t
+            LEFT JOIN {snap_table} s ON s.row_ctid = t.ctid;
+        """
+            for column, expression, sequence in defaults:
+                if sequence is not None:
+                    sql += f'ALTER SEQUENCE {sequence} OWNED BY NONE;\n'
+            for view, kind, definition, view_indexes in reversed(views):
+                kind = 'MATERIALIZED VIEW' if kind == 'm' else 'VIEW'
+                sql += f'DROP {kind} {view};\n'
+            for referencing, name, definition in references:
+                sql += f'ALTER TABLE {referencing} DROP CONSTRAINT "{name}";\n'
+            sql += f"""
+        DROP TABLE {table};
+        ALTER TABLE {table}_snapped RENAME TO {table};
+        """
+            for column in not_null:
+                sql += f'ALTER TABLE {table} ALTER COLUMN "{column}" SET NOT NULL;\n'
+            for name, definition in constraints:
+                sql += f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition};\n'
+            for referencing, name, definition in references:
+                sql += f'ALTER TABLE {referencing} ADD CONSTRAINT "{name}" {definition};\n'
+            for view, kind, definition, view_indexes in views:
+                kind = 'MATERIALIZED VIEW' if kind == 'm' else 'VIEW'
+                sql += f'CREATE {kind} {view} AS {definition.strip().rstrip(";")};\n'
+                for index_definition in view_indexes:
+                    sql += f'{index_definition};\n'
+            for (definition,) in indexes:
+                sql += f'{definition};\n'
+            for column, expression, sequence in defaults:
+                sql += f'ALTER TABLE {table} ALTER COLUMN "{column}" SET DEFAULT {expression};\n'
+                if sequence is not None:
+                    sql += f'ALTER SEQUENCE {sequence} OWNED BY {table}."{column}";\n'
+            sql += f"""
+        CREATE INDEX IF NOT EXISTS {table}_n1_idx ON {table} (n1);
+        CREATE INDEX IF NOT EXISTS {table}_n2_idx ON {table} (n2);
+        CREATE INDEX IF NOT EXISTS {table}_edge_ogc_fid_idx ON {table} (edge_ogc_fid);
+        DROP TABLE {snap_table};
+        DROP TABLE {order_table};
+        ANALYZE {table};
+        """
             connection.execute(text(sql))
 
+    def write_network_snapshot(self, version: str = None) -> str:
+        """Write a compact snapshot of the projected pedestrian network to the region output folder, returning its path.
+
+        The snapshot records node identifiers and coordinates, and a compressed sparse row (CSR) adjacency matrix of the shortest length between adjacent nodes of the undirected network, so that the network can be reloaded by analysis steps without reading and rebuilding the graph from the database.  It is named for the network version (see network_version), so that a snapshot of a network that has since been rebuilt is not used; snapshots of other versions are removed.
+        """
+        if version is None:
+            version = self.network_version()
+        nodes = self.get_df(
+            'SELECT osmid, ST_X(geom) AS x, ST_Y(geom) AS y FROM nodes ORDER BY osmid',
+        )
+        edges = self.get_df(
+            'SELECT u, v, length FROM edges_simplified WHERE u != v',
+        )
+        osmid = nodes['osmid'].to_numpy(dtype='int64')
+        u = np.searchsorted(osmid, edges['u'].to_numpy(dtype='int64'))
+        v = np.searchsorted(osmid, edges['v'].to_numpy(dtype='int64'))
+        length = edges['length'].to_numpy(dtype='float64')
+        # record both directions of each edge, retaining the shortest of any
+        # parallel edges between the same pair of nodes
+        row = np.concatenate([u, v])
+        col = np.concatenate([v, u])
+        length = np.concatenate([length, length])
+        order = np.lexsort((length, col, row))
+        row, col, length = row[order], col[order], length[order]
+        first = np.ones(len(row), dtype=bool)
+        first[1:] = (row[1:] != row[:-1]) | (col[1:] != col[:-1])
+        row, col, length = row[first], col[first], length[first]
+        indptr = np.zeros(len(osmid) + 1, dtype='int64')
+        np.cumsum(np.bincount(row, minlength=len(osmid)), out=indptr[1:])
+        path = f"{self.config['region_dir']}/{self.codename}_network_{version[:16]}.npz"
+        for snapshot in glob.glob(
+            f"{self.config['region_dir']}/{self.codename}_network*.npz",
+        ):
+            if snapshot != path:
+                os.remove(snapshot)
+        np.savez(
+            path,
+            osmid=osmid,
+            x=nodes['x'].to_numpy(dtype='float64'),
+            y=nodes['y'].to_numpy(dtype='float64'),
+            indptr=indptr,
+            indices=col.astype('int64'),
+            length=length,
+            srid=self.config['crs']['srid'],
+        )
+        return path
+
+    def get_network(self, networkx: bool = False):
+        """Return the projected pedestrian network from its snapshot, written if not already available for the current version of the network.
+
+        By default a tuple of a DataFrame of node coordinates indexed by osmid and a scipy sparse matrix of edge lengths between nodes (in the same order) is returned; otherwise, a NetworkX graph of nodes (having x and y attributes) and edges (having a length attribute).
+        """
+        from scipy import sparse
+
+        version = self.network_version()
+        path = f"{self.config['region_dir']}/{self.codename}_network_{version[:16]}.npz"
+        if not os.path.exists(path):
+            path = self.write_network_snapshot(version)
+        with np.load(path) as snapshot:
+            nodes = pd.DataFrame(
+                {'x': snapshot['x'], 'y': snapshot['y']},
+                index=pd.Index(snapshot['osmid'], name='osmid'),
+            )
+            adjacency = sparse.csr_matrix(
+                (snapshot['length'], snapshot['indices'], snapshot['indptr']),
+                shape=(len(nodes), len(nodes)),
+            )
+        if not networkx:
+            return nodes, adjacency
+        import networkx as nx
+
+        G = nx.Graph(crs=self.config['crs_srid'])
+        G.add_nodes_from(
+            (n, {'x': x, 'y': y})
+            for n, x, y in zip(nodes.index, nodes['x'], nodes['y'])
+        )
+        adjacency = sparse.triu(adjacency).tocoo()
+        G.add_weighted_edges_from(
+            zip(
+                nodes.index[adjacency.row],
+                nodes.index[adjacency.col],
+                adjacency.data,
+            ),
+            weight='length',
+        )
+        return G
+
     def get_bbox(
         self,
         srid=4326,
@@ -1837,6 +2655,135 @@ class Region:
             bbox = None
         return bbox
 
+    def get_tiles(
+        self,
+        tile_size: float = None,
+        halo: float = None,
+        table: str = 'urban_study_region',
+        geom_col: str = 'geom',
+    ) -> list:
+        """Partition the study region into square tiles with a surrounding halo.
+
+        Tile size and halo are in the units of the project coordinate reference system, defaulting to the configured project tile_size and study_buffer respectively.  Only tiles intersecting the study region are returned.
+        """
+        if tile_size is None:
+            tile_size = settings['project'].get('tile_size', 10000)
+        if halo is None:
+            halo = settings['project']['study_buffer']
+        with self.engine.begin() as connection:
+            bounds = connection.execute(
+                text(
+                    f"""
+                SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+                FROM (SELECT ST_Extent({geom_col}) e FROM {table}) t;
+                """,
+                ),
+            ).fetchone()
+            if bounds is None or bounds[0] is None:
+                return []
+            tiles = _tile_extents(tuple(bounds), tile_size, halo)
+            intersecting = connection.execute(
+                text(
+                    f"""
+                SELECT tile_id
+                FROM (VALUES {', '.join(f"({x['tile_id']}, {', '.join(str(v) for v in x['core'])})" for x in tiles)}) v(tile_id, xmin, ymin, xmax, ymax)
+                WHERE EXISTS (
+                    SELECT 1 FROM {table} s
+                    WHERE ST_Intersects(
+                        s.{geom_col},
+                        ST_MakeEnvelope(xmin, ymin, xmax, ymax, ST_SRID(s.{geom_col}))
+                    )
+                );
+                """,
+                ),
+            ).fetchall()
+        intersecting = {x[0] for x in intersecting}
+        return [x for x in tiles if x['tile_id'] in intersecting]
+
+    def map_tiles(
+        self,
+        worker,
+        tables,
+        tile_size: float = None,
+        halo: float = None,
+        id_col: str = None,
+        geom_col: str = 'geom',
+        processes: int = 1,
+        worker_kwargs: dict = None,
+    ) -> pd.DataFrame:
+        """Apply a worker function to the buffered study region tile by tile, stitching the results.
+
+        Tiles cover the buffered study region, so that rows of tables derived for the buffered region (such as the pedestrian network) each belong to exactly one tile core.  For each tile, the rows of each of the tables intersecting the halo-expanded tile extent are retrieved as GeoDataFrames, with a boolean 'tile_core' column flagging rows whose representative point lies within the tile itself.  These are passed to the worker as keyword arguments following the tile dictionary, named for each of a list of tables, or for the keys of a dictionary of tables, e.g. worker(tile, nodes=..., edges=...), so that memory use is bounded by the tile size rather than the size of the city.  An error is raised if the data for a tile cannot be retrieved.
+
+        The worker should return a DataFrame or GeoDataFrame.  Halo rows are removed from each result, by retaining rows flagged in a 'tile_core' column if returned, or otherwise those with geometry located within the tile core.  The stitched result is optionally de-duplicated on id_col.
+
+        If processes is greater than 1, tiles are processed in parallel using a pool of processes; in this case the worker must be a module-level function so that it may be pickled.
+        """
+        tiles = self.get_tiles(
+            tile_size=tile_size,
+            halo=halo,
+            table=self.config['buffered_urban_study_region'],
+        )
+        if isinstance(tables, str):
+            tables = [tables]
+        if not isinstance(tables, dict):
+            tables = {table: table for table in tables}
+        results = []
+        if processes is not None and processes > 1 and len(tiles) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [
+                    executor.submit(
+                        _process_tile,
+                        self.adbc_uri,
+                        tile,
+                        tables,
+                        worker,
+                        geom_col,
+                        worker_kwargs,
+                    )
+                    for tile in tiles
+                ]
+                # results are collected in tile order, for reproducibility
+                for i, future in enumerate(futures, start=1):
+                    results.append(future.result())
+                    print(
+                        f'\r  Processed {i} of {len(tiles)} tiles',
+                        end='',
+                        flush=True,
+                    )
+        else:
+            for i, tile in enumerate(tiles, start=1):
+                with self.engine.begin() as connection:
+                    subsets = _read_tile_tables(
+                        connection,
+                        tile,
+                        tables,
+                        geom_col,
+                    )
+                result = worker(tile, **subsets, **(worker_kwargs or {}))
+                results.append(_stitch_tile_result(result, tile, geom_col))
+                print(
+                    f'\r  Processed {i} of {len(tiles)} tiles',
+                    end='',
+                    flush=True,
+                )
+        print('')
+        results = [x for x in results if x is not None and len(x) > 0]
+        if len(results) == 0:
+            return None
+        stitched = pd.concat(results)
+        if id_col is not None:
+            stitched = stitched.drop_duplicates(subset=id_col)
+        if isinstance(results[0], gpd.GeoDataFrame):
+            stitched = gpd.GeoDataFrame(
+                stitched,
+                geometry=results[0].geometry.name,
+                crs=results[0].crs,
+            )
+        return stitched
+
     def get_geojson(
         self,
         table='urban_study_region',
@@ -1889,6 +2836,90 @@ class Region:
             geojson = None
         return geojson
 
+    def _ogr_import_key(self, source: str, arguments: list) -> str:
+        """Return a key identifying a vector data import, or None if the source cannot be fingerprinted.
+
+        The key is a hash of the source path and its modification time, along with the query, target coordinate reference system and other import arguments, so that it changes if any of these do.
+        """
+        import hashlib
+        import json
+
+        path = source.replace('/vsizip//', '')
+        if not os.path.exists(path):
+            # e.g. database connections or remote resources
+            return None
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    os.path.abspath(path),
+                    os.path.getmtime(path),
+                    self.config['crs_srid'],
+                ]
+                + arguments,
+            ).encode(),
+        ).hexdigest()
+
+    def _ogr_import_cached(self, layer: str, key: str) -> bool:
+        """Whether a layer exists, having been imported using the given import key."""
+        if key is None:
+            return False
+        sql = """
+            SELECT 1
+            FROM ogr_import_cache
+            WHERE layer = :layer
+              AND key = :key
+              AND to_regclass(:layer) IS NOT NULL;
+            """
+        with self.engine.begin() as connection:
+            if (
+                connection.execute(
+                    text(
+                        "SELECT to_regclass('public.ogr_import_cache');",
+                    ),
+                ).scalar()
+                is None
+            ):
+                return False
+            return (
+                connection.execute(
+                    text(sql),
+                    {'layer': layer, 'key': key},
+                ).first()
+                is not None
+            )
+
+    def _ogr_import_record(self, layer: str, key: str) -> None:
+        """Record the import key for a layer, or forget it if the import cannot be fingerprinted."""
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    """
+                CREATE TABLE IF NOT EXISTS ogr_import_cache (
+                    layer text PRIMARY KEY,
+                    key text NOT NULL,
+                    imported timestamptz NOT NULL DEFAULT now()
+                );
+                """,
+                ),
+            )
+            if key is None:
+                connection.execute(
+                    text('DELETE FROM ogr_import_cache WHERE layer = :layer;'),
+                    {'layer': layer},
+                )
+            else:
+                connection.execute(
+                    text(
+                        """
+                    INSERT INTO ogr_import_cache (layer, key)
+                    VALUES (:layer, :key)
+                    ON CONFLICT (layer)
+                    DO UPDATE SET key = EXCLUDED.key, imported = now();
+                    """,
+                    ),
+                    {'layer': layer, 'key': key},
+                )
+
     def ogr_to_db(
         self,
         source: str,
@@ -1896,8 +2927,12 @@ class Region:
         query: str = '',
         promote_to_multi: bool = False,
         source_crs: str = None,
+        make_valid: bool = False,
     ):
-        """Read spatial data with ogr2ogr and save to Postgis database."""
+        """Read spatial data with ogr2ogr and save to Postgis database.
+
+        Features are loaded using COPY in large transactions, with the spatial index created once loading has completed.  Imports are recorded in the ogr_import_cache table, and are skipped where the layer already exists having been imported from the same, unmodified, source using the same query and coordinate reference system.
+        """
         import subprocess as sp
 
         if source.count(':') == 1:
@@ -1930,11 +2965,28 @@ class Region:
             multi = '-nlt PROMOTE_TO_MULTI'
         else:
             multi = ''
+        if make_valid:
+            multi = f'{multi} -makevalid'
+        if layer.startswith('_'):
+            # layers named with a leading underscore are temporary staging
+            # tables, which do not require crash safety (write-ahead logging)
+            unlogged = '-lco UNLOGGED=ON'
+        else:
+            unlogged = ''
         if '.zip' in source:
             # allow for GDAL Virtual File Systems
             # https://gdal.org/en/stable/user/virtual_file_systems.html
             source = f'/vsizip//{source}'
-        command = f' ogr2ogr -overwrite -progress -f "PostgreSQL" PG:"host={db_host} port={db_port} dbname={db} user={db_user} password={db_pwd}" "{source}" -lco geometry_name="geom" -lco precision=NO  -t_srs {crs_srid} {s_srs} -nln "{layer}" {multi} {query}'
+        key = self._ogr_import_key(
+            source,
+            [query, s_srs, multi, unlogged],
+        )
+        if self._ogr_import_cached(layer, key):
+            print(
+                f"  - {layer} has previously been imported from '{source}', which is unchanged; skipping import.",
+            )
+            return None
+        command = f' ogr2ogr -overwrite -progress --config PG_USE_COPY YES -gt 65536 -f "PostgreSQL" PG:"host={db_host} port={db_port} dbname={db} user={db_user} password={db_pwd}" "{source}" -lco geometry_name="geom" -lco precision=NO -lco SPATIAL_INDEX=NONE {unlogged} -t_srs {crs_srid} {s_srs} -nln "{layer}" {multi} {query}'
         failure = sp.run(command, shell=True)
         print(failure)
         # Check returncode: 0 = success, non-zero = failure
@@ -1946,6 +2998,29 @@ class Region:
                 f"Error reading in data for {layer} '{source}': {error_message}\n\nPlease check the data source, format, and configuration.",
             )
         else:
+            # the spatial index is created once loading is complete, which is
+            # faster than maintaining it as features are inserted, and then
+            # planner statistics are updated for the newly loaded table
+            with self.engine.begin() as connection:
+                geometric = connection.execute(
+                    text(
+                        """
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = 'public'
+                      AND table_name = lower(:layer)
+                      AND column_name = 'geom';
+                    """,
+                    ),
+                    {'layer': layer},
+                ).first()
+                if geometric is not None:
+                    connection.execute(
+                        text(
+                            f'CREATE INDEX IF NOT EXISTS {layer}_geom_geom_idx ON {layer} USING GIST (geom);',
+                        ),
+                    )
+                connection.execute(text(f'ANALYZE {layer};'))
+            self._ogr_import_record(layer, key)
             return failure
 
     def raster_to_db(
@@ -1962,9 +3037,7 @@ class Region:
         not the region configuration; for the population grid it is
         r.config['population'], hence e.g. config['resolution'].
         """
-        import subprocess as sp
-
-        from _utils import check_raster_resolution, reproject_raster
+        from _utils import crs_is_metric
         from osgeo import gdal
 
         # disable noisy GDAL logging
@@ -1973,108 +3046,163 @@ class Region:
         gdal.UseExceptions()
         print('Extracting raster data...')
         raster_grid = self.config['population_grid']
-        raster_stub = (
-            f'{self.config["region_dir"]}/{raster_grid}_{self.codename}'
-        )
-        # construct virtual raster table
-        vrt = f'{config["data_dir"]}/{raster_grid}_{config["crs_srid"]}.vrt'
-        raster_clipped = f'{raster_stub}_{config["crs_srid"]}.tif'
-        raster_projected = f'{raster_stub}_{self.config["crs"]["srid"]}.tif'
-        print(f'{raster} dataset...', end='', flush=True)
-        if not os.path.isfile(vrt):
-            tif_folder = f'{config["data_dir"]}'
-            tif_files = [
-                os.path.join(tif_folder, file)
-                for file in os.listdir(tif_folder)
-                if os.path.splitext(file)[-1] == '.tif'
-            ]
-            gdal.BuildVRT(vrt, tif_files)
-            print(f'{raster} has now been indexed ({vrt}).')
-        else:
-            print(f'{raster}  has already been indexed ({vrt}).')
-        print(f'\n{raster} data clipped to region...', end='', flush=True)
-        if not os.path.isfile(raster_clipped):
-            # extract study region boundary in projection of tiles
-            clipping_query = f'SELECT geom FROM {self.config["buffered_urban_study_region"]}'
-            clipping = self.get_gdf(
-                text(clipping_query),
-                geom_col='geom',
-            ).to_crs(config['crs_srid'])
-            # get clipping boundary values in required order for gdal translate
-            bbox = list(
-                clipping.bounds[['minx', 'maxy', 'maxx', 'miny']].values[0],
-            )
-            gdal.Translate(raster_clipped, vrt, projWin=bbox)
-            print(f'{raster} has now been created ({raster_clipped}).')
-        else:
-            print(f'{raster} has already been created ({raster_clipped}).')
-        print(f'\n{raster} projected for region...', end='', flush=True)
+        raster_projected = f'{self.config["region_dir"]}/{raster_grid}_{self.codename}_{self.config["crs"]["srid"]}.tif'
+        raster_cache = f'{folder_path}/process/data/_raster_cache'
+        os.makedirs(raster_cache, exist_ok=True)
+        tif_files = sorted(
+            os.path.join(config['data_dir'], file)
+            for file in os.listdir(config['data_dir'])
+            if os.path.splitext(file)[-1] == '.tif'
+        )
+        # extract study region boundary in the project coordinate reference system
+        clipping = self.get_gdf(
+            text(
+                f'SELECT geom FROM {self.config["buffered_urban_study_region"]}',
+            ),
+            geom_col='geom',
+        )
+        # preserve the configured cell size (e.g. '100m') so that a grid
+        # described as 100 m really is 100 m in the project coordinate
+        # reference system; otherwise, the cell size chosen when
+        # reprojecting from equal area projections such as the Mollweide
+        # projection of GHS population grids is inflated
         resolution = _configured_resolution(config.get('resolution'))
-        if not os.path.isfile(raster_projected):
-            # reproject and save the re-projected clipped raster,
-            # preserving the configured cell size (e.g. '100m') so that a
-            # grid described as 100 m really is 100 m in the project
-            # coordinate reference system, rather than whatever cell size
-            # falls out of preserving the source pixel count
-            reproject_raster(
-                inpath=raster_clipped,
-                outpath=raster_projected,
-                new_crs=self.config['crs']['srid'],
+        if resolution is not None and not crs_is_metric(clipping.crs):
+            resolution = None
+        key = _raster_cache_key(
+            tif_files,
+            clipping.union_all().wkb,
+            self.config['crs']['srid'],
+            resolution,
+        )
+        raster_cached = f'{raster_cache}/{key}.tif'
+        print(
+            f'{raster} clipped and projected for region...', end='', flush=True
+        )
+        if os.path.isfile(raster_cached):
+            print(f' using cached raster "{raster_cached}".')
+        else:
+            # index source tiles as a virtual raster, identified by their fingerprints
+            vrt = f'{raster_cache}/{_raster_cache_key(tif_files, b"", None, None)}.vrt'
+            if not os.path.isfile(vrt):
+                gdal.BuildVRT(vrt, tif_files)
+            cutline = f'{raster_cache}/{key}.geojson'
+            clipping.to_file(cutline, driver='GeoJSON')
+            source = gdal.Open(vrt)
+            nodata = source.GetRasterBand(1).GetNoDataValue()
+            source = None
+            if nodata is None:
+                nodata = config.get('raster_nodata')
+            # clip and reproject in a single pass, summing values to conserve totals
+            _warp_raster(
+                vrt,
+                raster_cached,
+                self.config['crs']['srid'],
+                nodata=nodata,
                 resolution=resolution,
+                cutline=cutline,
+                processes=settings['project'].get('multiprocessing', 1),
             )
-            print(f'  has now been created ({raster_projected}).')
-        else:
-            print(f'  has already been created ({raster_projected}).')
-            check_raster_resolution(raster_projected, resolution, raster_grid)
+            os.remove(cutline)
+            print(f' has now been created ("{raster_cached}").')
+        if os.path.exists(raster_projected):
+            os.remove(raster_projected)
+        try:
+            os.link(raster_cached, raster_projected)
+        except OSError:
+            shutil.copyfile(raster_cached, raster_projected)
         if raster_grid not in self.tables:
             print(
                 f'\nImport grid {raster_grid} to database... ',
                 end='',
                 flush=True,
             )
-            # import raster to postgis and vectorise, as per http://www.brianmcgill.org/postgis_zonal.pdf
             if to_vector:
-                command = (
-                    f'raster2pgsql -d -s {self.config["crs"]["srid"]} -I -Y '
-                    f"-N {config['raster_nodata']} "
-                    f'-t  1x1 {raster_projected} {raster_grid} '
-                    f'| PGPASSWORD={self.config["db_pwd"]} psql -U postgres -h {self.config["db_host"]} -d {self.config["db"]} '
-                    '>> /dev/null'
+                self._raster_cells_to_db(
+                    raster_projected,
+                    raster_grid,
+                    field,
+                    nodata=config['raster_nodata'],
+                    id_col='grid_id' if reference_grid else 'rid',
                 )
-                sp.call(command, shell=True)
-                # remove empty cells
-                with self.engine.begin() as connection:
-                    connection.execute(
-                        text(
-                            f"""DELETE FROM {raster_grid} WHERE (ST_SummaryStats(rast)).sum IS NULL;""",
-                        ),
-                    )
-                # if reference grid add and index grid id
-                if reference_grid:
-                    queries = [
-                        f"""ALTER TABLE {raster_grid} DROP COLUMN rid;""",
-                        f"""ALTER TABLE {raster_grid} ADD grid_id bigserial;""",
-                        f"""CREATE INDEX {raster_grid}_ix  ON {raster_grid} (grid_id);""",
-                    ]
-                    for sql in queries:
-                        with self.engine.begin() as connection:
-                            connection.execute(text(sql))
-                # add geometry column and calculate statistic
-                queries = [
-                    f"""ALTER TABLE {raster_grid} ADD COLUMN IF NOT EXISTS geom geometry;""",
-                    f"""UPDATE {raster_grid} SET geom = ST_ConvexHull(rast);""",
-                    f"""CREATE INDEX {raster_grid}_gix ON {raster_grid} USING GIST(geom);""",
-                    f"""ALTER TABLE {raster_grid} ADD COLUMN IF NOT EXISTS {field} int;""",
-                    f"""UPDATE {raster_grid} SET {field} = (ST_SummaryStats(rast)).sum;""",
-                    f"""ALTER TABLE {raster_grid} DROP COLUMN rast;""",
-                ]
-                for sql in queries:
-                    with self.engine.begin() as connection:
-                        connection.execute(text(sql))
             print('Done.')
         else:
             print(f'{raster_grid} has been imported to database.')
 
+    def _raster_cells_to_db(
+        self,
+        raster: str,
+        table: str,
+        field: str,
+        nodata=None,
+        id_col: str = 'grid_id',
+    ):
+        """Import cells of a single band raster having data as polygons with their values to a database table, using a single COPY."""
+        srid = self.config['crs']['srid']
+        lattice = _raster_lattice(raster)
+        data = io.StringIO()
+        _raster_cells(raster, field, nodata, id_col, srid).to_csv(
+            data,
+            sep='\t',
+            header=False,
+            index=False,
+        )
+        data.seek(0)
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"""
+                DROP TABLE IF EXISTS {table};
+                CREATE TABLE {table} (
+                    {id_col} bigint,
+                    {field} int,
+                    geom geometry(Polygon, {srid})
+                );
+                """,
+                ),
+            )
+            cursor = connection.connection.cursor()
+            cursor.copy_expert(
+                f'COPY {table} ({id_col}, {field}, geom) FROM STDIN',
+                data,
+            )
+            connection.execute(
+                text(
+                    f"""
+                CREATE INDEX {table}_ix ON {table} ({id_col});
+                CREATE INDEX {table}_gix ON {table} USING GIST (geom);
+                ANALYZE {table};
+                DROP TABLE IF EXISTS {table}_lattice;
+                CREATE TABLE {table}_lattice AS
+                SELECT
+                    {lattice['x_origin']}::float AS x_origin,
+                    {lattice['y_origin']}::float AS y_origin,
+                    {lattice['x_resolution']}::float AS x_resolution,
+                    {lattice['y_resolution']}::float AS y_resolution,
+                    {lattice['width']}::bigint AS width,
+                    {lattice['height']}::bigint AS height;
+                """,
+                ),
+            )
+
+    def grid_bin(self, geom: str, grid: str = None) -> str:
+        """Return an SQL expression for the identifier of the cell of a regular grid containing a point geometry, or None if the grid is not a regular lattice.
+
+        For grids derived from a raster, cells are identified arithmetically from point coordinates using the grid lattice recorded on import (see _grid_bin), rather than using a spatial join; points outside the grid have a null identifier.  For other (e.g. vector) grids, None is returned and a spatial join should be used.
+        """
+        if grid is None:
+            grid = self.config['population_grid']
+        if f'{grid}_lattice' not in self.get_tables():
+            return None
+        lattice = self.get_df(f'{grid}_lattice').iloc[0]
+        col = f"floor((ST_X({geom}) - {lattice['x_origin']}) / {lattice['x_resolution']})"
+        row = f"floor(({lattice['y_origin']} - ST_Y({geom})) / {lattice['y_resolution']})"
+        return f"""(CASE
+            WHEN {col} BETWEEN 0 AND {lattice['width'] - 1}
+            AND {row} BETWEEN 0 AND {lattice['height'] - 1}
+            THEN ({row} * {lattice['width']} + {col} + 1)::bigint
+        END)"""
+
     def choropleth(
         self,
         field: str = 'local_walkability',
@@ -3273,6 +4401,7 @@ region_functions = {
             'get_geojson',
             'get_bbox',
             'get_centroid',
+            'get_network',
             'get_phrases',
             'get_city_stats',
             'get_indicators',
@@ -3286,6 +4415,10 @@ region_functions = {
         'description': 'Additional functions for importing external data to the study region database once created:',
         'functions': ['ogr_to_db', 'raster_to_db'],
     },
+    'processing data': {
+        'description': 'Additional functions for processing data for large study regions tile by tile, in bounded memory:',
+        'functions': ['get_tiles', 'map_tiles', 'grid_bin'],
+    },
     'plotting': {
         'description': 'Additional functions for plotting specific data following analysis:',
         'functions': ['plot', 'choropleth', 'access_profile'],
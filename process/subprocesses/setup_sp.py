@@ -220,7 +220,7 @@ def build_dest_node_lookup(r, active_layers, distance, batch_size=500, n_workers
     with r.engine.begin() as conn:
         conn.execute(text(f'DROP TABLE IF EXISTS {_DEST_LOOKUP_TABLE}'))
         conn.execute(text(
-            f'CREATE TABLE {_DEST_LOOKUP_TABLE} (start_vid bigint, node bigint, dist float)'
+            f'CREATE UNLOGGED TABLE {_DEST_LOOKUP_TABLE} (start_vid bigint, node bigint, dist float)'
         ))
 
     if n_workers == 1 or n_batches == 1:
@@ -264,6 +264,7 @@ def build_dest_node_lookup(r, active_layers, distance, batch_size=500, n_workers
 
     with r.engine.begin() as conn:
         conn.execute(text(f'CREATE INDEX ON {_DEST_LOOKUP_TABLE} (start_vid)'))
+        conn.execute(text(f'ANALYZE {_DEST_LOOKUP_TABLE}'))
 
     return True
 
@@ -569,6 +570,97 @@ def process_distant_nodes(
     return distant_nodes
 
 
+def edge_parametric_estimates(
+    points,
+    edges,
+    gdf_nodes_simple,
+    gdf_nodes_poi_dist,
+    density_statistics,
+):
+    """Derive sample point estimates for accessibility and densities from the nodes at either end of the edges on which they are located.
+
+    This is an array-based equivalent of create_full_nodes(), requiring only the location of each sample point along its edge.  Node distances to destinations and densities are looked up once per edge end node, and distances from sample points to these nodes are derived from the positions of the nodes along the edge.  Estimates follow the same rules: sample points coinciding with a node take its values directly, otherwise the minimum of full distances via either node is taken, and densities are weighted by proximity to each node.  Sample points are restricted to those having both nodes in gdf_nodes_simple.
+
+    Parameters
+    ----------
+    points: DataFrame
+        DataFrame of sample points indexed by point_id, with edge_ogc_fid and
+        metres along the edge
+    edges: DataFrame
+        DataFrame of edges indexed by ogc_fid, with n1 and n2 node identifiers,
+        and their locations along the edge in metres (n1_metres, n2_metres)
+    gdf_nodes_simple:  GeoDataFrame
+        GeoDataFrame with density records
+    gdf_nodes_poi_dist:  GeoDataFrame
+        GeoDataFrame of distances to points of interest
+    density_statistics: list
+        list of density statistic sample point indicator names
+
+    Returns
+    -------
+    DataFrame
+    """
+    print(
+        'Derive sample point estimates for accessibility and densities based on edge end node distance relations',
+    )
+    distance_fields = list(gdf_nodes_poi_dist.columns)
+    edge = edges.index.get_indexer(points['edge_ogc_fid'])
+    located = edge >= 0
+    metres = points['metres'].to_numpy('float64', na_value=np.nan)
+    node_index = gdf_nodes_simple.index
+    nodes = {}
+    offsets = {}
+    for node in ['n1', 'n2']:
+        nodes[node] = np.full(len(points), -1)
+        nodes[node][located] = node_index.get_indexer(
+            edges[node].to_numpy()[edge[located]],
+        )
+        # distances from nodes are rounded to whole metres, as for sample points
+        offsets[node] = np.floor(
+            np.abs(
+                edges[f'{node}_metres'].to_numpy('float64', na_value=np.nan)[edge]
+                - metres,
+            )
+            + 0.5,
+        )
+    retained = located & (nodes['n1'] >= 0) & (nodes['n2'] >= 0)
+    n1, n2 = nodes['n1'][retained], nodes['n2'][retained]
+    a = offsets['n1'][retained][:, None]
+    b = offsets['n2'][retained][:, None]
+    distances = gdf_nodes_poi_dist.reindex(node_index).to_numpy(
+        'float64',
+        na_value=np.nan,
+    )
+    densities = gdf_nodes_simple[density_statistics].to_numpy(
+        'float64',
+        na_value=np.nan,
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight_n1 = 1 - a / (a + b)
+        weight_n2 = 1 - b / (a + b)
+        estimates = np.hstack(
+            [
+                np.fmin(distances[n1] + a, distances[n2] + b),
+                # as for summed weighted densities, missing values are ignored
+                np.nansum(
+                    [densities[n1] * weight_n1, densities[n2] * weight_n2],
+                    axis=0,
+                ),
+            ],
+        )
+    # sample points coinciding with nodes take their values directly
+    coincident_n1 = a[:, 0] == 0
+    coincident_n2 = ~coincident_n1 & (b[:, 0] == 0)
+    node_values = np.hstack([distances, densities])
+    estimates[coincident_n1] = node_values[n1[coincident_n1]]
+    estimates[coincident_n2] = node_values[n2[coincident_n2]]
+    return pd.DataFrame(
+        estimates,
+        index=points.index[retained],
+        columns=distance_fields + list(density_statistics),
+    )
+
+
 # Cumulative opportunities (binary)
 # 1 if d <= access_dist
 # 0 if d > access_dist
@@ -157,8 +157,12 @@ class tests(unittest.TestCase):
         import numpy as np
         import rasterio
         from rasterio.transform import from_origin
-        from subprocesses._utils import reproject_raster
+        from subprocesses.ghsci import _warp_raster
 
+        try:
+            from osgeo import gdal  # noqa: F401
+        except ImportError:
+            self.skipTest('GDAL Python bindings are not available')
         # a 100 m cell size population grid in the Mollweide projection
         # used by the Global Human Settlement Layer population grids
         cell_size = 100
@@ -173,46 +177,31 @@ class tests(unittest.TestCase):
             'transform': from_origin(-1000000, 4000000, cell_size, cell_size),
         }
         # REGCAN95 / LAEA Europe, as used by the example study region
-        new_crs = 'EPSG:4083'
+        srid = 4083
         with tempfile.TemporaryDirectory() as directory:
             source = f'{directory}/source.tif'
             with rasterio.open(source, 'w', **profile) as raster:
                 raster.write(values, 1)
-            outputs = {}
-            for label, resolution in [
-                ('specified', (cell_size, cell_size)),
-                ('default', None),
-            ]:
-                outputs[label] = f'{directory}/{label}.tif'
-                reproject_raster(
-                    inpath=source,
-                    outpath=outputs[label],
-                    new_crs=new_crs,
-                    resolution=resolution,
+            projected = f'{directory}/projected.tif'
+            _warp_raster(
+                source,
+                projected,
+                srid,
+                nodata=-200,
+                resolution=(cell_size, cell_size),
+            )
+            self.assertFalse(os.path.exists(f'{projected}.tmp'))
+            with rasterio.open(projected) as raster:
+                result = raster.read(1, masked=True)
+                result_cell_size = (
+                    abs(raster.transform.a),
+                    abs(raster.transform.e),
                 )
-            results = {}
-            for label, path in outputs.items():
-                with rasterio.open(path) as raster:
-                    results[label] = {
-                        'cell_size': (
-                            abs(raster.transform.a),
-                            abs(raster.transform.e),
-                        ),
-                        'total': float(np.nansum(raster.read(1))),
-                    }
-        # the configured cell size is retained, where specified
-        self.assertEqual(
-            results['specified']['cell_size'],
-            (cell_size, cell_size),
-        )
-        # otherwise, cells inflate to preserve the source pixel count
-        self.assertGreater(results['default']['cell_size'][0], cell_size)
-        # summing values on reprojection conserves the total; this is
-        # exact for the configured cell size, while the larger default
-        # cells lose a fraction of the total at the raster edges
+        # the configured cell size is retained
+        self.assertEqual(result_cell_size, (cell_size, cell_size))
+        # summing values on reprojection conserves the total
         total = float(values.sum())
-        self.assertAlmostEqual(results['specified']['total'], total, places=1)
-        self.assertLess(abs(results['default']['total'] - total) / total, 0.01)
+        self.assertLess(abs(float(result.sum()) - total) / total, 0.01)
 
     def test_0_5_custom_aggregation_keep_columns(self):
         """Retained custom aggregation columns are unambiguously qualified."""
@@ -297,6 +286,873 @@ class tests(unittest.TestCase):
             'GROUP BY b.MB_CODE21, b."sal_name21", b."dwelling", b.geom',
         )
 
+    def test_0_6_tile_stitching(self):
+        """Tiles cover the study region, and stitching drops halo rows."""
+        import geopandas as gpd
+        import pandas as pd
+        from shapely.geometry import Point
+        from subprocesses.ghsci import _stitch_tile_result, _tile_extents
+
+        tiles = _tile_extents((0, 0, 2500, 1000), tile_size=1000, halo=100)
+        # the extent is covered by three columns and one row of tiles
+        self.assertEqual(len(tiles), 3)
+        self.assertEqual(tiles[2]['core'], (2000, 0, 3000, 1000))
+        self.assertEqual(tiles[0]['extent'], (-100, -100, 1100, 1100))
+        # points within the halo of neighbouring tiles, including one on a
+        # shared tile edge, are each retained by exactly one tile
+        points = gpd.GeoDataFrame(
+            {'id': [1, 2, 3, 4]},
+            geometry=[
+                Point(50, 50),
+                Point(1000, 500),
+                Point(1050, 5),
+                Point(2950, 900),
+            ],
+            crs='EPSG:3857',
+        ).rename_geometry('geom')
+        stitched = pd.concat(
+            [_stitch_tile_result(points, tile) for tile in tiles],
+        )
+        self.assertEqual(sorted(stitched['id']), [1, 2, 3, 4])
+        # rows flagged by the worker are retained in preference to location
+        flagged = pd.DataFrame({'id': [1, 2], 'tile_core': [True, False]})
+        self.assertEqual(
+            list(_stitch_tile_result(flagged, tiles[0]).columns),
+            ['id'],
+        )
+        self.assertEqual(
+            list(_stitch_tile_result(flagged, tiles[0])['id']), [1]
+        )
+        with self.assertRaises(ValueError):
+            _tile_extents((0, 0, 1, 1), tile_size=0)
+
+    def test_0_7_pedestrian_network_filter(self):
+        """The pedestrian network filter is applied to local OpenStreetMap data as by the Overpass API."""
+        from subprocesses._03_create_network_resources import (
+            overpass_filter_clauses,
+            tags_match_filter,
+        )
+
+        clauses = overpass_filter_clauses(
+            ghsci.settings['network_analysis']['pedestrian'],
+        )
+        self.assertEqual(clauses[0], (False, 'highway', None, '', False))
+        for tags, expected in [
+            ({'highway': 'footway'}, True),
+            ({'highway': 'residential', 'foot': 'yes'}, True),
+            ({'highway': 'motorway'}, False),
+            ({'highway': 'motorway_link'}, False),
+            ({'highway': 'construction'}, False),
+            ({'highway': 'pedestrian', 'area': 'yes'}, False),
+            ({'highway': 'service', 'service': 'private'}, False),
+            ({'highway': 'track', 'access': 'private'}, False),
+            ({'highway': 'path', 'foot': 'no'}, False),
+            ({'building': 'yes'}, False),
+        ]:
+            with self.subTest(tags=tags):
+                self.assertEqual(tags_match_filter(tags, clauses), expected)
+        # other forms of Overpass QL tag filters
+        clauses = overpass_filter_clauses(
+            '[!"railway"]["surface"="paved"]["name"~"^main",i]["lit"!="no"]',
+        )
+        self.assertTrue(
+            tags_match_filter(
+                {'surface': 'paved', 'name': 'Main St'}, clauses
+            ),
+        )
+        self.assertFalse(
+            tags_match_filter(
+                {'surface': 'paved', 'name': 'Main St', 'lit': 'no'},
+                clauses,
+            ),
+        )
+        with self.assertRaises(ValueError):
+            overpass_filter_clauses('highway')
+
+    def test_0_8_network_union(self):
+        """Per-polygon networks are combined and filtered by component size as by networkx compose and connected components."""
+        import networkx as nx
+        from subprocesses._03_create_network_resources import (
+            connected_nodes,
+            graph_union,
+        )
+
+        G1 = nx.MultiDiGraph(crs='epsg:4326')
+        G1.add_edge(1, 2, 0, length=10)
+        G1.add_edge(2, 3, 0, length=20)
+        G1.add_node(9)
+        G2 = nx.MultiDiGraph(crs='epsg:4326')
+        G2.add_edge(3, 4, 0, length=30)
+        G2.add_edge(7, 8, 0, length=40)
+        G2.add_edge(1, 2, 0, length=15)
+        G = graph_union([G1, G2])
+        expected = nx.compose(G1, G2)
+        self.assertEqual(set(G.nodes), set(expected.nodes))
+        self.assertEqual(
+            sorted(G.edges(keys=True, data='length')),
+            sorted(expected.edges(keys=True, data='length')),
+        )
+        for threshold in [1, 2, 3, 5]:
+            with self.subTest(threshold=threshold):
+                self.assertEqual(
+                    connected_nodes(G, threshold),
+                    {
+                        node
+                        for c in nx.weakly_connected_components(G)
+                        if len(c) >= threshold
+                        for node in c
+                    },
+                )
+
+    def test_0_9_network_snapshot(self):
+        """The network snapshot reproduces shortest path lengths of the undirected network."""
+        import tempfile
+        from unittest.mock import MagicMock
+
+        import networkx as nx
+        import pandas as pd
+        from scipy.sparse.csgraph import dijkstra
+
+        nodes = pd.DataFrame(
+            {
+                'osmid': [5, 10, 20, 30],
+                'x': [0.0, 1.0, 2.0, 3.0],
+                'y': [0.0, 0.0, 1.0, 1.0],
+            },
+        )
+        # parallel edges between nodes 5 and 10; node 30 is isolated
+        edges = pd.DataFrame(
+            {'u': [10, 20, 10], 'v': [5, 10, 5], 'length': [1.0, 2.0, 0.5]},
+        )
+        with tempfile.TemporaryDirectory() as region_dir:
+            r = MagicMock()
+            r.codename = 'test'
+            r.config = {
+                'region_dir': region_dir,
+                'crs': {'srid': 32628},
+                'crs_srid': 'EPSG:32628',
+            }
+            r.get_df.side_effect = lambda sql: (
+                nodes if 'FROM nodes' in sql else edges
+            )
+            r.write_network_snapshot.side_effect = (
+                lambda version: ghsci.Region.write_network_snapshot(
+                    r,
+                    version,
+                )
+            )
+            r.network_version.return_value = 'a' * 32
+            snapshot_nodes, adjacency = ghsci.Region.get_network(r)
+            G = ghsci.Region.get_network(r, networkx=True)
+            # the snapshot is written once, and replaced if the network is
+            # rebuilt
+            self.assertEqual(r.write_network_snapshot.call_count, 1)
+            r.network_version.return_value = 'b' * 32
+            ghsci.Region.get_network(r)
+            self.assertEqual(r.write_network_snapshot.call_count, 2)
+            self.assertEqual(
+                os.listdir(region_dir),
+                [f'test_network_{"b" * 16}.npz'],
+            )
+        self.assertEqual(snapshot_nodes.index.tolist(), [5, 10, 20, 30])
+        self.assertEqual(snapshot_nodes.loc[20, 'y'], 1.0)
+        self.assertEqual(G.number_of_nodes(), 4)
+        self.assertEqual(G.edges[5, 10]['length'], 0.5)
+        distances = dijkstra(adjacency, indices=0)
+        self.assertEqual(distances.tolist()[:3], [0.0, 0.5, 2.5])
+        self.assertEqual(
+            nx.single_source_dijkstra_path_length(G, 5, weight='length'),
+            {5: 0, 10: 0.5, 20: 2.5},
+        )
+
+    def test_0_10_raster_cells(self):
+        """Raster cells having data are represented as polygons with rounded values, identified by their position in the raster."""
+        import tempfile
+
+        import numpy as np
+        import rasterio
+        import shapely
+        from rasterio.transform import from_origin
+        from subprocesses.ghsci import (
+            _grid_bin,
+            _raster_cells,
+            _raster_lattice,
+        )
+
+        values = np.array(
+            [[1.4, -200, 2.5], [-200, 0, 3.6]],
+            dtype='float32',
+        )
+        profile = {
+            'driver': 'GTiff',
+            'dtype': 'float32',
+            'count': 1,
+            'width': 3,
+            'height': 2,
+            'crs': 'EPSG:4083',
+            'transform': from_origin(1000, 2000, 100, 100),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            source = f'{directory}/source.tif'
+            with rasterio.open(source, 'w', **profile) as raster:
+                raster.write(values, 1)
+            cells = _raster_cells(source, 'pop_est', nodata=-200, srid=4083)
+            lattice = _raster_lattice(source)
+        # cells are identified by their position in the raster
+        self.assertEqual(cells['grid_id'].tolist(), [1, 3, 5, 6])
+        # zero valued cells are retained, as for the population grid
+        self.assertEqual(cells['pop_est'].tolist(), [1, 2, 0, 4])
+        geometries = shapely.from_wkb(cells['geom'])
+        self.assertEqual(shapely.get_srid(geometries[0]), 4083)
+        self.assertEqual(geometries[0].bounds, (1000, 1900, 1100, 2000))
+        self.assertEqual(geometries[3].bounds, (1200, 1800, 1300, 1900))
+        self.assertTrue((shapely.area(geometries) == 10000).all())
+        # points are binned to the cells containing them, or 0 if outside
+        centroids = shapely.centroid(geometries)
+        self.assertEqual(
+            _grid_bin(
+                shapely.get_x(centroids),
+                shapely.get_y(centroids),
+                lattice,
+            ).tolist(),
+            cells['grid_id'].tolist(),
+        )
+        self.assertEqual(
+            _grid_bin([999, 1100, 1250], [1950, 1900, 1700], lattice).tolist(),
+            [0, 5, 0],
+        )
+
+    def test_0_11_raster_cache_key(self):
+        """Cached rasters are identified by their sources, clipping geometry, coordinate reference system and resolution."""
+        import tempfile
+
+        import shapely
+        from subprocesses.ghsci import _raster_cache_key
+
+        clipping = shapely.box(0, 0, 1000, 1000).wkb
+        with tempfile.TemporaryDirectory() as directory:
+            sources = [f'{directory}/b.tif', f'{directory}/a.tif']
+            for source in sources:
+                with open(source, 'wb') as f:
+                    f.write(b'tile')
+            key = _raster_cache_key(sources, clipping, 4083, (100, 100))
+            # the order of source files is not significant
+            self.assertEqual(
+                key,
+                _raster_cache_key(sources[::-1], clipping, 4083, (100, 100)),
+            )
+            for label, arguments in {
+                'clipping': (
+                    shapely.box(0, 0, 900, 1000).wkb,
+                    4083,
+                    (100, 100),
+                ),
+                'crs': (clipping, 32628, (100, 100)),
+                'resolution': (clipping, 4083, (1000, 1000)),
+            }.items():
+                with self.subTest(changed=label):
+                    self.assertNotEqual(
+                        key,
+                        _raster_cache_key(sources, *arguments),
+                    )
+            # modified source files invalidate the cache
+            with open(sources[0], 'ab') as f:
+                f.write(b'updated')
+            self.assertNotEqual(
+                key,
+                _raster_cache_key(sources, clipping, 4083, (100, 100)),
+            )
+
+    def test_0_12_osm_destination_rules(self):
+        """Destinations identified by any matching tag are classified using unique key/value rules."""
+        import pandas as pd
+        from subprocesses._05_compile_destinations import (
+            osm_destination_rules,
+        )
+
+        df_osm_dest = pd.DataFrame(
+            [
+                ['market', 'Market', 'Food', 'shop', 'supermarket', 'OR'],
+                ['market', 'Market', 'NULL', 'supermarket', 'NULL', 'OR'],
+                ['market', 'Market', 'Food', 'shop', 'supermarket', 'OR'],
+                [
+                    'pt_any',
+                    'Public transport',
+                    'NULL',
+                    'highway',
+                    'bus_stop',
+                    'OR',
+                ],
+                ['park', 'Park', 'Leisure', 'leisure', 'park', 'AND'],
+                ['park', 'Park', 'Leisure', 'access', 'private', 'NOT'],
+            ],
+            columns=[
+                'dest_name',
+                'dest_full_name',
+                'domain',
+                'key',
+                'value',
+                'pre-condition',
+            ],
+        )
+        rules, dest_types = osm_destination_rules(df_osm_dest, {'pt_any'})
+        self.assertEqual(
+            rules.values.tolist(),
+            [
+                ['market', 'shop', 'supermarket'],
+                ['market', 'supermarket', None],
+            ],
+        )
+        self.assertEqual(
+            dest_types.values.tolist(),
+            [['market', 'Market', 'Food']],
+        )
+
+    def test_0_13_merge_tile_clusters(self):
+        """Open space clusters sharing open spaces across tiles are merged, and numbered in order of their lowest os_id."""
+        import pandas as pd
+        from subprocesses._06_open_space_areas_setup import (
+            merge_tile_clusters,
+        )
+
+        # open spaces 1-2-3 form a chain crossing tiles 0 and 1, while open
+        # space 5 is only clustered with 4 within tile 1; open space 6 is a
+        # waterway, labelled using its os_id
+        labels = pd.DataFrame(
+            [
+                [0, 'public', 0, 3],
+                [0, 'public', 0, 2],
+                [0, 'public', 1, 7],
+                [1, 'public', 0, 2],
+                [1, 'public', 0, 1],
+                [1, 'public', 1, 5],
+                [1, 'public', 1, 4],
+                [1, 'not_public', 0, 8],
+                [1, 'waterway', 6, 6],
+            ],
+            columns=['tile_id', 'cluster_group', 'cluster', 'os_id'],
+        )
+        clusters = merge_tile_clusters(labels)
+        self.assertEqual(
+            dict(zip(clusters['os_id'], clusters['aos_id'])),
+            {1: 1, 2: 1, 3: 1, 4: 2, 5: 2, 6: 3, 7: 4, 8: 5},
+        )
+        # tiles without any labelled open space yield an empty table
+        empty = merge_tile_clusters(labels.iloc[0:0])
+        self.assertEqual(list(empty.columns), ['os_id', 'aos_id'])
+        self.assertEqual(len(empty), 0)
+        empty = merge_tile_clusters(
+            pd.DataFrame(
+                columns=['os_id', 'cluster_group', 'cluster', 'tile_id'],
+            ),
+        )
+        self.assertEqual(len(empty), 0)
+
+    def test_0_14_sample_points_along_edges(self):
+        """Sample points are located at regular intervals along edges, without duplicates at junctions, with distances to their end nodes."""
+        import geopandas as gpd
+        import shapely
+        from subprocesses._07_locate_origins_destinations import (
+            sample_points_along_edges,
+        )
+
+        # a 65 m edge from node 1, and a 60 m edge whose geometry runs
+        # towards its 'from' node 1, meeting it at their shared junction
+        edges = gpd.GeoDataFrame(
+            {
+                'ogc_fid': [1, 2],
+                'from': [1, 1],
+                'to': [2, 3],
+                'llp1': [0.0, 1.0],
+                'llp2': [1.0, 0.0],
+            },
+            geometry=[
+                shapely.LineString([(0, 0), (65, 0)]),
+                shapely.LineString([(0, 60), (0, 0)]),
+            ],
+        )
+        points = sample_points_along_edges(edges, 30)
+        # the point at the end of the second edge duplicates that at the
+        # start of the first, so is not retained
+        self.assertEqual(points['point_id'].tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(points['edge_ogc_fid'].tolist(), [1, 1, 1, 2, 2])
+        self.assertEqual(points['metres'].tolist(), [0, 30, 60, 0, 30])
+        self.assertEqual(
+            shapely.get_coordinates(points['geom'].values).tolist(),
+            [[0, 0], [30, 0], [60, 0], [0, 60], [0, 30]],
+        )
+        self.assertEqual(points['n1'].tolist(), [1, 1, 1, 1, 1])
+        self.assertEqual(points['n2'].tolist(), [2, 2, 2, 3, 3])
+        self.assertEqual(
+            points['n1_distance'].tolist(),
+            [0, 30, 60, 60, 30],
+        )
+        self.assertEqual(
+            points['n2_distance'].tolist(),
+            [65, 35, 5, 0, 30],
+        )
+
+    def test_0_15_edge_parametric_estimates(self):
+        """Sample point estimates derived from edge end nodes should match those derived from sample point records."""
+        import geopandas as gpd
+        import numpy as np
+        import pandas as pd
+        import shapely
+        from subprocesses._07_locate_origins_destinations import (
+            sample_points_along_edges,
+        )
+        from subprocesses.setup_sp import (
+            create_full_nodes,
+            edge_parametric_estimates,
+        )
+
+        edges = gpd.GeoDataFrame(
+            {
+                'ogc_fid': [1, 2, 3],
+                'from': [1, 1, 3],
+                'to': [2, 3, 4],
+                'llp1': [0.0, 1.0, 0.0],
+                'llp2': [1.0, 0.0, 1.0],
+            },
+            geometry=[
+                shapely.LineString([(0, 0), (65, 0)]),
+                shapely.LineString([(0, 60), (0, 0)]),
+                shapely.LineString([(0, 60), (0, 200)]),
+            ],
+        )
+        points = sample_points_along_edges(edges, 30).set_index('point_id')
+        # node 4 lacks density estimates, so points on its edge are excluded
+        nodes_simple = pd.DataFrame(
+            {
+                'pop_density': [1000.0, 3000.0, np.nan],
+                'intersection_density': [40.0, 80.0, 100.0],
+            },
+            index=pd.Index([1, 2, 3], name='osmid'),
+        )
+        nodes_poi_dist = pd.DataFrame(
+            {
+                'sp_nearest_node_fresh_food': [100, np.nan, 400, 50],
+                'sp_nearest_node_pt_any': [np.nan, np.nan, np.nan, np.nan],
+            },
+            index=pd.Index([1, 2, 3, 4], name='osmid'),
+        ).astype('Int64')
+        density_statistics = list(nodes_simple.columns)
+        retained = points[points['n1'].isin(nodes_simple.index)][
+            points['n2'].isin(nodes_simple.index)
+        ]
+        expected = create_full_nodes(
+            retained,
+            nodes_simple,
+            nodes_poi_dist,
+            density_statistics,
+        )
+        result = edge_parametric_estimates(
+            points[['edge_ogc_fid', 'metres']],
+            pd.DataFrame(
+                {
+                    'n1': edges['from'].values,
+                    'n2': edges['to'].values,
+                    'n1_metres': (edges['llp1'] * edges.length).values,
+                    'n2_metres': (edges['llp2'] * edges.length).values,
+                },
+                index=edges['ogc_fid'].values,
+            ),
+            nodes_simple,
+            nodes_poi_dist,
+            density_statistics,
+        )
+        self.assertEqual(result.index.tolist(), retained.index.tolist())
+        pd.testing.assert_frame_equal(
+            result,
+            expected[result.columns].astype(float),
+            check_names=False,
+        )
+
+    def test_0_16_read_urban_covariates(self):
+        """Covariates are read only for the urban region record matching the urban query, within the study region bounds."""
+        import tempfile
+
+        import geopandas as gpd
+        import shapely
+        from subprocesses._09_urban_covariates import read_urban_covariates
+
+        urban_regions = gpd.GeoDataFrame(
+            {
+                'UC_NM_MN': ['Las Palmas', 'Las Palmas', 'Telde'],
+                'CTR_MN_NM': ['Spain', 'Chile', 'Spain'],
+                'E_WR_T_14': [21.5, 14.0, 22.0],
+                'E_WR_P_14': [0.02, 0.1, 0.03],
+            },
+            geometry=[
+                shapely.box(-15.5, 28.0, -15.4, 28.2),
+                shapely.box(-71.0, -33.0, -70.9, -32.9),
+                shapely.box(-15.4, 27.9, -15.3, 28.0),
+            ],
+            crs=4326,
+        )
+        region = gpd.GeoDataFrame(
+            geometry=[shapely.box(-15.45, 28.05, -15.42, 28.1)],
+            crs=4326,
+        ).to_crs(4083)
+        with tempfile.TemporaryDirectory() as directory:
+            source = f'{directory}/urban_regions.gpkg'
+            urban_regions.to_file(source, engine='pyogrio')
+            covariates, covariate_list = read_urban_covariates(
+                source,
+                "UC_NM_MN=='Las Palmas' and CTR_MN_NM=='Spain'",
+                ['E_WR_T_14', 'not_a_covariate'],
+                region=region,
+            )
+        self.assertEqual(covariate_list, ['E_WR_T_14'])
+        self.assertEqual(list(covariates.columns), ['E_WR_T_14'])
+        self.assertEqual(covariates['E_WR_T_14'].tolist(), [21.5])
+
+    def test_0_17_load_gtfs_zip(self):
+        """GTFS feeds are loaded with times in seconds and stop times for stops within the bounding box, and cached."""
+        import tempfile
+
+        import gtfslite
+        import pandas as pd
+        import pyarrow as pa
+        from subprocesses._gtfs_utils import (
+            gtfs_time_to_seconds,
+            load_gtfs_zip,
+        )
+
+        self.assertEqual(
+            gtfs_time_to_seconds(
+                pa.array(['07:00:00', '7:30:15', '25:10:05', None]),
+            ).to_pylist(),
+            [25200, 27015, 90605, None],
+        )
+        path = './data/transit_feeds/Example/gtfs_es_las_palmas_de_gran_canaria_guaguas_20230222.zip'
+        bbox = {'xmin': -15.5, 'ymin': 28.05, 'xmax': -15.38, 'ymax': 28.2}
+        reference = gtfslite.GTFS.load_zip(path)
+        with tempfile.TemporaryDirectory() as directory:
+            feed = load_gtfs_zip(path, bbox=bbox, cache_dir=directory)
+            cached = load_gtfs_zip(path, bbox=bbox, cache_dir=directory)
+        self.assertEqual(
+            feed.stops['stop_id'].tolist(),
+            reference.stops.query(
+                '(stop_lat >= 28.05) and (stop_lat <= 28.2) and (stop_lon >= -15.5) and (stop_lon <= -15.38)',
+            )['stop_id'].tolist(),
+        )
+        stop_times = reference.stop_times[
+            reference.stop_times['stop_id'].isin(feed.stops['stop_id'])
+        ]
+        self.assertGreater(len(stop_times), 0)
+        self.assertEqual(
+            feed.stop_times['departure_time'].tolist(),
+            [
+                int(h) * 3600 + int(m) * 60 + int(s)
+                for h, m, s in stop_times['departure_time'].str.split(':')
+            ],
+        )
+        for table in ['stops', 'routes', 'trips', 'calendar', 'stop_times']:
+            pd.testing.assert_frame_equal(
+                getattr(feed, table),
+                getattr(cached, table),
+            )
+
+    def test_0_18_stop_frequency_by_mode(self):
+        """Stop headways derived for all modes at once match those derived for each mode separately."""
+        import gtfslite
+        import pandas as pd
+        from subprocesses._gtfs_utils import (
+            get_hlc_stop_frequency,
+            get_stop_frequency_by_mode,
+            time_to_seconds,
+        )
+
+        def stop_times(trip_id, stops, first, interval=120):
+            return [
+                (trip_id, stop, first + i * interval, i + 1)
+                for i, stop in enumerate(stops)
+            ]
+
+        # weekday and weekend services, with a service added for one date
+        # and the weekday service removed for another
+        calendar = pd.DataFrame(
+            {
+                'service_id': ['WD', 'WE'],
+                **{
+                    day: [int(i < 5), int(i >= 5)]
+                    for i, day in enumerate(
+                        [
+                            'monday',
+                            'tuesday',
+                            'wednesday',
+                            'thursday',
+                            'friday',
+                            'saturday',
+                            'sunday',
+                        ],
+                    )
+                },
+                'start_date': ['20230401', '20230401'],
+                'end_date': ['20230630', '20230630'],
+            },
+        )
+        calendar_dates = pd.DataFrame(
+            {
+                'service_id': ['EX', 'WD'],
+                'date': ['20230410', '20230412'],
+                'exception_type': [1, 2],
+            },
+        )
+        routes = pd.DataFrame(
+            {
+                'route_id': ['R1', 'R2', 'R3'],
+                'agency_id': ['A', 'B', 'B'],
+                'route_type': [3, 0, 3],
+            },
+        )
+        trips = pd.DataFrame(
+            {
+                'route_id': ['R1'] * 4 + ['R2', 'R3', 'R3', 'R1'],
+                'service_id': ['WD', 'WD', 'WD', 'WE', 'WD', 'WD', 'EX', 'WD'],
+                'trip_id': ['B1', 'B2', 'B3', 'B4', 'F1', 'C1', 'C2', 'N1'],
+                'direction_id': [0, 0, 1, 0, 0, 1, 1, 0],
+            },
+        )
+        records = (
+            stop_times('B1', ['S1', 'S2', 'S3'], time_to_seconds('07:30:00'))
+            + stop_times('B2', ['S1', 'S2', 'S3'], time_to_seconds('08:00:00'))
+            + stop_times('B3', ['S3', 'S2', 'S1'], time_to_seconds('12:00:00'))
+            + stop_times('B4', ['S1', 'S2'], time_to_seconds('09:00:00'))
+            + stop_times('F1', ['S2', 'S4'], time_to_seconds('06:00:00'))
+            + stop_times('C1', ['S4', 'S3'], time_to_seconds('18:58:00'))
+            + stop_times('C2', ['S4', 'S3'], time_to_seconds('10:00:00'))
+            # a service continuing past midnight
+            + stop_times('N1', ['S1', 'S2'], time_to_seconds('24:50:00'))
+        )
+        feed = gtfslite.GTFS(
+            agency=None,
+            stops=pd.DataFrame({'stop_id': ['S1', 'S2', 'S3', 'S4']}),
+            routes=routes,
+            trips=trips,
+            stop_times=pd.DataFrame(
+                records,
+                columns=[
+                    'trip_id',
+                    'stop_id',
+                    'departure_time',
+                    'stop_sequence',
+                ],
+            ).astype({'departure_time': 'Int64', 'stop_sequence': 'Int64'}),
+            calendar=calendar.astype(
+                {x: 'Int64' for x in calendar.columns[1:8]},
+            ),
+            calendar_dates=calendar_dates,
+            frequencies=pd.DataFrame(
+                {
+                    'trip_id': ['F1', 'F1'],
+                    'start_time': [
+                        time_to_seconds('06:00:00'),
+                        time_to_seconds('08:00:00'),
+                    ],
+                    'end_time': [
+                        time_to_seconds('08:00:00'),
+                        time_to_seconds('20:00:00'),
+                    ],
+                    'headway_secs': [600, 900],
+                },
+            ),
+        )
+        modes = {
+            'Bus': {'route_types': [3], 'agency_id': None},
+            'Tram': {'route_types': [0], 'agency_id': None},
+            'Agency B': {'route_types': None, 'agency_id': ['B']},
+            'Bus B': {'route_types': [3], 'agency_id': ['B']},
+            'Ferry': {'route_types': [4], 'agency_id': None},
+        }
+        arguments = ['07:00:00', '19:00:00', '20230403', '20230501']
+        result = get_stop_frequency_by_mode(feed, modes, *arguments)
+        for mode in modes:
+            with self.subTest(mode=mode):
+                expected = get_hlc_stop_frequency(
+                    feed,
+                    *arguments,
+                    modes[mode]['route_types'],
+                    modes[mode]['agency_id'],
+                )
+                headway = result.loc[
+                    result['mode'] == mode,
+                    ['stop_id', 'headway'],
+                ].set_index('stop_id')
+                self.assertEqual(
+                    sorted(headway.index),
+                    sorted(expected.index),
+                )
+                if mode != 'Ferry':
+                    self.assertGreater(len(headway), 0)
+                for stop in expected.index:
+                    self.assertAlmostEqual(
+                        headway.loc[stop, 'headway'],
+                        expected.loc[stop, 'headway'],
+                    )
+
+    def test_0_19_session_profile(self):
+        """The database size used to size the session profile is queried once for connections sharing a profile."""
+        from subprocesses.ghsci import _apply_session_profile
+
+        statements = []
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def execute(self, sql):
+                statements.append(sql)
+
+            def fetchone(self):
+                return (512 * 1024**2,)
+
+        class Connection:
+            autocommit = False
+
+            def cursor(self):
+                return Cursor()
+
+        profile = {}
+        connections = [Connection() for i in range(3)]
+        for connection in connections:
+            _apply_session_profile(connection, profile)
+            self.assertFalse(connection.autocommit)
+        self.assertEqual(
+            len([x for x in statements if 'pg_database_size' in x]),
+            1,
+        )
+        self.assertEqual(
+            len([x for x in statements if x.startswith('SET work_mem')]),
+            3,
+        )
+
+    def test_0_20_tile_neighbourhood_densities(self):
+        """Neighbourhood densities derived tile by tile match those derived for the network as a whole."""
+        import geopandas as gpd
+        import networkx as nx
+        import numpy as np
+        import pandas as pd
+        import shapely
+        from subprocesses._11_neighbourhood_analysis import (
+            tile_neighbourhood_densities,
+        )
+        from subprocesses.ghsci import (
+            _in_tile_core,
+            _stitch_tile_result,
+            _tile_extents,
+        )
+
+        # a lattice network of 100 m blocks, with a 250 m population grid
+        # whose first column of cells is not populated
+        x, y = np.meshgrid(np.arange(0, 2050, 100), np.arange(0, 1050, 100))
+        nodes = gpd.GeoDataFrame(
+            {'osmid': np.arange(x.size) + 1},
+            geometry=gpd.points_from_xy(x.ravel(), y.ravel()),
+            crs='EPSG:3857',
+        ).rename_geometry('geom')
+        ids = nodes['osmid'].to_numpy().reshape(x.shape)
+        pairs = np.concatenate(
+            [
+                np.stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()], axis=1),
+                np.stack([ids[:-1, :].ravel(), ids[1:, :].ravel()], axis=1),
+            ],
+        )
+        xy = nodes.set_index('osmid').geometry
+        edges = gpd.GeoDataFrame(
+            {'u': pairs[:, 0], 'v': pairs[:, 1], 'length': 100.0},
+            geometry=shapely.linestrings(
+                np.stack(
+                    [
+                        shapely.get_coordinates(xy.loc[pairs[:, 0]].values),
+                        shapely.get_coordinates(xy.loc[pairs[:, 1]].values),
+                    ],
+                    axis=1,
+                ),
+            ),
+            crs='EPSG:3857',
+        ).rename_geometry('geom')
+        gx, gy = np.meshgrid(
+            np.arange(250, 2100, 250), np.arange(0, 1100, 250)
+        )
+        grid = gpd.GeoDataFrame(
+            {
+                'grid_id': np.arange(gx.size) + 1,
+                'pop_per_sqkm': np.arange(gx.size) * 10.0,
+                'intersections_per_sqkm': np.arange(gx.size) % 7 + 1.0,
+            },
+            geometry=shapely.box(
+                gx.ravel(), gy.ravel(), gx.ravel() + 250, gy.ravel() + 250
+            ),
+            crs='EPSG:3857',
+        ).rename_geometry('geom')
+        distance = 300
+        required = np.array([1, 2])
+
+        def tile_subset(gdf, tile):
+            subset = gdf.loc[gdf.intersects(shapely.box(*tile['extent']))]
+            points = subset.geometry.representative_point()
+            return subset.assign(
+                tile_core=_in_tile_core(points.x, points.y, tile['core']),
+            )
+
+        tiles = _tile_extents(
+            nodes.total_bounds,
+            tile_size=700,
+            halo=distance,
+        )
+        tiled = pd.concat(
+            [
+                _stitch_tile_result(
+                    tile_neighbourhood_densities(
+                        tile,
+                        tile_subset(nodes, tile),
+                        tile_subset(edges, tile),
+                        tile_subset(grid, tile),
+                        distance,
+                        required,
+                    ),
+                    tile,
+                )
+                for tile in tiles
+            ],
+        ).sort_index()
+        # expected values, derived for the network as a whole
+        G = nx.Graph()
+        G.add_weighted_edges_from(
+            zip(edges['u'], edges['v'], edges['length']),
+            weight='length',
+        )
+        node_grid = gpd.sjoin(nodes, grid, predicate='within').set_index(
+            'osmid',
+        )
+        grid = grid.set_index('grid_id')
+        expected = {}
+        for n in nodes['osmid']:
+            if n not in node_grid.index and n not in required:
+                continue
+            reached = nx.single_source_dijkstra_path_length(
+                G,
+                n,
+                distance,
+                'length',
+            )
+            cells = node_grid.loc[
+                node_grid.index.isin(list(reached.keys())),
+                'grid_id',
+            ].unique()
+            expected[n] = grid.loc[cells, 'pop_per_sqkm'].mean()
+        self.assertEqual(list(tiled.index), sorted(expected.keys()))
+        self.assertTrue(tiled.index.is_unique)
+        np.testing.assert_allclose(
+            tiled['sp_local_nh_avg_pop_density'].to_numpy(),
+            [expected[n] for n in tiled.index],
+        )
+
     def test_1_global_indicators_shell(self):
         """Unix shell script should only have unix-style line endings."""
         counts = calculate_line_endings('../global-indicators.sh')
@@ -322,6 +1178,242 @@ class tests(unittest.TestCase):
         r = ghsci.example()
         r.analysis()
 
+    def test_5_example_intersection_parity(self):
+        """Intersections consolidated in the database match those of OSMnx consolidate_intersections()."""
+        import osmnx as ox
+        from sqlalchemy import text
+        from subprocesses._03_create_network_resources import (
+            consolidate_intersections,
+        )
+
+        r = ghsci.example()
+        tolerance = r.config['network']['intersection_tolerance']
+        table = f'_test_intersections_{tolerance}m'
+        consolidate_intersections(r, tolerance, table)
+        database = r.get_gdf(table)
+        with r.engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE IF EXISTS {table};'))
+        nodes = r.get_gdf('nodes', index_col='osmid').rename_geometry(
+            'geometry',
+        )
+        edges = r.get_gdf(
+            'edges_simplified',
+            index_col=['u', 'v', 'key'],
+        ).rename_geometry('geometry')
+        G_proj = ox.graph_from_gdfs(nodes, edges)
+        osmnx = ox.consolidate_intersections(
+            G_proj,
+            tolerance=tolerance,
+            rebuild_graph=False,
+            dead_ends=False,
+        )
+        self.assertEqual(len(database), len(osmnx))
+        distance = database.geometry.apply(
+            lambda x: osmnx.distance(x).min(),
+        )
+        self.assertLess(distance.max(), 0.01)
+
+    def test_5_example_open_space_clustering(self):
+        """Open space clustered using ST_ClusterDBSCAN, whether over the whole region or tile by tile, matches that clustered using ST_ClusterWithin."""
+        from sqlalchemy import text
+        from subprocesses._06_open_space_areas_setup import (
+            open_space_cluster_group,
+            open_space_cluster_tolerance,
+            open_space_clusters,
+        )
+
+        r = ghsci.example()
+        srid = r.config['crs']['srid']
+        source = '_test_open_space'
+        # a synthetic lattice of rectangles, some touching their neighbours
+        # to form chains crossing tile boundaries, in public and not public
+        # groups, with some waterways which are not clustered
+        with r.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"""
+                DROP TABLE IF EXISTS {source};
+                CREATE TABLE {source} AS
+                SELECT row_number() OVER ()::int AS os_id,
+                       ST_MakeEnvelope(x, y, x + 10 + (x * 7 + y * 3) % 15, y + 10, {srid}) AS geom,
+                       (x / 20) % 3 != 0 AS public_access,
+                       FALSE AS within_public,
+                       FALSE AS linear_feature,
+                       NULL::boolean AS acceptable_linear_feature,
+                       CASE WHEN (x + y) % 500 = 0 THEN TRUE END AS linear_features
+                FROM generate_series(0, 1980, 20) x, generate_series(0, 1975, 25) y;
+                CREATE INDEX ON {source} USING GIST (geom);
+                """,
+                ),
+            )
+            within = connection.execute(
+                text(
+                    f"""
+                SELECT ST_Area(ST_UnaryUnion(gc))
+                FROM (
+                    SELECT unnest(ST_ClusterWithin(geom, {open_space_cluster_tolerance})) gc
+                    FROM {source}
+                    WHERE ({open_space_cluster_group}) IN ('public', 'not_public')
+                    GROUP BY ({open_space_cluster_group})
+                    UNION ALL
+                    SELECT geom FROM {source}
+                    WHERE ({open_space_cluster_group}) IN ('linear', 'waterway')
+                ) c;
+                """,
+                ),
+            ).all()
+        expected = (len(within), sum(area for (area,) in within))
+        for method in ['database', 'tiles']:
+            with self.subTest(method=method):
+                table = f'{source}_clusters'
+                open_space_clusters(
+                    r,
+                    method,
+                    source=source,
+                    table=table,
+                    tile_size=500,
+                )
+                with r.engine.begin() as connection:
+                    result = connection.execute(
+                        text(
+                            f"""
+                        SELECT count(*), sum(area), min(aos_id), max(aos_id)
+                        FROM (
+                            SELECT aos_id, ST_Area(ST_Union(geom)) area
+                            FROM {source} JOIN {table} USING (os_id)
+                            GROUP BY aos_id
+                        ) t;
+                        """,
+                        ),
+                    ).one()
+                    connection.execute(text(f'DROP TABLE IF EXISTS {table};'))
+                self.assertEqual(result[0], expected[0])
+                self.assertAlmostEqual(result[1], expected[1], places=3)
+                # areas of open space are numbered consecutively from 1
+                self.assertEqual((result[2], result[3]), (1, expected[0]))
+        with r.engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE IF EXISTS {source};'))
+
+    def test_5_example_aos_entry_points(self):
+        """Benchmark derivation of public open space entry points against the previous approach, which they should match."""
+        import time
+
+        from sqlalchemy import text
+        from subprocesses._06_open_space_areas_setup import (
+            aos_entry_points,
+            aos_entry_points_by_nodes,
+        )
+
+        r = ghsci.example()
+        results = {}
+        for label, function in [
+            ('nodes', aos_entry_points_by_nodes),
+            ('edges', aos_entry_points),
+        ]:
+            tables = [f'_test_aos_{label}_any', f'_test_aos_{label}_large']
+            start = time.time()
+            function(r, *tables)
+            elapsed = time.time() - start
+            results[label] = {
+                table: set(
+                    r.get_df(f'SELECT aos_entryid FROM {table}')[
+                        'aos_entryid'
+                    ],
+                )
+                for table in tables
+            }
+            with r.engine.begin() as connection:
+                connection.execute(
+                    text(f'DROP TABLE IF EXISTS {", ".join(tables)};'),
+                )
+            print(
+                f'\n{label}: {elapsed:.2f} seconds, '
+                f'{" and ".join(str(len(x)) for x in results[label].values())} entry points (any and large public open space)',
+            )
+        for nodes, edges in zip(
+            results['nodes'].values(),
+            results['edges'].values(),
+        ):
+            self.assertGreater(len(nodes), 0)
+            self.assertEqual(nodes, edges)
+
+    def test_5_example_snapping_cache(self):
+        """Nearest edge associations reused from the snapping cache should match those of snapping afresh."""
+        from sqlalchemy import text
+
+        r = ghsci.example()
+        columns = 'n1, n2, n1_distance, n2_distance, edge_ogc_fid, match_point_distance'
+        results = {}
+        for label in ['snapped', 'cached']:
+            table = f'_test_snapping_cache_{label}'
+            with r.engine.begin() as connection:
+                if label == 'snapped' and 'snapping_cache' in r.get_tables():
+                    connection.execute(text('DELETE FROM snapping_cache;'))
+                connection.execute(
+                    text(
+                        f"""
+                    DROP TABLE IF EXISTS {table};
+                    CREATE TABLE {table} AS
+                    SELECT point_id, geom
+                    FROM urban_sample_points
+                    ORDER BY point_id
+                    LIMIT 1000;
+                    """,
+                    ),
+                )
+            r.add_nearest_node_associations(table)
+            results[label] = r.get_df(
+                f'SELECT point_id, {columns} FROM {table} ORDER BY point_id',
+            )
+            with r.engine.begin() as connection:
+                connection.execute(text(f'DROP TABLE {table};'))
+        self.assertGreater(len(results['snapped']), 0)
+        self.assertTrue(results['snapped'].equals(results['cached']))
+
+    def test_5_example_edge_parametric_access(self):
+        """Sample point indicators derived from network edges should match those derived from sample point records."""
+        import pandas as pd
+        from subprocesses._11_neighbourhood_analysis import (
+            calculate_edge_parametric_access_scores,
+            calculate_poi_accessibility,
+            calculate_sample_point_access_scores,
+            density_statistics,
+        )
+
+        r = ghsci.example()
+        nodes_simple = r.get_gdf(
+            'nodes_pop_intersect_density',
+            index_col='osmid',
+            geom_col='geometry',
+        )
+        nodes_poi_dist = calculate_poi_accessibility(r)
+        accessibility_distance = ghsci.settings['network_analysis'][
+            'accessibility_distance'
+        ]
+        results = {}
+        for label, function in [
+            ('points', calculate_sample_point_access_scores),
+            ('edges', calculate_edge_parametric_access_scores),
+        ]:
+            results[label] = (
+                function(
+                    r,
+                    nodes_simple,
+                    nodes_poi_dist,
+                    density_statistics,
+                    accessibility_distance,
+                )
+                .drop(columns='geometry', errors='ignore')
+                .astype(float)
+                .sort_index()
+            )
+        self.assertGreater(len(results['points']), 0)
+        pd.testing.assert_frame_equal(
+            results['edges'],
+            results['points'][results['edges'].columns],
+            check_names=False,
+        )
+
     def test_6_example_generate(self):
         """Generate resources for example region."""
         r = ghsci.example()